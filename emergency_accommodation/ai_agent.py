@@ -30,6 +30,7 @@ from models import (
     OptionAssessment,
     serialize_option_sequence,
 )
+from run_budget import call_timeout, deadline_exceeded
 
 __all__ = [
     "AIIntegrationError",
@@ -236,7 +237,7 @@ class AccommodationAgent:
             {"role": "user", "content": payload},
         ]
 
-        timeout = float(self._config.get("ai_timeout_seconds", 12.0))
+        timeout = call_timeout(float(self._config.get("ai_timeout_seconds", 12.0)))
         try:
             structured = await asyncio.wait_for(
                 _log_llm_call(
@@ -255,8 +256,11 @@ class AccommodationAgent:
         except OutputParserException as exc:
             raise AIIntegrationError("Response validation failed", code="I302", cause=exc) from exc
         except asyncio.TimeoutError as exc:
+            error = deadline_exceeded("the iteration evaluation", exc)
+            if error is not None:
+                raise error from exc
             raise AIIntegrationError(
-                f"AI request timed out after {timeout}s",
+                f"AI request timed out after {timeout:.1f}s",
                 code="I309",
                 cause=exc,
             ) from exc
@@ -301,7 +305,7 @@ class AccommodationAgent:
             {"role": "user", "content": payload},
         ]
 
-        timeout = float(self._config.get("ai_timeout_seconds", 12.0))
+        timeout = call_timeout(float(self._config.get("ai_timeout_seconds", 12.0)))
         try:
             structured = await asyncio.wait_for(
                 _log_llm_call(
@@ -320,8 +324,11 @@ class AccommodationAgent:
         except OutputParserException as exc:
             raise AIIntegrationError("Response validation failed", code="I302", cause=exc) from exc
         except asyncio.TimeoutError as exc:
+            error = deadline_exceeded("the final recommendation", exc)
+            if error is not None:
+                raise error from exc
             raise AIIntegrationError(
-                f"AI request timed out after {timeout}s",
+                f"AI request timed out after {timeout:.1f}s",
                 code="I309",
                 cause=exc,
             ) from exc
@@ -0,0 +1,225 @@
+"""Run-scoped cache of inventory search rows shared across analysis iterations."""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Mapping, Sequence
+from uuid import UUID
+
+from change_listener import ChangeEvent
+from models import FailedItem
+
+__all__ = [
+    "CandidateStore",
+    "CandidateStoreStats",
+]
+
+_StoreKey = tuple[UUID, UUID | None, str]
+
+# Tables whose changes can alter stored candidate rows.
+_INVENTORY_TABLES = frozenset({"warehouse_inventory", "inventory_reservations"})
+
+
+@dataclass(slots=True)
+class CandidateStoreStats:
+    """Counters describing how much inventory search traffic the store absorbed."""
+
+    hits: int = 0
+    misses: int = 0
+    rows_fetched: int = 0
+    rows_reused: int = 0
+    approximate_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return self.hits / lookups
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "rows_fetched": self.rows_fetched,
+            "rows_reused": self.rows_reused,
+            "approximate_bytes": self.approximate_bytes,
+        }
+
+
+@dataclass(slots=True)
+class _Entry:
+    pages: dict[int, list[dict[str, Any]]]
+    inventory_ids: set[UUID]
+
+
+class CandidateStore:
+    """Keeps fetched candidate rows per line item, search order and threshold for the whole run.
+
+    Each iteration only has to fetch the page it has not seen yet; earlier pages are served
+    from memory. Pages are kept apart per ``threshold`` (the filter PostgreSQL applied), since
+    a page filtered at one threshold is not a page of another. Rows stored at other thresholds
+    are still served when they pass the caller's ``matches`` predicate, so widening a
+    threshold does not throw away rows fetched earlier. Inventory already shown in an earlier
+    iteration is left out of later candidate sets. An entry evicted by :meth:`invalidate` lost
+    its earlier pages too, so :meth:`evicted` reports it until it is fetched again from the
+    first row.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[_StoreKey, dict[tuple[Any, ...], _Entry]] = {}
+        self._shown: dict[str, dict[UUID, int]] = {}
+        self._evicted: set[_StoreKey] = set()
+        self.stats = CandidateStoreStats()
+
+    def missing(
+        self,
+        items: Sequence[FailedItem],
+        search_order: str,
+        iteration: int,
+        threshold: tuple[Any, ...] = (),
+    ) -> list[FailedItem]:
+        """Return the items whose page for ``iteration`` at ``threshold`` still has to be fetched."""
+        missing: list[FailedItem] = []
+        for item in items:
+            entry = self._entries.get(self._key(item, search_order), {}).get(threshold)
+            if entry is not None and iteration in entry.pages:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+                missing.append(item)
+        return missing
+
+    def add(
+        self,
+        item: FailedItem,
+        search_order: str,
+        iteration: int,
+        rows: Iterable[Mapping[str, Any]],
+        threshold: tuple[Any, ...] = (),
+    ) -> None:
+        """Store the page fetched for ``item``, dropping rows an earlier page already held."""
+        key = self._key(item, search_order)
+        self._evicted.discard(key)
+        entries = self._entries.setdefault(key, {})
+        entry = entries.setdefault(threshold, _Entry(pages={}, inventory_ids=set()))
+        page: list[dict[str, Any]] = []
+        for row in rows:
+            self.stats.rows_fetched += 1
+            if row["inventory_id"] in entry.inventory_ids:
+                continue
+            entry.inventory_ids.add(row["inventory_id"])
+            stored = dict(row)
+            page.append(stored)
+            self.stats.approximate_bytes += _row_size(stored)
+        self.stats.approximate_bytes -= sum(_row_size(row) for row in entry.pages.get(iteration, ()))
+        entry.pages[iteration] = page
+
+    def evicted(self, items: Sequence[FailedItem], search_order: str) -> list[FailedItem]:
+        """Return the items whose entry was evicted since it was last stored."""
+        return [item for item in items if self._key(item, search_order) in self._evicted]
+
+    def holds(
+        self,
+        items: Sequence[FailedItem],
+        search_order: str,
+        matches: Callable[[Mapping[str, Any]], bool],
+    ) -> bool:
+        """Return whether any row stored for ``items``, shown or not, passes ``matches``."""
+        for item in items:
+            for entry in self._entries.get(self._key(item, search_order), {}).values():
+                if any(matches(row) for rows in entry.pages.values() for row in rows):
+                    return True
+        return False
+
+    def candidates(
+        self,
+        items: Sequence[FailedItem],
+        search_order: str,
+        iteration: int,
+        threshold: tuple[Any, ...] = (),
+        matches: Callable[[Mapping[str, Any]], bool] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return every stored row up to ``iteration`` that was not shown in an earlier iteration."""
+        groups = self.candidate_groups(items, search_order, iteration, threshold, matches)
+        return [row for rows in groups for row in rows]
+
+    def candidate_groups(
+        self,
+        items: Sequence[FailedItem],
+        search_order: str,
+        iteration: int,
+        threshold: tuple[Any, ...] = (),
+        matches: Callable[[Mapping[str, Any]], bool] | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Like :meth:`candidates`, but with one list per item in ``items``.
+
+        Pages stored at ``threshold`` come first, in page order, followed by rows stored at
+        other thresholds that pass ``matches``; without ``matches`` only ``threshold`` is read.
+        """
+        shown = self._shown.get(search_order, {})
+        groups: list[list[dict[str, Any]]] = []
+        for item in items:
+            rows: list[dict[str, Any]] = []
+            groups.append(rows)
+            entries = self._entries.get(self._key(item, search_order), {})
+            seen: set[UUID] = set()
+            for entry_threshold in sorted(entries, key=lambda key: key != threshold):
+                own = entry_threshold == threshold
+                if not own and matches is None:
+                    continue
+                pages = entries[entry_threshold].pages
+                for page_number in sorted(pages):
+                    if page_number > iteration:
+                        break
+                    for row in pages[page_number]:
+                        inventory_id = row["inventory_id"]
+                        if inventory_id in seen or shown.get(inventory_id, iteration) < iteration:
+                            continue
+                        if not own and not matches(row):  # type: ignore[misc]
+                            continue
+                        seen.add(inventory_id)
+                        rows.append(row)
+                        if page_number < iteration or not own:
+                            self.stats.rows_reused += 1
+        return groups
+
+    def invalidate(self, event: ChangeEvent) -> int:
+        """Evict the entries made stale by ``event`` and return how many were dropped.
+
+        A changed inventory record, or a change to its reservations, evicts every entry
+        holding that record so its pages are fetched again. New inventory can join any line
+        item's candidates, so inventory inserts and resets clear the store.
+        """
+        if event.table not in _INVENTORY_TABLES and not event.is_reset:
+            return 0
+        if event.is_reset or event.inventory_id is None or (
+            event.table == "warehouse_inventory" and event.op == "INSERT"
+        ):
+            stale = list(self._entries)
+        else:
+            stale = [
+                key
+                for key, entries in self._entries.items()
+                if any(event.inventory_id in entry.inventory_ids for entry in entries.values())
+            ]
+        for key in stale:
+            for entry in self._entries.pop(key).values():
+                self.stats.approximate_bytes -= sum(_row_size(row) for rows in entry.pages.values() for row in rows)
+        self._evicted.update(stale)
+        return len(stale)
+
+    def mark_shown(self, search_order: str, inventory_ids: Iterable[UUID], iteration: int) -> None:
+        shown = self._shown.setdefault(search_order, {})
+        for inventory_id in inventory_ids:
+            shown.setdefault(inventory_id, iteration)
+
+    @staticmethod
+    def _key(item: FailedItem, search_order: str) -> _StoreKey:
+        return (item.line_item_id, item.scn_id, search_order)
+
+
+def _row_size(row: Mapping[str, Any]) -> int:
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
@@ -0,0 +1,210 @@
+"""LISTEN/NOTIFY-driven invalidation for in-process inventory and failed-item caches."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from contextlib import AsyncExitStack, suppress
+from dataclasses import dataclass
+from typing import Any, Callable
+from uuid import UUID
+
+import asyncpg  # type: ignore[import-untyped]
+
+from db_pool import DatabasePool
+
+__all__ = [
+    "CHANGE_CHANNEL",
+    "ChangeEvent",
+    "ChangeListener",
+    "ChangeListenerStats",
+]
+
+logger = logging.getLogger(__name__)
+
+# Channel the trg_notify_inventory_change triggers publish on.
+CHANGE_CHANNEL = "inventory_changes"
+
+# Seconds to wait before each attempt to listen again after the connection is lost; the
+# last delay repeats until an attempt succeeds or the listener is stopped.
+_RECONNECT_DELAYS = (0.0, 0.5, 1.0, 2.0, 5.0)
+
+ChangeHandler = Callable[["ChangeEvent"], int]
+
+
+@dataclass(frozen=True, slots=True)
+class ChangeEvent:
+    """One changed row announced by the database, or a reset when ``record_id`` is unknown.
+
+    ``inventory_id`` is the affected warehouse inventory record for inventory and
+    reservation changes. A reset (TRUNCATE, or a lost listener connection) means any cached
+    row may be stale.
+    """
+
+    table: str
+    op: str
+    record_id: UUID | None = None
+    project_id: UUID | None = None
+    inventory_id: UUID | None = None
+
+    @property
+    def is_reset(self) -> bool:
+        return self.record_id is None
+
+    @classmethod
+    def from_payload(cls, payload: str) -> ChangeEvent:
+        data = json.loads(payload)
+        return cls(
+            table=str(data["table"]),
+            op=str(data["op"]),
+            record_id=_optional_uuid(data.get("id")),
+            project_id=_optional_uuid(data.get("project_id")),
+            inventory_id=_optional_uuid(data.get("inventory_id")),
+        )
+
+    @classmethod
+    def reset(cls, reason: str) -> ChangeEvent:
+        return cls(table="*", op=reason)
+
+
+@dataclass(slots=True)
+class ChangeListenerStats:
+    """Counters describing the change events received and the cache entries they evicted."""
+
+    events: int = 0
+    resets: int = 0
+    malformed: int = 0
+    evictions: int = 0
+    reconnects: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "events": self.events,
+            "resets": self.resets,
+            "malformed": self.malformed,
+            "evictions": self.evictions,
+            "reconnects": self.reconnects,
+        }
+
+
+class ChangeListener:
+    """Keeps one pooled connection listening for change events and forwards them to caches.
+
+    Subscribe each cache's ``invalidate`` method, then start the listener *before* the
+    caches are filled so no change can slip in between. Handlers run on the event loop as
+    notifications arrive and return how many entries they evicted. If the listening
+    connection is lost, every handler receives a reset event, because changes may have been
+    missed, and the listener keeps trying to listen on a new connection. Once it is listening
+    again the handlers receive a second reset, dropping whatever was cached while no change
+    could be heard.
+    """
+
+    def __init__(self, pool: DatabasePool, *handlers: ChangeHandler) -> None:
+        self._pool = pool
+        self._handlers: list[ChangeHandler] = list(handlers)
+        self._stack: AsyncExitStack | None = None
+        self._connection: asyncpg.Connection | None = None
+        self._reconnecting: asyncio.Task[None] | None = None
+        self.stats = ChangeListenerStats()
+
+    @property
+    def is_listening(self) -> bool:
+        return self._connection is not None
+
+    def subscribe(self, handler: ChangeHandler) -> None:
+        self._handlers.append(handler)
+
+    async def start(self) -> ChangeListener:
+        if self._stack is not None or self._reconnecting is not None:
+            return self
+        await self._listen()
+        return self
+
+    async def stop(self) -> None:
+        reconnecting, self._reconnecting = self._reconnecting, None
+        if reconnecting is not None:
+            reconnecting.cancel()
+            with suppress(asyncio.CancelledError):
+                await reconnecting
+        if self._stack is None:
+            return
+        stack, connection = self._stack, self._connection
+        self._stack = self._connection = None
+        if connection is not None:
+            connection.remove_termination_listener(self._on_termination)
+            if not connection.is_closed():
+                await connection.remove_listener(CHANGE_CHANNEL, self._on_notification)
+        await stack.aclose()
+
+    async def __aenter__(self) -> ChangeListener:
+        return await self.start()
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        await self.stop()
+
+    def dispatch(self, event: ChangeEvent) -> int:
+        """Forward ``event`` to every handler and return the total number of evictions."""
+        self.stats.events += 1
+        if event.is_reset:
+            self.stats.resets += 1
+        evicted = 0
+        for handler in self._handlers:
+            try:
+                evicted += handler(event)
+            except Exception:  # pragma: no cover - a broken cache must not stop the others
+                logger.exception("Change handler %r failed for %s", handler, event)
+        self.stats.evictions += evicted
+        return evicted
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = ChangeEvent.from_payload(payload)
+        except (ValueError, KeyError, TypeError):
+            self.stats.malformed += 1
+            logger.warning("Ignoring malformed change notification: %r", payload)
+            return
+        self.dispatch(event)
+
+    async def _listen(self) -> None:
+        stack = AsyncExitStack()
+        connection = await stack.enter_async_context(self._pool.acquire())
+        self._pool.mark_session_state(connection)
+        try:
+            await connection.add_listener(CHANGE_CHANNEL, self._on_notification)
+        except BaseException:
+            await stack.aclose()
+            raise
+        connection.add_termination_listener(self._on_termination)
+        self._stack, self._connection = stack, connection
+
+    async def _reconnect(self) -> None:
+        # Hand the closed connection back so the pool can replace it.
+        stack, self._stack = self._stack, None
+        if stack is not None:
+            await stack.aclose()
+        attempt = 0
+        while True:
+            await asyncio.sleep(_RECONNECT_DELAYS[min(attempt, len(_RECONNECT_DELAYS) - 1)])
+            attempt += 1
+            try:
+                await self._listen()
+            except Exception as exc:
+                logger.warning("Change listener reconnect attempt %d failed: %s", attempt, exc)
+                continue
+            break
+        self._reconnecting = None
+        self.stats.reconnects += 1
+        logger.info("Change listener listening again after %d attempt(s)", attempt)
+        self.dispatch(ChangeEvent.reset("RECONNECT"))
+
+    def _on_termination(self, connection: Any) -> None:
+        logger.warning("Change listener connection closed; resetting cached inventory")
+        self._connection = None
+        self.dispatch(ChangeEvent.reset("DISCONNECT"))
+        if self._stack is not None and self._reconnecting is None:
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+
+def _optional_uuid(value: Any) -> UUID | None:
+    return UUID(value) if value else None
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Mapping
+from typing import Any, Mapping
 
 from rich.console import Console
 from rich.panel import Panel
@@ -129,6 +129,41 @@ def display_final_recommendation(
         out_console.print(Panel(alt_table, title="Alternatives", border_style="blue"))
 
 
+def display_query_metrics(
+    summary: Mapping[str, Any],
+    *,
+    console_override: Console | None = None,
+) -> None:
+    """Render one iteration's per-query database timings."""
+
+    out_console = _get_console(console_override)
+    table = Table(
+        show_header=True,
+        header_style="bold magenta",
+        title=f"Database: {summary['sql_ms']:.1f} ms of {summary['wall_ms']:.1f} ms",
+    )
+    table.add_column("Query")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total ms", justify="right")
+    table.add_column("Max ms", justify="right")
+    table.add_column("Rows", justify="right")
+    table.add_column("KiB", justify="right")
+    table.add_column("Wait ms", justify="right")
+
+    for name, stats in summary["queries"].items():
+        table.add_row(
+            name,
+            str(stats["calls"]),
+            f"{stats['total_ms']:.1f}",
+            f"{stats['max_ms']:.1f}",
+            str(stats["rows"]),
+            f"{stats['bytes_decoded'] / 1024:.1f}",
+            f"{stats['wait_ms']:.1f}",
+        )
+
+    out_console.print(table)
+
+
 def display_scenario_header(
     scenario_name: str,
     config: Mapping[str, object],
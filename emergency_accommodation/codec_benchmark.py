@@ -0,0 +1,134 @@
+"""Micro-benchmark of the pool's codec profiles on batched inventory searches.
+
+Runs the first iteration of a scenario's inventory search repeatedly on a pool using each
+codec profile and reports how long the search took end to end and inside the
+``inventory_search_batch`` query, where asyncpg decodes the candidate rows.
+
+Usage::
+
+    python codec_benchmark.py --scenario scenario1-enhanced --rounds 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Mapping, Sequence
+
+from dotenv import load_dotenv
+
+from config import load_search_parameters
+from database import load_failed_items, load_inventory_by_iteration
+from db_pool import CODEC_PROFILES, DatabasePool, PoolSettings
+from query_metrics import query_metrics
+
+__all__ = [
+    "CodecTiming",
+    "benchmark_codec_profiles",
+]
+
+
+@dataclass(frozen=True)
+class CodecTiming:
+    """Timings of one codec profile over every benchmark round."""
+
+    profile: str
+    rounds: int
+    rows_per_round: int
+    best_ms: float
+    median_ms: float
+    query_ms: float
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "profile": self.profile,
+            "rounds": self.rounds,
+            "rows_per_round": self.rows_per_round,
+            "best_ms": self.best_ms,
+            "median_ms": self.median_ms,
+            "query_ms": self.query_ms,
+        }
+
+
+async def benchmark_codec_profiles(
+    dsn: str,
+    scenario: str,
+    *,
+    rounds: int = 20,
+    batch_size: int = 50,
+    profiles: Sequence[str] = CODEC_PROFILES,
+) -> dict[str, CodecTiming]:
+    """Time the first search iteration of ``scenario`` under each codec profile.
+
+    ``query_ms`` is the mean time spent in the batched search query itself, which includes
+    decoding its rows; ``best_ms`` and ``median_ms`` cover the whole iteration, including
+    building the kept options. One warm-up round per profile prepares the statements.
+    """
+    config: Mapping[str, Any] = {**load_search_parameters(scenario), "batch_size_per_iteration": batch_size}
+    metrics = query_metrics()
+    timings: dict[str, CodecTiming] = {}
+    for profile in profiles:
+        settings = PoolSettings(min_size=1, max_size=1, codec_profile=profile)
+        async with DatabasePool(dsn, settings) as pool:
+            failed_items = await load_failed_items(pool, scenario)
+            await load_inventory_by_iteration(pool, failed_items, 1, config)
+            metrics.reset()
+            elapsed: list[float] = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                await load_inventory_by_iteration(pool, failed_items, 1, config)
+                elapsed.append(time.perf_counter() - started)
+            search = metrics.summary()["queries"].get("inventory_search_batch", {})
+            metrics.reset()
+
+        timings[profile] = CodecTiming(
+            profile=profile,
+            rounds=rounds,
+            rows_per_round=search.get("rows", 0) // max(rounds, 1),
+            best_ms=round(min(elapsed) * 1000, 3),
+            median_ms=round(statistics.median(elapsed) * 1000, 3),
+            query_ms=search.get("mean_ms", 0.0),
+        )
+    return timings
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare codec profiles on batched inventory searches")
+    parser.add_argument("--scenario", default="scenario1-enhanced", help="Scenario whose failed items are searched")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed searches per profile")
+    parser.add_argument("--batch-size", type=int, default=50, help="batch_size_per_iteration for the search")
+    return parser.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace, database_url: str) -> int:
+    timings = await benchmark_codec_profiles(
+        database_url, args.scenario, rounds=args.rounds, batch_size=args.batch_size
+    )
+    print(f"{'profile':<10}{'rows':>8}{'query ms':>12}{'best ms':>12}{'median ms':>12}")
+    for timing in timings.values():
+        print(
+            f"{timing.profile:<10}{timing.rows_per_round:>8}{timing.query_ms:>12.3f}"
+            f"{timing.best_ms:>12.3f}{timing.median_ms:>12.3f}"
+        )
+    default, compact = timings.get("default"), timings.get("compact")
+    if default and compact and default.query_ms:
+        print(f"compact saves {1 - compact.query_ms / default.query_ms:.1%} of the search query time")
+    return 0
+
+
+def main() -> None:
+    load_dotenv()
+    args = parse_args()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise SystemExit("DATABASE_URL must be set to run the benchmark")
+    sys.exit(asyncio.run(_run(args, database_url)))
+
+
+if __name__ == "__main__":
+    main()
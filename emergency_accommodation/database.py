@@ -2,12 +2,33 @@
 
 from __future__ import annotations
 
-from typing import Any, Mapping, Sequence
+import asyncio
+import heapq
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Mapping, Sequence
 from uuid import UUID
 
 import asyncpg  # type: ignore[import-untyped]
 
+from candidate_store import CandidateStore
+from change_listener import ChangeEvent
+from config.loader import ConfigurationError
+from db_pool import DatabasePool
 from models import FailedItem, InventoryOption
+from query_metrics import estimate_bytes, query_metrics
+from run_budget import call_timeout
+from scoring_engine import InventoryScoringEngine
+from statement_registry import BoundStatements, StatementRegistry
+
+logger = logging.getLogger(__name__)
+
+_FAILED_ITEM_CACHE_FORMAT = 1
 
 # Scenario metadata used to locate project records deterministically created by seeding scripts.
 _SCENARIO_METADATA: dict[str, dict[str, str]] = {
@@ -19,7 +40,7 @@ _SCENARIO_METADATA: dict[str, dict[str, str]] = {
     "scenario3-enhanced": {"project_name": "Enhanced Scenario 3 - Metropolitan Infrastructure Collapse"},
 }
 
-_FAILED_ITEMS_QUERY = """
+_FAILED_ITEMS_TEMPLATE = """
 SELECT DISTINCT ON (pli.id)
     sli.scn_id AS scn_id,
     pli.id AS line_item_id,
@@ -40,38 +61,81 @@ SELECT DISTINCT ON (pli.id)
     cc.engineered_code AS commodity_code,
     eq.engineered_tag AS equipment_tag
 FROM po_line_items pli
-JOIN purchase_orders po ON po.id = pli.po_id
-JOIN projects p ON p.id = po.project_id
+JOIN purchase_orders po ON po.id = pli.po_id{project_join}
 JOIN scn_line_items sli ON sli.po_line_item_id = pli.id
 LEFT JOIN emergency_incidents ei
-    ON ei.project_id = p.id
+    ON ei.project_id = po.project_id
    AND (ei.scn_id IS NULL OR ei.scn_id = sli.scn_id)
 LEFT JOIN commodity_codes cc ON cc.id = pli.commodity_code_id
 LEFT JOIN equipment_list eq ON eq.id = pli.equipment_id
 LEFT JOIN units_of_measure uom ON uom.id = COALESCE(cc.unit_of_measure_id, eq.unit_of_measure_id)
 LEFT JOIN wbs_ros_dates ros ON ros.wbs_id = pli.wbs_id
-WHERE p.name = $1
+WHERE {project_filter}
   AND ei.id IS NOT NULL
-ORDER BY pli.id, ros.ros_date DESC NULLS LAST;
+ORDER BY pli.id, ros.ros_date DESC NULLS LAST
 """
 
-_DISTANCE_SQL = """
-CASE
-    WHEN tgt.latitude IS NULL OR tgt.longitude IS NULL OR w.latitude IS NULL OR w.longitude IS NULL THEN NULL
-    ELSE 6371.0 * ACOS(
-        GREATEST(-1.0, LEAST(
-            1.0,
-            SIN(RADIANS(tgt.latitude)) * SIN(RADIANS(w.latitude)) +
-            COS(RADIANS(tgt.latitude)) * COS(RADIANS(w.latitude)) *
-            COS(RADIANS(w.longitude - tgt.longitude))
-        ))
-    )
-END
-"""
+_FAILED_ITEMS_QUERY = _FAILED_ITEMS_TEMPLATE.format(
+    project_join="\nJOIN projects p ON p.id = po.project_id", project_filter="p.name = $1"
+)
 
-_BASE_INVENTORY_QUERY_TEMPLATE = """
-WITH base AS (
+# Everything a cached load needs in one round trip: the project id for the name in $1, the
+# statement's own snapshot and date, and the failed items to re-read. Those are all of the
+# project's items when $2, the snapshot of the previous load, is NULL, when the date differs
+# from $3 or when a change covers the whole project, and otherwise the line items changed by
+# transactions that snapshot could not see. Every row repeats the state columns; a load with
+# nothing to re-read returns them once with NULL item columns, and an unknown project
+# returns no rows. A single statement reads from a single snapshot, so no transaction block
+# is needed.
+_FAILED_ITEM_REFRESH_QUERY = """
+WITH project AS (
+    SELECT id FROM projects WHERE name = $1
+),
+changes AS (
+    SELECT
+        COALESCE(bool_or(c.line_item_id IS NULL), FALSE) AS reload,
+        COALESCE(array_agg(DISTINCT c.line_item_id) FILTER (WHERE c.line_item_id IS NOT NULL), '{{}}') AS line_item_ids
+    FROM failed_item_changes c
+    JOIN project ON c.project_id = project.id OR c.project_id IS NULL
+    WHERE $2::text IS NOT NULL
+      AND c.xact_id >= pg_snapshot_xmin($2::text::pg_snapshot)
+      AND NOT pg_visible_in_snapshot(c.xact_id, $2::text::pg_snapshot)
+),
+state AS (
     SELECT
+        project.id AS project_id,
+        pg_current_snapshot()::text AS snapshot,
+        CURRENT_DATE AS as_of,
+        ($2::text IS NULL OR $3::date IS DISTINCT FROM CURRENT_DATE OR changes.reload) AS reload,
+        changes.line_item_ids
+    FROM project, changes
+),
+items AS ({items}
+)
+SELECT state.project_id, state.snapshot, state.as_of, state.reload, state.line_item_ids, items.*
+FROM state
+LEFT JOIN items ON TRUE;
+""".format(
+    items=_FAILED_ITEMS_TEMPLATE.format(
+        project_join="\nJOIN state ON state.project_id = po.project_id",
+        project_filter="(state.reload OR pli.id = ANY(state.line_item_ids))",
+    ).rstrip()
+)
+
+# Candidate rows shared by the per-item and batched searches: one row per inventory option
+# with its display columns and the search order's sort tuple. Reservation dates and
+# priorities come from the search functions, which aggregate them once per candidate.
+# Distances to the SCN's delivery warehouse come from fn_nearest_warehouses, one index range
+# scan per SCN bounded by the distance band ($12); candidates outside the band are dropped
+# here, while candidates without coordinates on either side keep a NULL distance.
+_INVENTORY_CTES_TEMPLATE = """nearby AS (
+    SELECT scn.id AS scn_id, near.warehouse_id, near.distance_km
+    FROM scns scn
+    CROSS JOIN LATERAL fn_nearest_warehouses(scn.delivery_warehouse_id, $12::double precision) AS near
+    WHERE scn.id IN ({scn_ids})
+),
+base AS (
+    SELECT{source_columns}
         search.inventory_id,
         wi.warehouse_id,
         w.name AS warehouse_name,
@@ -90,7 +154,7 @@ WITH base AS (
         GREATEST(
             0,
             COALESCE(
-                (res.next_required_by - CURRENT_DATE),
+                (search.next_required_by - CURRENT_DATE),
                 (ros.ros_date - CURRENT_DATE),
                 CASE WHEN search.impact_level = 'critical_decision' THEN 1 ELSE 3 END
             )
@@ -98,75 +162,470 @@ WITH base AS (
         COALESCE(
             FORMAT(
                 'Next required: %s | Priority: %s',
-                to_char(res.next_required_by, 'YYYY-MM-DD'),
-                COALESCE(res.max_priority::text, 'none')
+                to_char(search.next_required_by, 'YYYY-MM-DD'),
+                COALESCE(search.max_priority::text, 'none')
             ),
             'No downstream reservations'
         ) AS risk_summary,
-        {_distance_sql}::double precision AS distance_km,
-        res.max_priority,
-        res.next_required_by,
+        nearby.distance_km,
+        search.max_priority,
+        search.next_required_by,
         search.compatibility_score,
         search.urgency_score,
         search.availability_score,
         search.availability_status
-    FROM fn_emergency_inventory_search($1::uuid, $2::int) AS search
+    FROM {search_source}
     JOIN warehouse_inventory wi ON wi.id = search.inventory_id
     JOIN warehouses w ON w.id = wi.warehouse_id
     LEFT JOIN commodity_codes cc ON cc.id = wi.commodity_code_id
     LEFT JOIN equipment_list eq ON eq.id = wi.equipment_id
-    LEFT JOIN LATERAL (
-        SELECT
-            MIN(required_by_date) AS next_required_by,
-            MAX(priority_level) AS max_priority
-        FROM inventory_reservations ir
-        WHERE ir.inventory_id = wi.id
-    ) res ON TRUE
     LEFT JOIN wbs_ros_dates ros ON ros.wbs_id = wi.wbs_id
-    LEFT JOIN scns scn ON scn.id = $3::uuid
-    LEFT JOIN warehouses tgt ON tgt.id = scn.delivery_warehouse_id
+    LEFT JOIN scns scn ON scn.id = {scn_param}
+    LEFT JOIN nearby ON nearby.scn_id = scn.id AND nearby.warehouse_id = wi.warehouse_id
     WHERE wi.quantity_available > 0
-)
+      AND (
+          $12::double precision IS NULL
+          OR nearby.warehouse_id IS NOT NULL
+          OR NOT EXISTS (
+              SELECT 1
+              FROM warehouse_distances wd
+              WHERE wd.from_warehouse_id = scn.delivery_warehouse_id AND wd.to_warehouse_id = wi.warehouse_id
+          )
+      )
+),
+keyed AS (
+    SELECT
+        base.*,
+        ({sort_key_1})::double precision AS sort_key_1,
+        ({sort_key_2})::int AS sort_key_2,
+        ({sort_key_3})::int AS sort_key_3
+    FROM base
+)"""
+
+# Resume strictly after the previous page's last sort tuple, then apply the strategy
+# thresholds; the distance band ($12) is already applied in base. Rows the threshold of the
+# cursor's page ($13-$15) filtered out were never read, so they qualify wherever they rank.
+_CANDIDATE_PREDICATE_TEMPLATE = """(
+        {after_id_param} IS NULL
+        OR (sort_key_1, sort_key_2, sort_key_3, inventory_id)
+           > ({after_key_1_param}, {after_key_2_param}, {after_key_3_param}, {after_id_param})
+        OR estimated_recovery_days > $13::int
+        OR COALESCE(max_priority, 0) < $14::int
+        OR distance_km > $15::double precision
+    )
+  AND ($10::int IS NULL OR estimated_recovery_days <= $10::int)
+  AND ($11::int IS NULL OR COALESCE(max_priority, 0) >= $11::int)"""
+
+_ITEM_INVENTORY_QUERY_TEMPLATE = """
+WITH {ctes}
 SELECT *
-FROM base
+FROM keyed
+WHERE {predicate}
 ORDER BY {order_clause}
 OFFSET $4
 LIMIT $5;
 """
 
-_ORDER_BY_MAP = {
-    "availability_first": "availability_score DESC, compatibility_score DESC, urgency_score DESC",
-    "proximity_first": "distance_km ASC NULLS LAST, compatibility_score DESC, availability_score DESC",
-    "urgency_first": "urgency_score DESC, compatibility_score DESC, availability_score DESC",
+# Scores every requested line item with one call to fn_emergency_inventory_search_batch and
+# pages each item's rows separately. Rows come back grouped by the position of their line
+# item in the request, each group in per-item order.
+_BATCH_INVENTORY_QUERY_TEMPLATE = """
+WITH request AS (
+    SELECT *
+    FROM unnest(
+        $1::uuid[], $2::uuid[], $6::double precision[], $7::int[], $8::int[], $9::uuid[]
+    ) WITH ORDINALITY AS requested(line_item_id, scn_id, after_key_1, after_key_2, after_key_3, after_id, position)
+),
+{ctes}
+SELECT *
+FROM (
+    SELECT
+        keyed.*,
+        row_number() OVER (PARTITION BY keyed.source_position ORDER BY {order_clause}) AS page_row
+    FROM keyed
+    JOIN request ON request.position = keyed.source_position
+    WHERE {predicate}
+) AS paged
+WHERE page_row > $4 AND page_row <= $4 + $5
+ORDER BY source_position, {order_clause};
+"""
+
+# Each search order is expressed as an ascending sort tuple so that, with inventory_id as the
+# tie-breaker, a page can resume strictly after the last row of the previous one.
+_SORT_KEY_MAP: dict[str, tuple[str, str, str]] = {
+    "availability_first": ("-availability_score", "-compatibility_score", "-urgency_score"),
+    "proximity_first": ("COALESCE(distance_km, 'Infinity')", "-compatibility_score", "-availability_score"),
+    "urgency_first": ("-urgency_score", "-compatibility_score", "-availability_score"),
 }
 
+_KEYSET_ORDER_CLAUSE = "sort_key_1, sort_key_2, sort_key_3, inventory_id"
 
-async def load_failed_items(connection_url: str, scenario_name: str) -> list[FailedItem]:
-    """Load failed SCN line items related to emergency incidents for the scenario."""
+_FETCH_MODES = ("batched", "sequential", "concurrent")
+_PAGINATION_MODES = ("keyset", "offset")
+_SEARCH_BACKENDS = ("sql", "vectorized")
+
+
+@dataclass(frozen=True)
+class InventoryFetchOptions:
+    """How per-item inventory searches are sent to PostgreSQL each iteration."""
+
+    mode: str = "batched"
+    concurrency: int = 4
+    pagination: str = "keyset"
+    max_iterations: int = 3
+    backend: str = "sql"
+
+    def __post_init__(self) -> None:
+        if self.mode not in _FETCH_MODES:
+            raise ConfigurationError(f"Unsupported inventory fetch mode '{self.mode}'", code="C120")
+        if self.concurrency < 1:
+            raise ConfigurationError("Inventory fetch concurrency must be at least 1", code="C120")
+        if self.pagination not in _PAGINATION_MODES:
+            raise ConfigurationError(f"Unsupported inventory pagination '{self.pagination}'", code="C120")
+        if self.backend not in _SEARCH_BACKENDS:
+            raise ConfigurationError(f"Unsupported inventory search backend '{self.backend}'", code="C120")
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> InventoryFetchOptions:
+        return cls(
+            mode=str(config.get("inventory_fetch_mode", cls.mode)),
+            concurrency=int(config.get("inventory_fetch_concurrency", cls.concurrency)),
+            pagination=str(config.get("inventory_pagination", cls.pagination)),
+            max_iterations=max(1, int(config.get("max_iterations", cls.max_iterations))),
+            backend=str(config.get("inventory_search_backend", cls.backend)),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _CandidateFilter:
+    """Strategy threshold applied to candidate rows; ``None`` fields do not filter."""
+
+    max_recovery_days: int | None = None
+    min_priority: int | None = None
+    max_distance_km: float | None = None
+
+    @property
+    def is_empty(self) -> bool:
+        return self.max_recovery_days is None and self.min_priority is None and self.max_distance_km is None
+
+    def params(self) -> tuple[int | None, int | None, float | None]:
+        return (self.max_recovery_days, self.min_priority, self.max_distance_km)
+
+    def matches(self, option: Mapping[str, Any]) -> bool:
+        if self.max_recovery_days is not None and option["estimated_recovery_days"] > self.max_recovery_days:
+            return False
+        if self.min_priority is not None and (option.get("max_priority") or 0) < self.min_priority:
+            return False
+        if (
+            self.max_distance_km is not None
+            and option["distance_km"] is not None
+            and option["distance_km"] > self.max_distance_km
+        ):
+            return False
+        return True
+
+
+_NO_FILTER = _CandidateFilter()
+
+
+@dataclass(frozen=True, slots=True)
+class InventoryCursor:
+    """Sort tuple of the last row returned for one line item, used to resume the next page."""
+
+    sort_key_1: float
+    sort_key_2: int
+    sort_key_3: int
+    inventory_id: UUID
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> InventoryCursor:
+        return cls(
+            sort_key_1=row["sort_key_1"],
+            sort_key_2=row["sort_key_2"],
+            sort_key_3=row["sort_key_3"],
+            inventory_id=row["inventory_id"],
+        )
+
+
+_NO_CURSOR: tuple[None, None, None, None] = (None, None, None, None)
+
+_PagerKey = tuple[UUID, UUID | None, str]
+
+# Columns the strategy thresholds read; the pager keeps them for every row it has seen.
+_THRESHOLD_COLUMNS = ("estimated_recovery_days", "max_priority", "distance_km")
+
+
+@dataclass(slots=True)
+class _PagerPosition:
+    cursor: InventoryCursor | None
+    threshold: tuple[Any, ...]
+    exhausted: bool
+    fetched: list[dict[str, Any]]
+
+
+class InventoryPager:
+    """Run-scoped keyset positions for every line item's inventory search.
+
+    After each iteration the pager remembers, per line item and search order, the sort tuple
+    of the last row returned, the threshold that page was filtered at and whether the item
+    ran out of candidates at that threshold. The next iteration then asks PostgreSQL only for
+    the rows after that position instead of re-reading and skipping everything earlier pages
+    already produced. Strategies widen their threshold every iteration, so the position is
+    kept across thresholds: rows the cursor's threshold filtered out were never read, and are
+    fetched again wherever they rank. Call it once per iteration; :meth:`reset` forgets an
+    item's position once the rows it points into are no longer trusted.
+    """
+
+    def __init__(self) -> None:
+        self._positions: dict[_PagerKey, _PagerPosition] = {}
+
+    def start_positions(
+        self,
+        items: Sequence[FailedItem],
+        search_order: str,
+        iteration: int,
+        threshold: tuple[Any, ...] = (),
+    ) -> tuple[list[FailedItem], list[InventoryCursor | None], tuple[Any, ...]]:
+        """Return the items that still have rows to page through, their cursors and their threshold.
+
+        Items exhausted at ``threshold`` are left out. A cursor is ``None`` when the item has no
+        position yet, or when its position was recorded at a different threshold than the
+        other items' (one query carries one cursor threshold); the item is then read from the
+        first row.
+        """
+        if iteration <= 1:
+            return list(items), [None] * len(items), threshold
+
+        remaining: list[FailedItem] = []
+        cursors: list[InventoryCursor | None] = []
+        cursor_threshold: tuple[Any, ...] | None = None
+        for item in items:
+            position = self._positions.get(self._key(item, search_order))
+            if position is not None and position.exhausted and position.threshold == threshold:
+                continue
+            remaining.append(item)
+            if position is None or position.cursor is None:
+                cursors.append(None)
+                continue
+            if cursor_threshold is None:
+                cursor_threshold = position.threshold
+            cursors.append(position.cursor if position.threshold == cursor_threshold else None)
+        return remaining, cursors, threshold if cursor_threshold is None else cursor_threshold
+
+    def record(
+        self,
+        item: FailedItem,
+        search_order: str,
+        iteration: int,
+        rows: Sequence[Mapping[str, Any]],
+        page_size: int,
+        threshold: tuple[Any, ...] = (),
+    ) -> None:
+        """Remember where the page fetched for ``item`` in ``iteration`` at ``threshold`` ended.
+
+        Every row at ``threshold`` up to the page's last row has been read by now, so that row
+        becomes the cursor. An empty page keeps the previous cursor: nothing at ``threshold``
+        is left after it.
+        """
+        key = self._key(item, search_order)
+        position = self._positions.get(key) if iteration > 1 else None
+        if position is None:
+            position = self._positions[key] = _PagerPosition(cursor=None, threshold=threshold, exhausted=False, fetched=[])
+        if rows:
+            position.cursor = InventoryCursor.from_row(rows[-1])
+        position.threshold = threshold
+        position.exhausted = len(rows) < page_size
+        position.fetched.extend({column: row[column] for column in _THRESHOLD_COLUMNS} for row in rows)
+
+    def matched(
+        self,
+        items: Sequence[FailedItem],
+        search_order: str,
+        matches: Callable[[Mapping[str, Any]], bool],
+    ) -> bool:
+        """Return whether any row already read for ``items`` passes ``matches``."""
+        for item in items:
+            position = self._positions.get(self._key(item, search_order))
+            if position is not None and any(matches(row) for row in position.fetched):
+                return True
+        return False
+
+    def reset(self, items: Sequence[FailedItem], search_order: str) -> None:
+        """Forget the positions recorded for ``items`` under ``search_order``."""
+        for item in items:
+            self._positions.pop(self._key(item, search_order), None)
+
+    @staticmethod
+    def _key(item: FailedItem, search_order: str) -> _PagerKey:
+        return (item.line_item_id, item.scn_id, _normalize_order(search_order))
+
+
+def scenario_project_name(scenario_name: str) -> str:
+    """Return the name of the project the seeding scripts create for ``scenario_name``."""
     metadata = _SCENARIO_METADATA.get(scenario_name)
     if metadata is None:
         raise ValueError(f"Unknown scenario '{scenario_name}'")
+    return metadata["project_name"]
 
-    connection = await asyncpg.connect(connection_url)
-    try:
-        records = await connection.fetch(_FAILED_ITEMS_QUERY, metadata["project_name"])
-    finally:
-        await connection.close()
 
-    failed_items: list[FailedItem] = []
-    for record in records:
-        payload = dict(record)
-        failed_items.append(FailedItem.from_mapping(payload))
-    return failed_items
+async def load_failed_items(pool: DatabasePool, scenario_name: str) -> list[FailedItem]:
+    """Load failed SCN line items related to emergency incidents for the scenario."""
+    project_name = scenario_project_name(scenario_name)
+
+    metrics = query_metrics()
+    async with metrics.checkout(pool, "failed_items") as connection:
+        records = await metrics.fetch("failed_items", connection, _FAILED_ITEMS_QUERY, project_name)
+
+    return [FailedItem.from_record(record) for record in records]
+
+
+@dataclass(slots=True)
+class _CachedFailedItems:
+    snapshot: str
+    as_of: date
+    items: dict[UUID, FailedItem]
+
+
+class FailedItemCache:
+    """Failed items per project, refreshed line by line from the database's change records.
+
+    Every load is one statement: it checks ``failed_item_changes`` for the line items
+    changed by transactions that the previous load's snapshot could not see and re-reads
+    only those; a change covering the whole project, or a new day (priorities depend on the
+    current date), reloads it in full.
+    :meth:`save` and :meth:`open` keep the cache in a JSON file so back-to-back runs start
+    from it. Subscribing :meth:`invalidate` to a change listener additionally drops a
+    project as soon as one of its incidents changes.
+    """
+
+    def __init__(self) -> None:
+        self._project_ids: dict[str, UUID] = {}
+        self._entries: dict[UUID, _CachedFailedItems] = {}
+        self.hits = 0
+        self.refreshes = 0
+        self.misses = 0
+
+    async def load(self, pool: DatabasePool, scenario_name: str) -> list[FailedItem]:
+        project_name = scenario_project_name(scenario_name)
+        project_id = self._project_ids.get(project_name)
+        entry = self._entries.get(project_id) if project_id is not None else None
+
+        metrics = query_metrics()
+        async with metrics.checkout(pool, "failed_items") as connection:
+            records = await metrics.fetch(
+                "failed_items",
+                connection,
+                _FAILED_ITEM_REFRESH_QUERY,
+                project_name,
+                entry.snapshot if entry is not None else None,
+                entry.as_of if entry is not None else None,
+            )
+        if not records:
+            return []
+
+        # The state columns repeat on every row; only rows with a line item carry an item.
+        state = records[0]
+        project_id = self._project_ids[project_name] = state["project_id"]
+        items = [FailedItem.from_record(record) for record in records if record["line_item_id"] is not None]
+        if entry is None or state["reload"]:
+            self.misses += 1
+            entry = _CachedFailedItems(
+                snapshot=state["snapshot"],
+                as_of=state["as_of"],
+                items={item.line_item_id: item for item in items},
+            )
+            self._entries[project_id] = entry
+        elif state["line_item_ids"]:
+            self.refreshes += 1
+            for line_id in state["line_item_ids"]:
+                entry.items.pop(line_id, None)
+            entry.items.update((item.line_item_id, item) for item in items)
+            entry.snapshot = state["snapshot"]
+        else:
+            self.hits += 1
+            entry.snapshot = state["snapshot"]
+
+        return [entry.items[line_id] for line_id in sorted(entry.items)]
+
+    def invalidate(self, event: ChangeEvent) -> int:
+        """Evict the projects whose failed items ``event`` may have changed."""
+        if event.table != "emergency_incidents" and not event.is_reset:
+            return 0
+        stale = [
+            project_id
+            for project_id in self._entries
+            if event.is_reset or event.project_id is None or project_id == event.project_id
+        ]
+        for project_id in stale:
+            del self._entries[project_id]
+        return len(stale)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the cached projects to a JSON-safe dictionary."""
+        return {
+            "format_version": _FAILED_ITEM_CACHE_FORMAT,
+            "project_ids": {name: str(project_id) for name, project_id in self._project_ids.items()},
+            "projects": {
+                str(project_id): {
+                    "snapshot": entry.snapshot,
+                    "as_of": entry.as_of.isoformat(),
+                    "items": [item.to_dict() for item in entry.items.values()],
+                }
+                for project_id, entry in self._entries.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Mapping[str, Any]) -> FailedItemCache:
+        if payload.get("format_version") != _FAILED_ITEM_CACHE_FORMAT:
+            raise ValueError(f"Unsupported failed item cache format {payload.get('format_version')!r}")
+        cache = cls()
+        cache._project_ids = {name: UUID(project_id) for name, project_id in payload["project_ids"].items()}
+        for project_id, entry in payload["projects"].items():
+            items = [FailedItem.from_mapping(item) for item in entry["items"]]
+            cache._entries[UUID(project_id)] = _CachedFailedItems(
+                snapshot=str(entry["snapshot"]),
+                as_of=date.fromisoformat(entry["as_of"]),
+                items={item.line_item_id: item for item in items},
+            )
+        return cache
+
+    @classmethod
+    def open(cls, path: Path) -> FailedItemCache:
+        """Load a cache saved by :meth:`save`, or start empty when it is missing or unreadable."""
+        try:
+            return cls.from_dict(json.loads(path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Ignoring failed item cache %s: %s", path, exc)
+            return cls()
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.write_text(json.dumps(self.to_dict()), encoding="utf-8")
+        temporary.replace(path)
 
 
 async def load_inventory_by_iteration(
-    connection_url: str,
+    pool: DatabasePool,
     failed_items: Sequence[FailedItem],
     iteration_num: int,
     config: Mapping[str, Any],
+    *,
+    pager: InventoryPager | None = None,
+    store: CandidateStore | None = None,
+    engine: InventoryScoringEngine | None = None,
 ) -> list[InventoryOption]:
-    """Load inventory options incrementally using the configured strategy."""
+    """Load inventory options incrementally using the configured strategy.
+
+    Pass the same ``pager`` for every iteration of a run so keyset pagination can resume
+    each line item's search where the previous iteration stopped, and the same ``store`` so
+    rows fetched by earlier iterations are reused instead of fetched again. With
+    ``inventory_search_backend: vectorized`` candidates are scored in memory by ``engine``;
+    pass the same engine every iteration so the inventory snapshot is loaded only once.
+    """
     if not failed_items:
         return []
 
@@ -174,55 +633,160 @@ async def load_inventory_by_iteration(
     batch_size = int(config.get("batch_size_per_iteration", 10))
     iteration = max(1, iteration_num)
     time_window_type = config.get("time_window_type", "weekly")
+    fetch = InventoryFetchOptions.from_config(config)
+    if fetch.backend == "vectorized" and engine is None:
+        engine = InventoryScoringEngine()
 
-    connection = await asyncpg.connect(connection_url)
-    try:
-        if time_window_type in {"weekly", "monthly"}:
-            option_dicts = await load_by_time_window(
-                connection,
-                failed_items,
-                iteration,
-                time_window_type,
-                batch_size,
-                scenario_order,
-            )
-        elif time_window_type == "priority_based":
-            option_dicts = await load_by_priority_level(
-                connection,
-                failed_items,
-                iteration,
-                batch_size,
-                scenario_order,
-            )
-        elif time_window_type == "distance_based":
-            option_dicts = await load_by_distance_band(
-                connection,
-                failed_items,
-                iteration,
-                batch_size,
-                scenario_order,
-            )
-        else:
-            option_dicts = await _baseline_inventory_load(
-                connection,
-                failed_items,
-                iteration,
-                batch_size,
-                scenario_order,
-            )
-    finally:
-        await connection.close()
+    if time_window_type in {"weekly", "monthly"}:
+        option_dicts = await load_by_time_window(
+            pool,
+            failed_items,
+            iteration,
+            time_window_type,
+            batch_size,
+            scenario_order,
+            fetch=fetch,
+            pager=pager,
+            store=store,
+            engine=engine,
+        )
+    elif time_window_type == "priority_based":
+        option_dicts = await load_by_priority_level(
+            pool,
+            failed_items,
+            iteration,
+            batch_size,
+            scenario_order,
+            fetch=fetch,
+            pager=pager,
+            store=store,
+            engine=engine,
+        )
+    elif time_window_type == "distance_based":
+        option_dicts = await load_by_distance_band(
+            pool,
+            failed_items,
+            iteration,
+            batch_size,
+            scenario_order,
+            fetch=fetch,
+            pager=pager,
+            store=store,
+            engine=engine,
+        )
+    else:
+        option_dicts = await _baseline_inventory_load(
+            pool,
+            failed_items,
+            iteration,
+            batch_size,
+            scenario_order,
+            fetch=fetch,
+            pager=pager,
+            store=store,
+            engine=engine,
+        )
+
+    if store is not None:
+        store.mark_shown(scenario_order, (option["inventory_id"] for option in option_dicts), iteration)
+    return [InventoryOption.from_record(option) for option in option_dicts]
+
+
+async def stream_inventory_options(
+    pool: DatabasePool,
+    failed_items: Sequence[FailedItem],
+    *,
+    search_order: str = "urgency_first",
+    batch_size: int = 10,
+    limit_per_item: int = 100,
+    max_recovery_days: int | None = None,
+    min_priority: int | None = None,
+    max_distance_km: float | None = None,
+) -> AsyncIterator[list[InventoryOption]]:
+    """Yield inventory options in batches read through a server-side cursor.
+
+    Rows come back grouped by failed item, each group in ``search_order``, and an inventory
+    record already yielded for an earlier item is skipped. At most ``limit_per_item``
+    candidates are considered per item. The cursor fetches ``batch_size`` rows per round trip
+    only when the caller asks for the next batch, so a slow consumer never buffers more than
+    one batch. Stop early with ``break`` inside ``contextlib.aclosing(...)``; closing the
+    generator closes the cursor and its read-only transaction and releases the connection.
+    Always scored in PostgreSQL, whatever ``inventory_search_backend`` is set to.
+    """
+    if batch_size < 1 or limit_per_item < 1:
+        raise ValueError("batch_size and limit_per_item must be at least 1")
+    if not failed_items:
+        return
+
+    criteria = _CandidateFilter(
+        max_recovery_days=max_recovery_days, min_priority=min_priority, max_distance_km=max_distance_km
+    )
+    no_cursor = [None] * len(failed_items)
+    params = (
+        [item.line_item_id for item in failed_items],
+        [item.scn_id for item in failed_items],
+        limit_per_item,
+        0,
+        limit_per_item,
+        no_cursor,
+        no_cursor,
+        no_cursor,
+        no_cursor,
+        *criteria.params(),
+        *_NO_FILTER.params(),
+    )
+    query = _INVENTORY_STATEMENTS.sql(_statement_key(search_order, batched=True))
 
-    return [_to_inventory_option(option) for option in option_dicts]
+    seen: set[UUID] = set()
+    batch: list[InventoryOption] = []
+    metrics = query_metrics()
+    async with metrics.checkout(pool, "inventory_stream") as connection:
+        # Time the caller spends between batches is not charged to the query.
+        started = time.perf_counter()
+        consumer_seconds = 0.0
+        handed_off: float | None = None
+        rows = row_size = 0
+        try:
+            # PostgreSQL cursors only live inside a transaction.
+            async with connection.transaction(readonly=True):
+                async for record in connection.cursor(query, *params, prefetch=batch_size, timeout=call_timeout()):
+                    rows += 1
+                    if rows == 1:
+                        row_size = estimate_bytes([record])
+                    inventory_id = record["inventory_id"]
+                    if inventory_id in seen:
+                        continue
+                    seen.add(inventory_id)
+                    batch.append(InventoryOption.from_record(record))
+                    if len(batch) == batch_size:
+                        handed_off = time.perf_counter()
+                        yield batch
+                        consumer_seconds += time.perf_counter() - handed_off
+                        handed_off, batch = None, []
+                if batch:
+                    handed_off = time.perf_counter()
+                    yield batch
+                    consumer_seconds += time.perf_counter() - handed_off
+                    handed_off = None
+        finally:
+            finished = time.perf_counter()
+            if handed_off is not None:
+                consumer_seconds += finished - handed_off
+            metrics.record("inventory_stream", finished - started - consumer_seconds, rows, rows * row_size)
 
 
 async def load_by_time_window(
-    connection: asyncpg.Connection,
+    pool: DatabasePool,
     items: Sequence[FailedItem],
     iteration: int,
     window_type: str,
     batch_size: int,
     search_order: str,
+    *,
+    fetch: InventoryFetchOptions | None = None,
+    pager: InventoryPager | None = None,
+    store: CandidateStore | None = None,
+    engine: InventoryScoringEngine | None = None,
 ) -> list[dict[str, Any]]:
     """Filter inventory options by time horizon windows."""
     window_map = {"weekly": 7, "monthly": 30}
@@ -230,196 +794,545 @@ async def load_by_time_window(
     if window_days is None:
         raise ValueError(f"Unsupported time window type '{window_type}'")
 
-    raw = await _gather_candidate_dicts(connection, items, iteration, batch_size, search_order)
-    if not raw:
-        return []
-
-    threshold = window_days * iteration
-    filtered = [opt for opt in raw if opt["estimated_recovery_days"] <= threshold]
-    if not filtered:
-        filtered = raw
-
-    ordered = _sort_option_dicts(filtered, search_order)
-    return _deduplicate_and_limit(ordered, batch_size)
+    criteria = _CandidateFilter(max_recovery_days=window_days * iteration)
+    groups = await _collect_candidates(
+        pool, items, iteration, batch_size, search_order, criteria, fetch, pager, store, engine
+    )
+    return _merge_top_options(groups, search_order, batch_size)
 
 
 async def load_by_priority_level(
-    connection: asyncpg.Connection,
+    pool: DatabasePool,
     items: Sequence[FailedItem],
     iteration: int,
     batch_size: int,
     search_order: str,
+    *,
+    fetch: InventoryFetchOptions | None = None,
+    pager: InventoryPager | None = None,
+    store: CandidateStore | None = None,
+    engine: InventoryScoringEngine | None = None,
 ) -> list[dict[str, Any]]:
     """Filter candidate inventory using reservation priority thresholds."""
     thresholds = [80, 60, 0]
     min_priority = thresholds[min(iteration - 1, len(thresholds) - 1)]
 
-    raw = await _gather_candidate_dicts(connection, items, iteration, batch_size, search_order)
-    if not raw:
-        return []
-
-    filtered = [opt for opt in raw if (opt.get("max_priority") or 0) >= min_priority]
-    if not filtered:
-        filtered = raw
-
-    ordered = _sort_option_dicts(filtered, search_order)
-    return _deduplicate_and_limit(ordered, batch_size)
+    criteria = _CandidateFilter(min_priority=min_priority or None)
+    groups = await _collect_candidates(
+        pool, items, iteration, batch_size, search_order, criteria, fetch, pager, store, engine
+    )
+    return _merge_top_options(groups, search_order, batch_size)
 
 
 async def load_by_distance_band(
-    connection: asyncpg.Connection,
+    pool: DatabasePool,
     items: Sequence[FailedItem],
     iteration: int,
     batch_size: int,
     search_order: str,
+    *,
+    fetch: InventoryFetchOptions | None = None,
+    pager: InventoryPager | None = None,
+    store: CandidateStore | None = None,
+    engine: InventoryScoringEngine | None = None,
 ) -> list[dict[str, Any]]:
     """Filter inventory options based on distance bands that widen per iteration."""
     bands = [250.0, 750.0, None]
     limit_km = bands[min(iteration - 1, len(bands) - 1)]
 
-    raw = await _gather_candidate_dicts(connection, items, iteration, batch_size, search_order)
-    if not raw:
-        return []
-
-    if limit_km is not None:
-        filtered = [
-            opt
-            for opt in raw
-            if opt["distance_km"] is None or opt["distance_km"] <= limit_km
-        ]
-        if not filtered:
-            filtered = raw
-    else:
-        filtered = raw
-
-    ordered = _sort_option_dicts(filtered, search_order)
-    return _deduplicate_and_limit(ordered, batch_size)
+    criteria = _CandidateFilter(max_distance_km=limit_km)
+    groups = await _collect_candidates(
+        pool, items, iteration, batch_size, search_order, criteria, fetch, pager, store, engine
+    )
+    return _merge_top_options(groups, search_order, batch_size)
 
 
 async def _baseline_inventory_load(
-    connection: asyncpg.Connection,
+    pool: DatabasePool,
     items: Sequence[FailedItem],
     iteration: int,
     batch_size: int,
     search_order: str,
+    *,
+    fetch: InventoryFetchOptions | None = None,
+    pager: InventoryPager | None = None,
+    store: CandidateStore | None = None,
+    engine: InventoryScoringEngine | None = None,
 ) -> list[dict[str, Any]]:
-    raw = await _gather_candidate_dicts(connection, items, iteration, batch_size, search_order)
-    if not raw:
-        return []
-    ordered = _sort_option_dicts(raw, search_order)
-    return _deduplicate_and_limit(ordered, batch_size)
+    groups = await _gather_candidate_groups(
+        pool, items, iteration, batch_size, search_order, fetch, pager, store, engine
+    )
+    return _merge_top_options(groups, search_order, batch_size)
 
 
-async def _gather_candidate_dicts(
-    connection: asyncpg.Connection,
+async def _collect_candidates(
+    pool: DatabasePool,
     items: Sequence[FailedItem],
     iteration: int,
     batch_size: int,
     search_order: str,
-) -> list[dict[str, Any]]:
-    fetch_limit = batch_size * max(1, iteration) * 2
-    offset = max(0, (iteration - 1) * batch_size)
-    candidate: list[dict[str, Any]] = []
-
-    for item in items:
-        rows = await _fetch_inventory_for_item(
-            connection,
-            item,
+    criteria: _CandidateFilter,
+    fetch: InventoryFetchOptions | None = None,
+    pager: InventoryPager | None = None,
+    store: CandidateStore | None = None,
+    engine: InventoryScoringEngine | None = None,
+) -> list[list[dict[str, Any]]]:
+    """Return each item's candidates passing ``criteria``, or every candidate when none pass.
+
+    PostgreSQL applies the threshold, so only matching rows are transferred; the unfiltered
+    query only runs when no candidate matches at all. Rows that matched but were read or
+    shown by an earlier iteration still count as matches, so an iteration can come back empty
+    instead of falling back.
+    """
+    if not criteria.is_empty:
+        filtered = await _gather_candidate_groups(
+            pool, items, iteration, batch_size, search_order, fetch, pager, store, engine, criteria=criteria
+        )
+        if (
+            any(filtered)
+            or (pager is not None and pager.matched(items, search_order, criteria.matches))
+            or (store is not None and store.holds(items, search_order, criteria.matches))
+        ):
+            return filtered
+    return await _gather_candidate_groups(
+        pool, items, iteration, batch_size, search_order, fetch, pager, store, engine
+    )
+
+
+async def _gather_candidate_groups(
+    pool: DatabasePool,
+    items: Sequence[FailedItem],
+    iteration: int,
+    batch_size: int,
+    search_order: str,
+    fetch: InventoryFetchOptions | None = None,
+    pager: InventoryPager | None = None,
+    store: CandidateStore | None = None,
+    engine: InventoryScoringEngine | None = None,
+    *,
+    criteria: _CandidateFilter = _NO_FILTER,
+) -> list[list[dict[str, Any]]]:
+    """Return this iteration's candidate rows as one list per item in ``items``."""
+    iteration = max(1, iteration)
+    if store is None:
+        return await _fetch_candidate_groups(
+            pool, items, iteration, batch_size, search_order, fetch, pager, engine, criteria=criteria
+        )
+
+    # Only line items whose page for this iteration is not cached yet go to PostgreSQL;
+    # earlier pages, and rows stored at other thresholds that pass this one, come back
+    # from the store. Items whose entry a change evicted lost their earlier pages as well,
+    # and their pager positions point into rows that may have moved, so they are read again
+    # from the first row.
+    threshold = criteria.params()
+    missing = store.missing(items, search_order, iteration, threshold)
+    evicted = store.evicted(missing, search_order) if iteration > 1 else []
+    if evicted and pager is not None:
+        pager.reset(evicted, search_order)
+    evicted_ids = {id(item) for item in evicted}
+    fresh = [item for item in missing if id(item) not in evicted_ids]
+    for requested, from_start in ((fresh, False), (evicted, True)):
+        if not requested:
+            continue
+        grouped = await _fetch_candidate_groups(
+            pool,
+            requested,
+            iteration,
+            batch_size,
+            search_order,
+            fetch,
+            pager,
+            engine,
+            criteria=criteria,
+            from_start=from_start,
+        )
+        for item, rows in zip(requested, grouped):
+            store.add(item, search_order, iteration, rows, threshold)
+    return store.candidate_groups(items, search_order, iteration, threshold, criteria.matches)
+
+
+async def _fetch_candidate_groups(
+    pool: DatabasePool,
+    items: Sequence[FailedItem],
+    iteration: int,
+    batch_size: int,
+    search_order: str,
+    fetch: InventoryFetchOptions | None = None,
+    pager: InventoryPager | None = None,
+    engine: InventoryScoringEngine | None = None,
+    *,
+    criteria: _CandidateFilter = _NO_FILTER,
+    from_start: bool = False,
+) -> list[list[dict[str, Any]]]:
+    """Fetch this iteration's candidate rows, returned as one list per item in ``items``.
+
+    With ``from_start`` the rows of every page up to this iteration's are fetched at once.
+    """
+    fetch = fetch or InventoryFetchOptions()
+    requested = list(items)
+    cursors: list[InventoryCursor | None] | None = None
+    cursor_threshold = criteria.params()
+
+    if fetch.pagination == "keyset":
+        # Fixed-size pages over a fixed candidate set: iteration N reads page N only, resuming
+        # after the previous page's last sort tuple. Items the pager has no position for start
+        # from the first row; without a pager, page N is addressed by OFFSET.
+        page_size = batch_size * 2
+        fetch_limit = page_size * max(fetch.max_iterations, iteration)
+        window = page_size * iteration if from_start else page_size
+        if pager is not None and not from_start:
+            requested, cursors, cursor_threshold = pager.start_positions(
+                requested, search_order, iteration, criteria.params()
+            )
+        offset = 0 if cursors is not None or from_start else (iteration - 1) * page_size
+    else:
+        fetch_limit = batch_size * iteration * 2
+        offset = 0 if from_start else (iteration - 1) * batch_size
+        window = fetch_limit
+
+    if not requested:
+        return [[] for _ in items]
+
+    if fetch.backend == "vectorized":
+        grouped = await (engine or InventoryScoringEngine()).search(
+            pool,
+            requested,
             fetch_limit=fetch_limit,
             offset=offset,
-            window=fetch_limit,
+            window=window,
+            after=(
+                [(c.sort_key_1, c.sort_key_2, c.sort_key_3, c.inventory_id) if c else None for c in cursors]
+                if cursors is not None
+                else None
+            ),
+            thresholds=criteria.params(),
+            cursor_thresholds=cursor_threshold,
+            search_order=_normalize_order(search_order),
+        )
+    elif fetch.mode == "concurrent":
+        grouped = await _fetch_inventory_concurrently(
+            pool,
+            requested,
+            concurrency=fetch.concurrency,
+            fetch_limit=fetch_limit,
+            offset=offset,
+            window=window,
+            cursors=cursors,
+            criteria=criteria,
+            cursor_threshold=cursor_threshold,
             search_order=search_order,
         )
-        candidate.extend(rows)
-    return candidate
+    else:
+        name = "inventory_search_batch" if fetch.mode == "batched" else "inventory_search_item"
+        async with query_metrics().checkout(pool, name) as connection:
+            if fetch.mode == "batched":
+                grouped = await _fetch_inventory_for_items(
+                    connection,
+                    requested,
+                    fetch_limit=fetch_limit,
+                    offset=offset,
+                    window=window,
+                    cursors=cursors,
+                    criteria=criteria,
+                    cursor_threshold=cursor_threshold,
+                    search_order=search_order,
+                )
+            else:
+                statements = _INVENTORY_STATEMENTS.bind(connection)
+                grouped = [
+                    await _fetch_inventory_for_item(
+                        statements,
+                        item,
+                        fetch_limit=fetch_limit,
+                        offset=offset,
+                        window=window,
+                        cursor=cursors[position] if cursors is not None else None,
+                        criteria=criteria,
+                        cursor_threshold=cursor_threshold,
+                        search_order=search_order,
+                    )
+                    for position, item in enumerate(requested)
+                ]
+
+    if pager is not None and fetch.pagination == "keyset":
+        for item, rows in zip(requested, grouped):
+            pager.record(item, search_order, iteration, rows, window, criteria.params())
+
+    # Items the pager skipped as exhausted get an empty page so results line up with ``items``.
+    by_item = {id(item): rows for item, rows in zip(requested, grouped)}
+    return [by_item.get(id(item), []) for item in items]
+
+
+async def _fetch_inventory_concurrently(
+    pool: DatabasePool,
+    items: Sequence[FailedItem],
+    *,
+    concurrency: int,
+    fetch_limit: int,
+    offset: int,
+    window: int,
+    cursors: Sequence[InventoryCursor | None] | None,
+    criteria: _CandidateFilter = _NO_FILTER,
+    cursor_threshold: tuple[Any, ...] = _NO_FILTER.params(),
+    search_order: str,
+) -> list[list[dict[str, Any]]]:
+    """Fan per-item searches out over pooled connections and reassemble them in item order."""
+    results: list[list[dict[str, Any]]] = [[] for _ in items]
+    positions = iter(range(len(items)))
+
+    async def worker() -> None:
+        # Each worker keeps one connection for its whole share of items, so the search
+        # statement is prepared once per worker rather than once per item.
+        async with query_metrics().checkout(pool, "inventory_search_item") as connection:
+            statements = _INVENTORY_STATEMENTS.bind(connection)
+            for position in positions:
+                results[position] = await _fetch_inventory_for_item(
+                    statements,
+                    items[position],
+                    fetch_limit=fetch_limit,
+                    offset=offset,
+                    window=window,
+                    cursor=cursors[position] if cursors is not None else None,
+                    criteria=criteria,
+                    cursor_threshold=cursor_threshold,
+                    search_order=search_order,
+                )
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            for _ in range(min(concurrency, len(items))):
+                group.create_task(worker())
+    except BaseExceptionGroup as failures:
+        # The group cancels the other workers on the first failure; callers handle the
+        # worker's own error (pool timeouts, deadlines, asyncpg errors), not the group.
+        raise failures.exceptions[0]
+
+    return results
 
 
 async def _fetch_inventory_for_item(
-    connection: asyncpg.Connection,
+    statements: BoundStatements,
     item: FailedItem,
     *,
     fetch_limit: int,
     offset: int,
     window: int,
+    cursor: InventoryCursor | None = None,
+    criteria: _CandidateFilter = _NO_FILTER,
+    cursor_threshold: tuple[Any, ...] = _NO_FILTER.params(),
     search_order: str,
 ) -> list[dict[str, Any]]:
-    order_sql = _ORDER_BY_MAP.get(search_order, _ORDER_BY_MAP["urgency_first"])
-    query = _BASE_INVENTORY_QUERY_TEMPLATE.format(
-        _distance_sql=_DISTANCE_SQL,
-        order_clause=order_sql,
-    )
-
     scn_id = item.scn_id
+    after = (
+        (cursor.sort_key_1, cursor.sort_key_2, cursor.sort_key_3, cursor.inventory_id)
+        if cursor is not None
+        else _NO_CURSOR
+    )
     params = (
         item.line_item_id,
         fetch_limit,
         scn_id,
         offset,
         window,
+        *after,
+        *criteria.params(),
+        *cursor_threshold,
     )
 
-    records = await connection.fetch(query, *params)
+    records = await query_metrics().fetch_statement(
+        "inventory_search_item", statements, _statement_key(search_order, batched=False), *params
+    )
     return [dict(record) for record in records]
 
 
-def _sort_option_dicts(options: Sequence[dict[str, Any]], search_order: str) -> list[dict[str, Any]]:
-    if search_order == "availability_first":
-        key_func = lambda opt: (
-            -opt["availability_score"],
-            -opt["compatibility_score"],
-            opt["distance_km"] if opt["distance_km"] is not None else float("inf"),
+async def _fetch_inventory_for_items(
+    connection: asyncpg.Connection,
+    items: Sequence[FailedItem],
+    *,
+    fetch_limit: int,
+    offset: int,
+    window: int,
+    cursors: Sequence[InventoryCursor | None] | None = None,
+    criteria: _CandidateFilter = _NO_FILTER,
+    cursor_threshold: tuple[Any, ...] = _NO_FILTER.params(),
+    search_order: str,
+) -> list[list[dict[str, Any]]]:
+    """Run the per-item search for all items at once, keeping per-item order and limits."""
+    if not items:
+        return []
+
+    # One execution per checkout, so rely on asyncpg's statement cache instead of an
+    # explicit prepare round trip.
+    query = _INVENTORY_STATEMENTS.sql(_statement_key(search_order, batched=True))
+    after = cursors if cursors is not None else [None] * len(items)
+    params = (
+        [item.line_item_id for item in items],
+        [item.scn_id for item in items],
+        fetch_limit,
+        offset,
+        window,
+        [cursor.sort_key_1 if cursor else None for cursor in after],
+        [cursor.sort_key_2 if cursor else None for cursor in after],
+        [cursor.sort_key_3 if cursor else None for cursor in after],
+        [cursor.inventory_id if cursor else None for cursor in after],
+        *criteria.params(),
+        *cursor_threshold,
+    )
+
+    records = await query_metrics().fetch("inventory_search_batch", connection, query, *params)
+    grouped: dict[UUID, list[dict[str, Any]]] = {item.line_item_id: [] for item in items}
+    for record in records:
+        row = dict(record)
+        grouped.setdefault(row["source_line_item_id"], []).append(row)
+    return [grouped[item.line_item_id] for item in items]
+
+
+def _normalize_order(search_order: str) -> str:
+    return search_order if search_order in _SORT_KEY_MAP else "urgency_first"
+
+
+def _statement_key(search_order: str, *, batched: bool) -> str:
+    return f"{'batch' if batched else 'item'}:{_normalize_order(search_order)}"
+
+
+def _build_inventory_query(search_order: str, *, batched: bool) -> str:
+    sort_key_1, sort_key_2, sort_key_3 = _SORT_KEY_MAP[search_order]
+    sort_keys = {"sort_key_1": sort_key_1, "sort_key_2": sort_key_2, "sort_key_3": sort_key_3}
+    if not batched:
+        ctes = _INVENTORY_CTES_TEMPLATE.format(
+            source_columns="",
+            search_source="fn_emergency_inventory_candidates($1::uuid, $2::int) AS search",
+            scn_param="$3::uuid",
+            scn_ids="$3::uuid",
+            **sort_keys,
         )
-    elif search_order == "proximity_first":
-        key_func = lambda opt: (
-            opt["distance_km"] if opt["distance_km"] is not None else float("inf"),
-            -opt["compatibility_score"],
-            -opt["availability_score"],
+        predicate = _CANDIDATE_PREDICATE_TEMPLATE.format(
+            after_key_1_param="$6::double precision",
+            after_key_2_param="$7::int",
+            after_key_3_param="$8::int",
+            after_id_param="$9::uuid",
         )
-    else:
-        key_func = lambda opt: (
-            -opt["urgency_score"],
-            -opt["compatibility_score"],
-            -opt["availability_score"],
+        return _ITEM_INVENTORY_QUERY_TEMPLATE.format(
+            ctes=ctes, predicate=predicate, order_clause=_KEYSET_ORDER_CLAUSE
         )
-    return sorted(options, key=key_func)
 
+    ctes = _INVENTORY_CTES_TEMPLATE.format(
+        source_columns="\n        request.line_item_id AS source_line_item_id,\n        request.position AS source_position,",
+        search_source=(
+            "fn_emergency_inventory_search_batch($1::uuid[], array_fill($3::int, ARRAY[cardinality($1::uuid[])]))"
+            " AS search\n    JOIN request ON request.line_item_id = search.source_line_item_id"
+        ),
+        scn_param="request.scn_id",
+        scn_ids="SELECT request.scn_id FROM request",
+        **sort_keys,
+    )
+    predicate = _CANDIDATE_PREDICATE_TEMPLATE.format(
+        after_key_1_param="request.after_key_1",
+        after_key_2_param="request.after_key_2",
+        after_key_3_param="request.after_key_3",
+        after_id_param="request.after_id",
+    )
+    return _BATCH_INVENTORY_QUERY_TEMPLATE.format(
+        ctes=ctes, predicate=predicate, order_clause=_KEYSET_ORDER_CLAUSE
+    )
+
+
+# Every search order is rendered once per process; per-item variants are prepared lazily on
+# the connections that execute them.
+_INVENTORY_STATEMENTS = StatementRegistry(
+    {
+        _statement_key(order, batched=batched): _build_inventory_query(order, batched=batched)
+        for order in _SORT_KEY_MAP
+        for batched in (False, True)
+    }
+)
+
+
+def _availability_first_key(option: Mapping[str, Any]) -> tuple[float, float, float]:
+    distance = option["distance_km"]
+    return (
+        -option["availability_score"],
+        -option["compatibility_score"],
+        distance if distance is not None else _NO_DISTANCE,
+    )
+
+
+def _proximity_first_key(option: Mapping[str, Any]) -> tuple[float, float, float]:
+    distance = option["distance_km"]
+    return (
+        distance if distance is not None else _NO_DISTANCE,
+        -option["compatibility_score"],
+        -option["availability_score"],
+    )
+
+
+def _urgency_first_key(option: Mapping[str, Any]) -> tuple[float, float, float]:
+    return (-option["urgency_score"], -option["compatibility_score"], -option["availability_score"])
+
+
+_NO_DISTANCE = float("inf")
+
+_OPTION_SORT_KEYS: dict[str, Callable[[Mapping[str, Any]], tuple[float, float, float]]] = {
+    "availability_first": _availability_first_key,
+    "proximity_first": _proximity_first_key,
+}
+
+
+def _merge_top_options(
+    groups: Sequence[Sequence[dict[str, Any]]], search_order: str, batch_size: int
+) -> list[dict[str, Any]]:
+    """Merge per-item candidate lists into the first ``batch_size`` unique options.
+
+    Each list is ordered on its precomputed sort key, which costs one linear pass when
+    PostgreSQL already returned it in that order, and a heap over the list heads then
+    yields options in global order. Repeated inventory records are skipped and the merge
+    stops as soon as ``batch_size`` options are out, so the bulk of the candidates is never
+    ordered. Ties keep item order, then row order, as a stable sort of the concatenated
+    lists would.
+    """
+    key_func = _OPTION_SORT_KEYS.get(search_order, _urgency_first_key)
+    streams: list[list[tuple[tuple[float, float, float], dict[str, Any]]]] = []
+    heap: list[tuple[tuple[float, float, float], int, int]] = []
+    for rows in groups:
+        if not rows:
+            continue
+        keyed = sorted(((key_func(row), row) for row in rows), key=itemgetter(0))
+        heap.append((keyed[0][0], len(streams), 0))
+        streams.append(keyed)
+    heapq.heapify(heap)
 
-def _deduplicate_and_limit(options: Sequence[dict[str, Any]], batch_size: int) -> list[dict[str, Any]]:
     seen: set[UUID] = set()
     limited: list[dict[str, Any]] = []
-    for option in options:
+    while heap:
+        _, stream_index, position = heap[0]
+        stream = streams[stream_index]
+        option = stream[position][1]
+        position += 1
+        if position < len(stream):
+            heapq.heapreplace(heap, (stream[position][0], stream_index, position))
+        else:
+            heapq.heappop(heap)
+
         inventory_id = option["inventory_id"]
-        if inventory_id not in seen:
-            seen.add(inventory_id)
-            limited.append(option)
+        if inventory_id in seen:
+            continue
+        seen.add(inventory_id)
+        limited.append(option)
         if len(limited) >= batch_size:
             break
     return limited
 
 
-def _to_inventory_option(payload: dict[str, Any]) -> InventoryOption:
-    data = {
-        "inventory_id": payload["inventory_id"],
-        "warehouse_id": payload["warehouse_id"],
-        "warehouse_name": payload["warehouse_name"],
-        "material_description": payload["material_description"],
-        "available_quantity": payload["available_quantity"],
-        "reserved_quantity": payload["reserved_quantity"],
-        "soft_available_quantity": payload["soft_available_quantity"],
-        "hard_available_quantity": payload["hard_available_quantity"],
-        "approval_requirement": payload["approval_requirement"],
-        "impact_level": payload["impact_level"],
-        "estimated_recovery_days": payload["estimated_recovery_days"],
-        "risk_summary": payload["risk_summary"],
-        "distance_km": payload["distance_km"],
-    }
-    return InventoryOption.from_mapping(data)
-
-
 __all__ = [
+    "FailedItemCache",
+    "InventoryCursor",
+    "InventoryFetchOptions",
+    "InventoryPager",
     "load_failed_items",
     "load_inventory_by_iteration",
     "load_by_time_window",
     "load_by_priority_level",
     "load_by_distance_band",
+    "scenario_project_name",
+    "stream_inventory_options",
 ]
@@ -0,0 +1,608 @@
+"""Shared asyncpg connection pool owned by a single accommodation analysis run."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import itertools
+import math
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Mapping, Sequence
+
+import asyncpg  # type: ignore[import-untyped]
+
+from config.loader import ConfigurationError
+
+__all__ = [
+    "ConnectionHook",
+    "DatabasePool",
+    "DatabasePoolError",
+    "PoolMetrics",
+    "PoolSettings",
+    "ReadRoutingStats",
+    "ReplicaSettings",
+    "SnapshotSession",
+    "register_compact_codecs",
+]
+
+logger = logging.getLogger(__name__)
+
+ConnectionHook = Callable[[asyncpg.Connection], Awaitable[None]]
+
+READ_ROUTING_MODES = ("round_robin", "least_busy")
+
+CODEC_PROFILES = ("default", "compact")
+
+# Seconds a standby is behind the primary, or NULL when it has never replayed a
+# transaction. A standby that has replayed everything it received counts as current even
+# when the primary has been idle, so quiet periods do not look like lag.
+_REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM clock_timestamp() - pg_last_xact_replay_timestamp())
+END::float8
+"""
+
+
+class DatabasePoolError(RuntimeError):
+    """Raised when the shared connection pool cannot be used."""
+
+    def __init__(self, message: str, code: str = "D400", *, cause: Exception | None = None) -> None:
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.__cause__ = cause
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Sizing and warm-up options for the analysis connection pool."""
+
+    min_size: int = 1
+    max_size: int = 4
+    warmup: bool = True
+    acquire_timeout: float | None = None
+    codec_profile: str = "default"
+
+    def __post_init__(self) -> None:
+        if self.codec_profile not in CODEC_PROFILES:
+            raise ConfigurationError(
+                f"db_codec_profile must be one of {', '.join(CODEC_PROFILES)}",
+                code="C116",
+            )
+        if self.min_size < 0:
+            raise ConfigurationError("db_pool_min_size must be zero or greater", code="C116")
+        if self.max_size < 1 or self.max_size < self.min_size:
+            raise ConfigurationError(
+                "db_pool_max_size must be at least 1 and not smaller than db_pool_min_size",
+                code="C116",
+            )
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> PoolSettings:
+        """Build pool settings from the merged search parameters."""
+        timeout = config.get("db_pool_acquire_timeout_seconds")
+        return cls(
+            min_size=int(config.get("db_pool_min_size", cls.min_size)),
+            max_size=int(config.get("db_pool_max_size", cls.max_size)),
+            warmup=bool(config.get("db_pool_warmup", cls.warmup)),
+            acquire_timeout=float(timeout) if timeout is not None else None,
+            codec_profile=str(config.get("db_codec_profile", cls.codec_profile)),
+        )
+
+
+@dataclass(frozen=True)
+class ReplicaSettings:
+    """Read DSNs and routing options for the read-only analysis queries."""
+
+    dsns: tuple[str, ...] = ()
+    routing: str = "round_robin"
+    max_lag_seconds: float = 30.0
+    lag_check_interval: float = 5.0
+
+    def __post_init__(self) -> None:
+        if self.routing not in READ_ROUTING_MODES:
+            raise ConfigurationError(
+                f"db_read_routing must be one of {', '.join(READ_ROUTING_MODES)}",
+                code="C117",
+            )
+        if self.max_lag_seconds < 0 or self.lag_check_interval < 0:
+            raise ConfigurationError(
+                "db_replica_max_lag_seconds and db_replica_lag_check_seconds must be zero or greater",
+                code="C117",
+            )
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any], dsns: Sequence[str] = ()) -> ReplicaSettings:
+        """Build routing options from the merged search parameters and the configured read DSNs."""
+        return cls(
+            dsns=tuple(dsn.strip() for dsn in dsns if dsn.strip()),
+            routing=str(config.get("db_read_routing", cls.routing)),
+            max_lag_seconds=float(config.get("db_replica_max_lag_seconds", cls.max_lag_seconds)),
+            lag_check_interval=float(config.get("db_replica_lag_check_seconds", cls.lag_check_interval)),
+        )
+
+
+@dataclass(slots=True)
+class ReadRoutingStats:
+    """Where read-only checkouts were served and why any of them fell back to the primary."""
+
+    replica_reads: int = 0
+    primary_reads: int = 0
+    lag_checks: int = 0
+    lagging: int = 0
+    failures: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "lag_checks": self.lag_checks,
+            "lagging": self.lagging,
+            "failures": self.failures,
+        }
+
+
+@dataclass(slots=True)
+class PoolMetrics:
+    """Wait-time and utilization counters collected while the pool is open."""
+
+    max_size: int
+    acquisitions: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    in_use: int = 0
+    peak_in_use: int = 0
+    busy_connection_seconds: float = 0.0
+    opened_at: float = field(default_factory=time.perf_counter)
+    _last_change: float = field(default_factory=time.perf_counter, repr=False)
+
+    def record_acquire(self, wait_seconds: float) -> None:
+        self._accumulate()
+        self.acquisitions += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def record_release(self) -> None:
+        self._accumulate()
+        self.in_use = max(0, self.in_use - 1)
+
+    @property
+    def mean_wait_seconds(self) -> float:
+        if not self.acquisitions:
+            return 0.0
+        return self.total_wait_seconds / self.acquisitions
+
+    @property
+    def utilization(self) -> float:
+        """Time-weighted share of pool capacity that was checked out."""
+        self._accumulate()
+        elapsed = self._last_change - self.opened_at
+        if elapsed <= 0 or self.max_size <= 0:
+            return 0.0
+        return self.busy_connection_seconds / (elapsed * self.max_size)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize the metrics to a JSON-safe dictionary."""
+        return {
+            "max_size": self.max_size,
+            "acquisitions": self.acquisitions,
+            "mean_wait_ms": round(self.mean_wait_seconds * 1000, 3),
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "utilization": round(self.utilization, 4),
+        }
+
+    def _accumulate(self) -> None:
+        now = time.perf_counter()
+        self.busy_connection_seconds += self.in_use * (now - self._last_change)
+        self._last_change = now
+
+
+@dataclass(slots=True)
+class _Replica:
+    name: str
+    pool: DatabasePool
+    lag_seconds: float | None = None
+    checked_at: float = -math.inf
+
+
+_REPLICA_ERRORS = (DatabasePoolError, OSError, asyncpg.PostgresError, asyncpg.InterfaceError)
+
+
+@dataclass
+class _SessionMember:
+    connection: asyncpg.Connection
+    stack: AsyncExitStack
+
+
+class SnapshotSession:
+    """Pooled connections sharing one exported ``REPEATABLE READ READ ONLY`` snapshot.
+
+    The first connection begins the transaction and exports its snapshot; connections
+    added for concurrent checkouts import it. Every joined connection stays in its
+    transaction and is handed out again until the session closes, so each one pays for
+    ``BEGIN`` and the snapshot import once per run rather than once per statement.
+    A checkout that ends in an error drops its connection, since the error may have
+    aborted the transaction; once the exporting connection is gone no new connection can
+    join.
+    """
+
+    def __init__(self, source: DatabasePool, server: str) -> None:
+        self.server = server
+        self.snapshot_id: str | None = None
+        self.connections = 0
+        self.checkouts = 0
+        self.discarded = 0
+        self._source = source
+        self._members: list[_SessionMember] = []
+        self._idle: list[_SessionMember] = []
+        # Joined connections are never returned to the pool, so checkouts beyond its size
+        # wait here for an idle member instead of waiting on the pool forever.
+        self._capacity = asyncio.Semaphore(source.settings.max_size)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "server": self.server,
+            "snapshot_id": self.snapshot_id,
+            "connections": self.connections,
+            "checkouts": self.checkouts,
+            "discarded": self.discarded,
+        }
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[asyncpg.Connection]:
+        async with self._capacity:
+            member = self._idle.pop() if self._idle else await self._join()
+            self.checkouts += 1
+            try:
+                yield member.connection
+            except GeneratorExit:
+                # A closed async generator (such as an early-stopped stream) unwinds its
+                # own transaction blocks before this point; the connection is still usable.
+                self._idle.append(member)
+                raise
+            except BaseException as exc:
+                self.discarded += 1
+                self._members.remove(member)
+                await member.stack.__aexit__(type(exc), exc, exc.__traceback__)
+                raise
+            self._idle.append(member)
+
+    async def close(self) -> None:
+        members, self._members = self._members, []
+        self._idle.clear()
+        for member in reversed(members):
+            await member.stack.aclose()
+
+    async def _join(self) -> _SessionMember:
+        stack = AsyncExitStack()
+        try:
+            connection = await stack.enter_async_context(self._source._acquire_pooled())
+            await stack.enter_async_context(connection.transaction(isolation="repeatable_read", readonly=True))
+            if self.snapshot_id is None:
+                self.snapshot_id = await connection.fetchval("SELECT pg_export_snapshot()")
+            else:
+                await connection.execute(f"SET TRANSACTION SNAPSHOT '{self.snapshot_id}'")
+        except BaseException as exc:
+            await stack.__aexit__(type(exc), exc, exc.__traceback__)
+            if isinstance(exc, asyncpg.PostgresError) and self.snapshot_id is not None:
+                raise DatabasePoolError(
+                    f"Unable to join snapshot {self.snapshot_id} on {self.server}", code="D405", cause=exc
+                ) from exc
+            raise
+        member = _SessionMember(connection, stack)
+        self._members.append(member)
+        self.connections += 1
+        return member
+
+
+class DatabasePool:
+    """Owns the asyncpg pool shared by every database call of an analysis run.
+
+    With read DSNs configured, :meth:`acquire_read` serves read-only queries from the
+    replicas, skipping any that are unreachable or further behind than the allowed lag and
+    falling back to the primary when none qualify. While :meth:`snapshot_session` is open,
+    :meth:`acquire` and :meth:`acquire_read` both hand out the session's connections.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        settings: PoolSettings | None = None,
+        *,
+        init_hooks: Sequence[ConnectionHook] = (),
+        replicas: ReplicaSettings | None = None,
+    ) -> None:
+        self._dsn = dsn
+        self._settings = settings or PoolSettings()
+        self._init_hooks: list[ConnectionHook] = list(init_hooks)
+        self._pool: asyncpg.Pool | None = None
+        self._metrics = PoolMetrics(max_size=self._settings.max_size)
+        self._replica_settings = replicas or ReplicaSettings()
+        self._replicas: list[_Replica] = []
+        self._read_turn = itertools.count()
+        self._read_stats = ReadRoutingStats()
+        self._session: SnapshotSession | None = None
+        self._session_state_pids: set[int] = set()
+
+    @property
+    def settings(self) -> PoolSettings:
+        return self._settings
+
+    @property
+    def metrics(self) -> PoolMetrics:
+        return self._metrics
+
+    @property
+    def read_stats(self) -> ReadRoutingStats:
+        return self._read_stats
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    @property
+    def session(self) -> SnapshotSession | None:
+        return self._session
+
+    def replica_metrics(self) -> dict[str, dict[str, Any]]:
+        """Pool metrics and last measured lag of every open read replica."""
+        return {
+            replica.name: {**replica.pool.metrics.to_dict(), "lag_seconds": replica.lag_seconds}
+            for replica in self._replicas
+        }
+
+    def add_init_hook(self, hook: ConnectionHook) -> None:
+        """Register a coroutine run once on every new physical connection."""
+        if self._pool is not None:
+            raise DatabasePoolError("Init hooks must be registered before the pool is opened", code="D401")
+        self._init_hooks.append(hook)
+
+    def mark_session_state(self, connection: asyncpg.Connection) -> None:
+        """Have ``connection`` fully reset on release because it changed session state.
+
+        Callers that ``LISTEN``, ``SET`` session variables or take advisory locks must mark
+        their connection; every other checkout is returned to the pool without a reset.
+        """
+        self._session_state_pids.add(connection.get_server_pid())
+
+    async def open(self) -> DatabasePool:
+        if self._pool is not None:
+            return self
+        try:
+            self._pool = await asyncpg.create_pool(
+                self._dsn,
+                min_size=self._settings.min_size,
+                max_size=self._settings.max_size,
+                init=self._init_connection,
+                reset=self._reset_connection,
+            )
+        except (OSError, asyncpg.PostgresError) as exc:
+            raise DatabasePoolError("Unable to open database connection pool", code="D402", cause=exc) from exc
+
+        self._metrics = PoolMetrics(max_size=self._settings.max_size)
+        if self._settings.warmup:
+            await self._warm_up()
+        await self._open_replicas()
+        return self
+
+    async def close(self) -> None:
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        replicas, self._replicas = self._replicas, []
+        for replica in replicas:
+            await replica.pool.close()
+        await pool.close()
+
+    async def __aenter__(self) -> DatabasePool:
+        return await self.open()
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        await self.close()
+
+    @asynccontextmanager
+    async def snapshot_session(self) -> AsyncIterator[SnapshotSession]:
+        """Serve every checkout until exit from one read-only snapshot.
+
+        The snapshot is taken on the first current read replica, or on the primary when
+        none qualifies, and every connection of the session comes from that server.
+        """
+        if self._session is not None:
+            raise DatabasePoolError("A snapshot session is already open", code="D406")
+        session: SnapshotSession | None = None
+        for replica in await self._read_candidates():
+            candidate = SnapshotSession(replica.pool, replica.name)
+            try:
+                async with candidate.connection():
+                    pass
+            except _REPLICA_ERRORS as exc:
+                self._mark_failed(replica, exc)
+                continue
+            session = candidate
+            break
+        if session is None:
+            session = SnapshotSession(self, "primary")
+            async with session.connection():
+                pass
+
+        self._session = session
+        try:
+            yield session
+        finally:
+            self._session = None
+            await session.close()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        """Check out a pooled connection, recording how long the caller waited."""
+        if self._session is not None:
+            async with self._session.connection() as connection:
+                yield connection
+            return
+        async with self._acquire_pooled() as connection:
+            yield connection
+
+    @asynccontextmanager
+    async def _acquire_pooled(self) -> AsyncIterator[asyncpg.Connection]:
+        if self._pool is None:
+            raise DatabasePoolError("Connection pool is not open", code="D403")
+
+        start = time.perf_counter()
+        try:
+            context = self._pool.acquire(timeout=self._settings.acquire_timeout)
+            connection = await context.__aenter__()
+        except asyncio.TimeoutError as exc:
+            raise DatabasePoolError(
+                f"Timed out after {self._settings.acquire_timeout}s waiting for a pooled connection",
+                code="D404",
+                cause=exc,
+            ) from exc
+
+        self._metrics.record_acquire(time.perf_counter() - start)
+        try:
+            yield connection
+        finally:
+            self._metrics.record_release()
+            await context.__aexit__(None, None, None)
+
+    @asynccontextmanager
+    async def acquire_read(self) -> AsyncIterator[asyncpg.Connection]:
+        """Check out a connection for read-only queries, preferring a current read replica."""
+        if self._session is not None:
+            if self._session.server == "primary":
+                self._read_stats.primary_reads += 1
+            else:
+                self._read_stats.replica_reads += 1
+            async with self._session.connection() as connection:
+                yield connection
+            return
+        async with AsyncExitStack() as stack:
+            connection: asyncpg.Connection | None = None
+            for replica in await self._read_candidates():
+                try:
+                    connection = await stack.enter_async_context(replica.pool.acquire())
+                except _REPLICA_ERRORS as exc:
+                    self._mark_failed(replica, exc)
+                    continue
+                self._read_stats.replica_reads += 1
+                break
+            if connection is None:
+                connection = await stack.enter_async_context(self.acquire())
+                self._read_stats.primary_reads += 1
+            yield connection
+
+    async def _open_replicas(self) -> None:
+        for index, dsn in enumerate(self._replica_settings.dsns, start=1):
+            name = f"replica{index}"
+            pool = DatabasePool(dsn, self._settings, init_hooks=self._init_hooks)
+            try:
+                await pool.open()
+            except DatabasePoolError as exc:
+                logger.warning("Read replica %s is unavailable; its reads go to the primary: %s", name, exc)
+                self._read_stats.failures += 1
+                continue
+            self._replicas.append(_Replica(name, pool))
+        await asyncio.gather(*(self._check_lag(replica) for replica in self._replicas))
+
+    async def _read_candidates(self) -> list[_Replica]:
+        """Usable replicas in the order they should be tried for the next read."""
+        if not self._replicas:
+            return []
+        settings = self._replica_settings
+        now = time.monotonic()
+        due = [replica for replica in self._replicas if now - replica.checked_at >= settings.lag_check_interval]
+        if due:
+            await asyncio.gather(*(self._check_lag(replica) for replica in due))
+
+        usable = [
+            replica
+            for replica in self._replicas
+            if replica.lag_seconds is not None and replica.lag_seconds <= settings.max_lag_seconds
+        ]
+        if not usable:
+            return []
+        start = next(self._read_turn) % len(usable)
+        ordered = usable[start:] + usable[:start]
+        if settings.routing == "least_busy":
+            # The sort is stable, so replicas that are equally busy still take turns.
+            ordered.sort(key=lambda replica: replica.pool.metrics.in_use / replica.pool.settings.max_size)
+        return ordered
+
+    async def _check_lag(self, replica: _Replica) -> None:
+        # Stamp the check before awaiting so concurrent reads keep using the last result.
+        replica.checked_at = time.monotonic()
+        self._read_stats.lag_checks += 1
+        try:
+            async with replica.pool.acquire() as connection:
+                lag = await connection.fetchval(_REPLICA_LAG_QUERY)
+        except _REPLICA_ERRORS as exc:
+            self._mark_failed(replica, exc)
+            return
+
+        was_current = replica.lag_seconds is not None and replica.lag_seconds <= self._replica_settings.max_lag_seconds
+        replica.lag_seconds = math.inf if lag is None else float(lag)
+        if replica.lag_seconds > self._replica_settings.max_lag_seconds:
+            self._read_stats.lagging += 1
+            if was_current:
+                logger.warning(
+                    "Read replica %s is %.1fs behind the primary; routing its reads to the primary",
+                    replica.name,
+                    replica.lag_seconds,
+                )
+
+    def _mark_failed(self, replica: _Replica, exc: BaseException) -> None:
+        if replica.lag_seconds is not None:
+            logger.warning("Read replica %s failed; routing its reads to the primary: %s", replica.name, exc)
+        replica.lag_seconds = None
+        replica.checked_at = time.monotonic()
+        self._read_stats.failures += 1
+
+    async def _init_connection(self, connection: asyncpg.Connection) -> None:
+        if self._settings.codec_profile == "compact":
+            await register_compact_codecs(connection)
+        for hook in self._init_hooks:
+            await hook(connection)
+
+    async def _reset_connection(self, connection: asyncpg.Connection) -> None:
+        # asyncpg has already rolled back any open transaction. A checkout that only ran
+        # queries leaves nothing else behind, so it skips the reset statement (RESET ALL,
+        # UNLISTEN *, CLOSE ALL and advisory unlocks) and the round trip it costs.
+        pid = connection.get_server_pid()
+        if pid not in self._session_state_pids:
+            return
+        self._session_state_pids.discard(pid)
+        reset_query = connection.get_reset_query()
+        if reset_query:
+            await connection.execute(reset_query)
+
+    async def _warm_up(self) -> None:
+        # Check out min_size connections at once so each one finishes its TLS/auth
+        # handshake and init hooks before the first iteration needs it.
+        assert self._pool is not None
+        async with AsyncExitStack() as stack:
+            connections = [
+                await stack.enter_async_context(self._pool.acquire())
+                for _ in range(self._settings.min_size)
+            ]
+            for connection in connections:
+                await connection.fetchval("SELECT 1")
+        logger.debug("Warmed %d pooled connections", len(connections))
+
+
+async def register_compact_codecs(connection: asyncpg.Connection) -> None:
+    """Decode ``numeric`` values as their text form instead of ``Decimal`` objects.
+
+    Most candidate rows are discarded before they become domain objects, so building four
+    ``Decimal`` quantities per row is wasted work; the models and the scoring engine convert
+    the text only for the rows they keep. UUIDs keep asyncpg's codec: its ``UUID`` already
+    wraps the 16 received bytes and derives everything else lazily, and plain text or bytes
+    ids would no longer compare equal to the ids held by failed items and change events.
+    """
+    await connection.set_type_codec("numeric", schema="pg_catalog", encoder=str, decoder=str, format="text")
@@ -0,0 +1,565 @@
+"""Columnar inventory snapshots exported with binary COPY and reloaded memory-mapped.
+
+A snapshot is a directory of NumPy ``.npy`` files, one per column, plus ``manifest.json``.
+It holds everything the vectorized scoring engine reads for one project: warehouse
+inventory with its reservation summary, raw reservations, warehouses, ROS dates, PO line
+items, SCN delivery warehouses and precomputed warehouse distances.
+
+Usage::
+
+    python inventory_snapshot.py export --scenario scenario1 --output snapshots/scenario1
+    python inventory_snapshot.py check --snapshot snapshots/scenario1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Mapping, Sequence
+from uuid import UUID
+
+import numpy as np
+from dotenv import load_dotenv
+
+from database import scenario_project_name
+from db_pool import DatabasePool
+from run_budget import call_timeout
+
+__all__ = [
+    "SNAPSHOT_FORMAT_VERSION",
+    "InventorySnapshot",
+    "InventorySnapshotError",
+    "export_inventory_snapshot",
+    "load_inventory_snapshot",
+    "snapshot_is_current",
+]
+
+# Bump whenever the table list, a query's columns or the on-disk layout changes.
+SNAPSHOT_FORMAT_VERSION = 1
+
+_MANIFEST = "manifest.json"
+
+# Quantities are exported as integer ten-thousandths, the scoring engine's NUMERIC(18,4) units.
+_QUANTITY_SCALE = 10_000
+
+_PGCOPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_POSTGRES_EPOCH_ORDINAL = date(2000, 1, 1).toordinal()
+
+# Fixed-width binary COPY types and the big-endian dtype each one is read as.
+_FIXED_WIDTH = {
+    "uuid": np.dtype("V16"),
+    "int8": np.dtype(">i8"),
+    "int4": np.dtype(">i4"),
+    "bool": np.dtype("u1"),
+    "date": np.dtype(">i4"),
+    "float8": np.dtype(">f8"),
+}
+
+
+class InventorySnapshotError(RuntimeError):
+    """Raised when a snapshot cannot be exported or read."""
+
+    def __init__(self, message: str, code: str = "S500", *, cause: Exception | None = None) -> None:
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.__cause__ = cause
+
+
+@dataclass(frozen=True, slots=True)
+class _Table:
+    name: str
+    query: str
+    columns: tuple[tuple[str, str], ...]
+
+
+# Every query takes the project id as $1 and returns rows in a stable order.
+_TABLES: tuple[_Table, ...] = (
+    _Table(
+        "inventory",
+        f"""
+        SELECT
+            wi.id,
+            wi.warehouse_id,
+            w.name AS warehouse_name,
+            COALESCE(cc.short_description, eq.description, 'Unspecified inventory') AS material_description,
+            wi.commodity_code_id,
+            wi.equipment_id,
+            wi.wbs_id,
+            (wi.quantity_available * {_QUANTITY_SCALE})::bigint AS quantity_available,
+            (wi.quantity_reserved * {_QUANTITY_SCALE})::bigint AS quantity_reserved,
+            (wi.quantity_hard_reserved * {_QUANTITY_SCALE})::bigint AS quantity_hard_reserved,
+            (wi.safety_stock_level * {_QUANTITY_SCALE})::bigint AS safety_stock_level,
+            wi.status = 'available' AS is_available,
+            res.next_required_by,
+            res.max_priority,
+            COALESCE(res.any_reassignable, FALSE) AS any_reassignable
+        FROM warehouse_inventory wi
+        JOIN warehouses w ON w.id = wi.warehouse_id
+        LEFT JOIN commodity_codes cc ON cc.id = wi.commodity_code_id
+        LEFT JOIN equipment_list eq ON eq.id = wi.equipment_id
+        LEFT JOIN inventory_reservation_summary res ON res.inventory_id = wi.id
+        WHERE wi.project_id = $1
+        ORDER BY wi.id
+        """,
+        (
+            ("id", "uuid"),
+            ("warehouse_id", "uuid"),
+            ("warehouse_name", "text"),
+            ("material_description", "text"),
+            ("commodity_code_id", "uuid"),
+            ("equipment_id", "uuid"),
+            ("wbs_id", "uuid"),
+            ("quantity_available", "int8"),
+            ("quantity_reserved", "int8"),
+            ("quantity_hard_reserved", "int8"),
+            ("safety_stock_level", "int8"),
+            ("is_available", "bool"),
+            ("next_required_by", "date"),
+            ("max_priority", "int4"),
+            ("any_reassignable", "bool"),
+        ),
+    ),
+    _Table(
+        "reservations",
+        f"""
+        SELECT
+            ir.id,
+            ir.inventory_id,
+            ir.reservation_type::text AS reservation_type,
+            (ir.reserved_quantity * {_QUANTITY_SCALE})::bigint AS reserved_quantity,
+            ir.required_by_date,
+            ir.priority_level,
+            ir.can_reassign
+        FROM inventory_reservations ir
+        JOIN warehouse_inventory wi ON wi.id = ir.inventory_id
+        WHERE wi.project_id = $1
+        ORDER BY ir.id
+        """,
+        (
+            ("id", "uuid"),
+            ("inventory_id", "uuid"),
+            ("reservation_type", "text"),
+            ("reserved_quantity", "int8"),
+            ("required_by_date", "date"),
+            ("priority_level", "int4"),
+            ("can_reassign", "bool"),
+        ),
+    ),
+    _Table(
+        "warehouses",
+        """
+        SELECT
+            w.id,
+            w.name::text AS name,
+            w.warehouse_code::text AS warehouse_code,
+            w.latitude::float8 AS latitude,
+            w.longitude::float8 AS longitude,
+            w.is_active
+        FROM warehouses w
+        WHERE w.project_id = $1
+        ORDER BY w.id
+        """,
+        (
+            ("id", "uuid"),
+            ("name", "text"),
+            ("warehouse_code", "text"),
+            ("latitude", "float8"),
+            ("longitude", "float8"),
+            ("is_active", "bool"),
+        ),
+    ),
+    _Table(
+        "ros_dates",
+        """
+        SELECT r.wbs_id, r.ros_date
+        FROM wbs_ros_dates r
+        WHERE r.wbs_id IN (SELECT wi.wbs_id FROM warehouse_inventory wi WHERE wi.project_id = $1)
+        ORDER BY r.wbs_id, r.ros_date
+        """,
+        (("wbs_id", "uuid"), ("ros_date", "date")),
+    ),
+    _Table(
+        "line_items",
+        """
+        SELECT
+            pli.id,
+            pli.commodity_code_id,
+            pli.equipment_id,
+            pli.wbs_id,
+            (SELECT MIN(r.ros_date) FROM wbs_ros_dates r WHERE r.wbs_id = pli.wbs_id) AS ros_date
+        FROM po_line_items pli
+        JOIN purchase_orders po ON po.id = pli.po_id
+        WHERE po.project_id = $1
+        ORDER BY pli.id
+        """,
+        (
+            ("id", "uuid"),
+            ("commodity_code_id", "uuid"),
+            ("equipment_id", "uuid"),
+            ("wbs_id", "uuid"),
+            ("ros_date", "date"),
+        ),
+    ),
+    _Table(
+        "scns",
+        """
+        SELECT s.id, s.delivery_warehouse_id
+        FROM scns s
+        WHERE s.project_id = $1
+        ORDER BY s.id
+        """,
+        (("id", "uuid"), ("delivery_warehouse_id", "uuid")),
+    ),
+    _Table(
+        "distances",
+        """
+        SELECT wd.from_warehouse_id, wd.to_warehouse_id, wd.distance_km
+        FROM warehouse_distances wd
+        WHERE wd.from_warehouse_id IN (SELECT s.delivery_warehouse_id FROM scns s WHERE s.project_id = $1)
+        ORDER BY wd.from_warehouse_id, wd.to_warehouse_id
+        """,
+        (("from_warehouse_id", "uuid"), ("to_warehouse_id", "uuid"), ("distance_km", "float8")),
+    ),
+)
+
+# One server-side digest over every exported row; only the 32-character hash crosses the wire.
+_DATA_VERSION_QUERY = "SELECT md5(concat_ws(':', {}))".format(
+    ", ".join(
+        f"(SELECT md5(COALESCE(string_agg(md5(q::text), '' ORDER BY md5(q::text)), '')) FROM ({table.query}) AS q)"
+        for table in _TABLES
+    )
+)
+
+_PROJECT_ID_QUERY = "SELECT id FROM projects WHERE name = $1;"
+
+
+@dataclass(frozen=True, slots=True)
+class InventorySnapshot:
+    """An exported snapshot bundle whose column arrays are memory-mapped from ``directory``."""
+
+    directory: Path
+    scenario: str
+    project_id: UUID
+    as_of_date: date
+    data_version: str
+    exported_at: datetime
+    row_counts: dict[str, int]
+    _arrays: dict[str, dict[str, np.ndarray]] = field(repr=False)
+
+    def columns(self, table: str) -> dict[str, np.ndarray]:
+        """Return a table's columns plus a ``<name>_valid`` mask for each of them.
+
+        UUIDs are ``V16`` values, dates are ordinals and text is decoded to ``object`` arrays;
+        NULL entries hold zero (or NaN for floats) and are flagged in the mask.
+        """
+        try:
+            arrays = self._arrays[table]
+        except KeyError as exc:
+            raise InventorySnapshotError(f"Snapshot has no table '{table}'", code="S501", cause=exc) from exc
+        columns: dict[str, np.ndarray] = {}
+        for name, kind in _table(table).columns:
+            values = arrays[name]
+            if kind == "text":
+                text = np.full(len(values), None, dtype=object)
+                present = values >= 0
+                text[present] = arrays[f"{name}.dict"].astype(object)[values[present]]
+                values = text
+            columns[name] = values
+            columns[f"{name}_valid"] = arrays.get(f"{name}.valid", np.ones(self.row_counts[table], dtype=bool))
+        return columns
+
+
+async def export_inventory_snapshot(
+    pool: DatabasePool, scenario_name: str, directory: Path | str
+) -> InventorySnapshot:
+    """Stream the scenario project's inventory tables into a snapshot bundle at ``directory``.
+
+    All tables are read in one repeatable-read transaction, so the files and the recorded
+    ``data_version`` describe the same database state.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    # Drop the old manifest first so an interrupted export never looks like a valid bundle.
+    (directory / _MANIFEST).unlink(missing_ok=True)
+
+    row_counts: dict[str, int] = {}
+    async with pool.acquire() as connection:
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            project_id = await connection.fetchval(
+                _PROJECT_ID_QUERY, scenario_project_name(scenario_name), timeout=call_timeout()
+            )
+            if project_id is None:
+                raise InventorySnapshotError(f"No project found for scenario '{scenario_name}'", code="S502")
+            as_of_date = await connection.fetchval("SELECT CURRENT_DATE", timeout=call_timeout())
+            data_version = await connection.fetchval(_DATA_VERSION_QUERY, project_id, timeout=call_timeout())
+
+            for table in _TABLES:
+                # Rows are decoded as the chunks arrive, so only a partial row is ever buffered.
+                reader = _BinaryCopyReader(table.columns)
+
+                async def feed(chunk: bytes) -> None:
+                    reader.feed(chunk)
+
+                await connection.copy_from_query(
+                    table.query, project_id, output=feed, format="binary", timeout=call_timeout()
+                )
+                row_counts[table.name] = _write_table(directory, table, reader.finish())
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "scenario": scenario_name,
+        "project_id": str(project_id),
+        "as_of_date": as_of_date.isoformat(),
+        "data_version": data_version,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "row_counts": row_counts,
+    }
+    staging = directory / f"{_MANIFEST}.tmp"
+    staging.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    staging.replace(directory / _MANIFEST)
+    return load_inventory_snapshot(directory)
+
+
+def load_inventory_snapshot(directory: Path | str) -> InventorySnapshot:
+    """Open a snapshot bundle; column files are memory-mapped, not read into memory."""
+    directory = Path(directory)
+    try:
+        manifest = json.loads((directory / _MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as exc:
+        raise InventorySnapshotError(
+            f"Unable to read snapshot manifest in {directory}", code="S503", cause=exc
+        ) from exc
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise InventorySnapshotError(
+            f"Snapshot format {manifest.get('format_version')} does not match {SNAPSHOT_FORMAT_VERSION}; re-export it",
+            code="S504",
+        )
+
+    arrays: dict[str, dict[str, np.ndarray]] = {}
+    try:
+        for table in _TABLES:
+            arrays[table.name] = {}
+            for name, kind in table.columns:
+                keys = [name, f"{name}.valid"] + ([f"{name}.dict"] if kind == "text" else [])
+                for key in keys:
+                    path = directory / f"{table.name}.{key}.npy"
+                    if not key.endswith(".valid") or path.exists():
+                        arrays[table.name][key] = np.load(path, mmap_mode="r", allow_pickle=False)
+        return InventorySnapshot(
+            directory=directory,
+            scenario=str(manifest["scenario"]),
+            project_id=UUID(manifest["project_id"]),
+            as_of_date=date.fromisoformat(manifest["as_of_date"]),
+            data_version=str(manifest["data_version"]),
+            exported_at=datetime.fromisoformat(manifest["exported_at"]),
+            row_counts={str(key): int(value) for key, value in manifest["row_counts"].items()},
+            _arrays=arrays,
+        )
+    except (OSError, KeyError, ValueError) as exc:
+        raise InventorySnapshotError(
+            f"Snapshot in {directory} is incomplete or corrupt", code="S505", cause=exc
+        ) from exc
+
+
+async def snapshot_is_current(pool: DatabasePool, snapshot: InventorySnapshot) -> bool:
+    """Whether the database still holds exactly the snapshot's rows as of the same day.
+
+    The comparison runs server-side and returns one hash, so checking is far cheaper than
+    re-exporting. Scores depend on the current date, so a snapshot from another day is stale.
+    """
+    async with pool.acquire() as connection:
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            today = await connection.fetchval("SELECT CURRENT_DATE", timeout=call_timeout())
+            data_version = await connection.fetchval(
+                _DATA_VERSION_QUERY, snapshot.project_id, timeout=call_timeout()
+            )
+    return today == snapshot.as_of_date and data_version == snapshot.data_version
+
+
+def _table(name: str) -> _Table:
+    for table in _TABLES:
+        if table.name == name:
+            return table
+    raise InventorySnapshotError(f"Unknown snapshot table '{name}'", code="S501")
+
+
+def _parse_binary_copy(
+    payload: bytes, columns: Sequence[tuple[str, str]]
+) -> dict[str, tuple[np.ndarray, np.ndarray, np.ndarray | None]]:
+    """Decode a complete ``COPY ... TO STDOUT (FORMAT binary)`` payload; see :class:`_BinaryCopyReader`."""
+    reader = _BinaryCopyReader(columns)
+    reader.feed(payload)
+    return reader.finish()
+
+
+class _BinaryCopyReader:
+    """Incremental decoder for a ``COPY ... TO STDOUT (FORMAT binary)`` stream.
+
+    :meth:`feed` takes the stream in whatever chunks the server sends and decodes every
+    complete row at once, keeping only the unfinished tail. :meth:`finish` returns
+    ``(values, valid, dictionary)`` per column. Text columns come back dictionary encoded:
+    ``values`` holds int32 codes into ``dictionary`` (-1 for NULL).
+    """
+
+    def __init__(self, columns: Sequence[tuple[str, str]]) -> None:
+        self._columns = columns
+        self._buffer = bytearray()
+        self._raw: list[list[bytes | None]] = [[] for _ in columns]
+        self._header_read = False
+        self._finished = False
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        consumed = self._read_header() if not self._header_read else 0
+        if self._header_read:
+            consumed = self._read_rows(consumed)
+        del self._buffer[:consumed]
+
+    def finish(self) -> dict[str, tuple[np.ndarray, np.ndarray, np.ndarray | None]]:
+        if not self._finished:
+            raise InventorySnapshotError("COPY output ended before its trailer", code="S506")
+        return {name: _decode_column(kind, values) for (name, kind), values in zip(self._columns, self._raw)}
+
+    def _read_header(self) -> int:
+        buffer = self._buffer
+        signature_length = len(_PGCOPY_SIGNATURE)
+        if not _PGCOPY_SIGNATURE.startswith(bytes(buffer[:signature_length])) or (
+            len(buffer) >= signature_length and not buffer.startswith(_PGCOPY_SIGNATURE)
+        ):
+            raise InventorySnapshotError("COPY output is not in binary format", code="S506")
+        if len(buffer) < signature_length + 8:
+            return 0
+        _flags, extension_length = struct.unpack_from(">iI", buffer, signature_length)
+        header_length = signature_length + 8 + extension_length
+        if len(buffer) < header_length:
+            return 0
+        self._header_read = True
+        return header_length
+
+    def _read_rows(self, offset: int) -> int:
+        """Decode the complete rows from ``offset`` on and return where the first incomplete one starts."""
+        buffer = self._buffer
+        size = len(buffer)
+        while not self._finished and size - offset >= 2:
+            (field_count,) = struct.unpack_from(">h", buffer, offset)
+            if field_count == -1:
+                self._finished = True
+                return offset + 2
+            if field_count != len(self._columns):
+                raise InventorySnapshotError(
+                    f"COPY row has {field_count} fields, expected {len(self._columns)}", code="S506"
+                )
+            end = offset + 2
+            fields: list[bytes | None] = []
+            for _ in range(field_count):
+                if size - end < 4:
+                    return offset
+                (length,) = struct.unpack_from(">i", buffer, end)
+                end += 4
+                if length < 0:
+                    fields.append(None)
+                    continue
+                if size - end < length:
+                    return offset
+                fields.append(bytes(buffer[end : end + length]))
+                end += length
+            for values, value in zip(self._raw, fields):
+                values.append(value)
+            offset = end
+        return offset
+
+
+def _decode_column(kind: str, values: Sequence[bytes | None]) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    valid = np.array([value is not None for value in values], dtype=bool)
+    if kind == "text":
+        dictionary: dict[str, int] = {}
+        codes = np.array(
+            [
+                dictionary.setdefault(value.decode("utf-8"), len(dictionary)) if value is not None else -1
+                for value in values
+            ],
+            dtype=np.int32,
+        )
+        return codes, valid, np.array(list(dictionary), dtype=str)
+
+    dtype = _FIXED_WIDTH.get(kind)
+    if dtype is None:
+        raise InventorySnapshotError(f"Unsupported snapshot column type '{kind}'", code="S506")
+    null = bytes(dtype.itemsize)
+    decoded = np.frombuffer(b"".join(value if value is not None else null for value in values), dtype=dtype)
+    if kind == "uuid":
+        return decoded.copy(), valid, None
+    if kind == "bool":
+        return decoded.astype(bool), valid, None
+    if kind == "float8":
+        floats = decoded.astype(np.float64)
+        floats[~valid] = np.nan
+        return floats, valid, None
+    integers = decoded.astype(np.int64)
+    if kind == "date":
+        integers[valid] += _POSTGRES_EPOCH_ORDINAL
+    return integers, valid, None
+
+
+def _write_table(
+    directory: Path, table: _Table, columns: Mapping[str, tuple[np.ndarray, np.ndarray, np.ndarray | None]]
+) -> int:
+    rows = 0
+    for name, _kind in table.columns:
+        values, valid, dictionary = columns[name]
+        rows = len(values)
+        np.save(directory / f"{table.name}.{name}.npy", values, allow_pickle=False)
+        valid_path = directory / f"{table.name}.{name}.valid.npy"
+        if valid.all():
+            valid_path.unlink(missing_ok=True)
+        else:
+            np.save(valid_path, valid, allow_pickle=False)
+        if dictionary is not None:
+            np.save(directory / f"{table.name}.{name}.dict.npy", dictionary, allow_pickle=False)
+    return rows
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export or check columnar inventory snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Export a scenario project's inventory snapshot")
+    export.add_argument("--scenario", required=True, help="Scenario whose project is exported")
+    export.add_argument("--output", required=True, type=Path, help="Snapshot directory to (re)write")
+    check = commands.add_parser("check", help="Exit non-zero when a snapshot no longer matches the database")
+    check.add_argument("--snapshot", required=True, type=Path, help="Snapshot directory to check")
+    return parser.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace, database_url: str) -> int:
+    async with DatabasePool(database_url) as pool:
+        if args.command == "export":
+            snapshot = await export_inventory_snapshot(pool, args.scenario, args.output)
+            print(f"Exported {snapshot.row_counts} to {snapshot.directory} (version {snapshot.data_version})")
+            return 0
+        snapshot = load_inventory_snapshot(args.snapshot)
+        if await snapshot_is_current(pool, snapshot):
+            print(f"Snapshot {snapshot.directory} is current (version {snapshot.data_version})")
+            return 0
+        print(f"Snapshot {snapshot.directory} is stale; re-export it")
+        return 1
+
+
+def main() -> None:
+    load_dotenv()
+    args = parse_args()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise SystemExit("DATABASE_URL must be set to export or check snapshots")
+    sys.exit(asyncio.run(_run(args, database_url)))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,24 +6,39 @@ import argparse
 import asyncio
 import logging
 import os
+import time
 from pathlib import Path
-from typing import Mapping
+from typing import Any, Mapping, Sequence
 
 from dotenv import load_dotenv
 
 from ai_agent import AIIntegrationError, AccommodationAgent, load_prompt_templates
+from candidate_store import CandidateStore
+from change_listener import ChangeListener
 from cli_display import (
     console,
     display_error,
     display_final_recommendation,
     display_iteration_results,
     display_progress_bar,
+    display_query_metrics,
     display_scenario_header,
     display_success,
 )
-from config import load_search_parameters
+from config import PromptTemplates, load_search_parameters
 from config.loader import ConfigurationError
-from database import load_failed_items, load_inventory_by_iteration
+from database import (
+    FailedItemCache,
+    InventoryPager,
+    load_failed_items,
+    load_inventory_by_iteration,
+)
+from db_pool import DatabasePool, PoolSettings, ReplicaSettings
+from inventory_snapshot import InventorySnapshotError, load_inventory_snapshot, snapshot_is_current
+from models import FailedItem
+from query_metrics import query_metrics
+from run_budget import RunBudget, RunDeadlineExceeded, current_budget, use_budget
+from scoring_engine import InventoryScoringEngine
 
 logger = logging.getLogger("emergency_accommodation.cli")
 
@@ -85,56 +100,141 @@ def validate_environment(provider: str = "openai") -> str:
     return database_url
 
 
+def read_database_urls() -> list[str]:
+    """Return the comma-separated read replica DSNs from ``DATABASE_READ_URLS``, if any."""
+    return [url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()]
+
+
 async def run_accommodation_analysis(
     scenario_name: str,
     config_dir: Path,
     database_url: str,
     max_iterations_override: int | None = None,
+    read_urls: Sequence[str] = (),
 ) -> None:
     search_config = load_search_parameters(scenario_name, config_dir)
     if max_iterations_override is not None:
         search_config["max_iterations"] = max_iterations_override
 
+    budget = RunBudget.from_config(search_config)
     prompt_templates = load_prompt_templates(config_dir)
     display_scenario_header(scenario_name, search_config)
 
-    failed_items = await load_failed_items(database_url, scenario_name)
+    metrics = query_metrics()
+    metrics.reset()
+    metrics.configure(search_config)
+    summary_path = search_config.get("query_metrics_path")
+
+    pool_settings = PoolSettings.from_config(search_config)
+    replicas = ReplicaSettings.from_config(search_config, read_urls)
+    with use_budget(budget):
+        async with DatabasePool(database_url, pool_settings, replicas=replicas) as pool:
+            try:
+                if search_config.get("db_snapshot_session", False):
+                    async with pool.snapshot_session() as session:
+                        try:
+                            await _analyze_with_pool(pool, scenario_name, search_config, prompt_templates)
+                        finally:
+                            logger.info("Snapshot session: %s", session.to_dict())
+                else:
+                    await _analyze_with_pool(pool, scenario_name, search_config, prompt_templates)
+            finally:
+                logger.info("Database pool metrics: %s", pool.metrics.to_dict())
+                if replicas.dsns:
+                    logger.info("Read routing: %s", pool.read_stats.to_dict())
+                    logger.info("Read replicas: %s", pool.replica_metrics())
+                if budget is not None:
+                    logger.info("Run budget: %s", budget.finish().to_dict())
+                if summary_path:
+                    metrics.write_summary(Path(summary_path))
+
+
+async def _analyze_with_pool(
+    pool: DatabasePool,
+    scenario_name: str,
+    search_config: Mapping[str, Any],
+    prompt_templates: Mapping[str, PromptTemplates],
+) -> None:
+    started = time.perf_counter()
+    failed_items = await _load_failed_items(pool, scenario_name, search_config)
     if not failed_items:
         display_error("No failed items found for the selected scenario", error_type="Warning")
         return
 
     total_iterations = int(search_config.get("max_iterations", 3))
+    batch_size = int(search_config.get("batch_size_per_iteration", 10))
+    budget = current_budget()
     progress, task_id = display_progress_bar("Preparing analysis", total_iterations)
 
     evaluated = False
+    pager = InventoryPager()
+    store = CandidateStore()
+    engine = await _create_scoring_engine(pool, scenario_name, search_config)
+    listener: ChangeListener | None = None
+    if search_config.get("listen_for_inventory_changes", False) and pool.session is not None:
+        # Every query of the run reads the session's snapshot, so committed changes could
+        # not be seen anyway, and the listening connection cannot sit inside a transaction.
+        logger.warning("listen_for_inventory_changes is ignored inside a snapshot session")
+    elif search_config.get("listen_for_inventory_changes", False):
+        # Evict cached candidates and inventory snapshots as concurrent writers commit.
+        listener = ChangeListener(pool, store.invalidate)
+        if engine is not None:
+            listener.subscribe(engine.invalidate)
+        await listener.start()
+    # Queries issued before the first iteration are reported as iteration 0.
+    _finish_iteration(0, started, search_config)
 
     try:
         agent = AccommodationAgent(search_config, prompt_templates)
 
         with progress:
             for iteration in range(1, total_iterations + 1):
+                limit = budget.iteration_limit(batch_size) if budget is not None else batch_size
+                if budget is not None and limit == 0:
+                    budget.stats.iterations_skipped += total_iterations - iteration + 1
+                    logger.warning("Run deadline leaves no time for iteration %d; skipping the rest", iteration)
+                    break
+
                 progress.update(task_id, description=f"Iteration {iteration}")
+                started = time.perf_counter()
+
+                try:
+                    batch = await load_inventory_by_iteration(
+                        pool,
+                        failed_items,
+                        iteration_num=iteration,
+                        config=search_config,
+                        pager=pager,
+                        store=store,
+                        engine=engine,
+                    )
+                    if budget is not None and len(batch) > limit:
+                        # The batch is ordered best first; a shorter prompt keeps the AI call in budget.
+                        batch = batch[:limit]
+                        budget.stats.iterations_shrunk += 1
+
+                    if not batch:
+                        console.print("[yellow]No inventory options returned for this iteration.[/yellow]")
+                        _finish_iteration(iteration, started, search_config)
+                        progress.advance(task_id)
+                        continue
+
+                    decision = await agent.evaluate_iteration(
+                        iteration_num=iteration,
+                        inventory_batch=batch,
+                        failed_items=failed_items,
+                        scenario_name=scenario_name,
+                    )
+                except RunDeadlineExceeded as exc:
+                    logger.warning("Iteration %d stopped at the run deadline: %s", iteration, exc)
+                    _finish_iteration(iteration, started, search_config)
+                    break
 
-                batch = await load_inventory_by_iteration(
-                    database_url,
-                    failed_items,
-                    iteration_num=iteration,
-                    config=search_config,
-                )
-
-                if not batch:
-                    console.print("[yellow]No inventory options returned for this iteration.[/yellow]")
-                    progress.advance(task_id)
-                    continue
-
-                decision = await agent.evaluate_iteration(
-                    iteration_num=iteration,
-                    inventory_batch=batch,
-                    failed_items=failed_items,
-                    scenario_name=scenario_name,
-                )
                 evaluated = True
                 display_iteration_results(iteration, decision)
+                _finish_iteration(iteration, started, search_config)
+                if budget is not None:
+                    budget.record_iteration(time.perf_counter() - started)
                 progress.advance(task_id)
 
                 if not decision.continue_search:
@@ -142,7 +242,10 @@ async def run_accommodation_analysis(
                     break
 
         if not evaluated:
-            display_error("Unable to evaluate accommodations; no viable inventory batches returned.", error_type="Warning")
+            if budget is not None and budget.exhausted:
+                display_error("Run deadline reached before any iteration was evaluated.", error_type="Warning")
+            else:
+                display_error("Unable to evaluate accommodations; no viable inventory batches returned.", error_type="Warning")
             return
 
         final = await agent.final_recommendation()
@@ -152,6 +255,75 @@ async def run_accommodation_analysis(
     except AIIntegrationError as exc:
         logger.exception("AI evaluation failed")
         display_error(str(exc))
+    except RunDeadlineExceeded as exc:
+        logger.warning("No final recommendation within the run deadline: %s", exc)
+        display_error(
+            "Run deadline reached before the final recommendation; the iteration results above are partial.",
+            error_type="Warning",
+        )
+    finally:
+        logger.info("Candidate store: %s", store.stats.to_dict())
+        if engine is not None:
+            logger.info("Scoring engine: %s", engine.stats.to_dict())
+        if listener is not None:
+            await listener.stop()
+            logger.info("Change listener: %s", listener.stats.to_dict())
+
+
+async def _load_failed_items(
+    pool: DatabasePool,
+    scenario_name: str,
+    search_config: Mapping[str, Any],
+) -> list[FailedItem]:
+    """Load failed items, through the on-disk failed item cache when one is configured."""
+    cache_path = search_config.get("failed_items_cache_path")
+    if not cache_path:
+        return await load_failed_items(pool, scenario_name)
+
+    cache = FailedItemCache.open(Path(cache_path))
+    failed_items = await cache.load(pool, scenario_name)
+    try:
+        cache.save(Path(cache_path))
+    except OSError as exc:
+        logger.warning("Could not save failed item cache %s: %s", cache_path, exc)
+    logger.info("Failed item cache: hits=%d refreshes=%d misses=%d", cache.hits, cache.refreshes, cache.misses)
+    return failed_items
+
+
+def _finish_iteration(iteration: int, started: float, search_config: Mapping[str, Any]) -> None:
+    """Close the iteration's query metrics window, then log and optionally display it."""
+    summary = query_metrics().end_iteration(iteration, time.perf_counter() - started)
+    logger.info(
+        "Iteration %d database time: %.1f ms of %.1f ms", iteration, summary["sql_ms"], summary["wall_ms"]
+    )
+    if search_config.get("show_query_metrics", False) and summary["queries"]:
+        display_query_metrics(summary)
+
+
+async def _create_scoring_engine(
+    pool: DatabasePool,
+    scenario_name: str,
+    search_config: Mapping[str, Any],
+) -> InventoryScoringEngine | None:
+    """Return the in-memory scoring engine, seeded from a current snapshot when one is configured."""
+    if search_config.get("inventory_search_backend") != "vectorized":
+        return None
+
+    snapshot_dir = search_config.get("inventory_snapshot_dir")
+    if not snapshot_dir:
+        return InventoryScoringEngine()
+
+    try:
+        snapshot = load_inventory_snapshot(Path(snapshot_dir))
+        if snapshot.scenario != scenario_name:
+            logger.warning("Inventory snapshot %s was exported for %s; loading from the database", snapshot_dir, snapshot.scenario)
+        elif not await snapshot_is_current(pool, snapshot):
+            logger.warning("Inventory snapshot %s is stale; loading from the database", snapshot_dir)
+        else:
+            return InventoryScoringEngine.from_snapshot(snapshot)
+    except InventorySnapshotError as exc:
+        logger.warning("Ignoring inventory snapshot %s: %s", snapshot_dir, exc)
+    return InventoryScoringEngine()
 
 
 def configure_logging() -> None:
@@ -185,6 +357,7 @@ def main() -> None:
                 config_dir=config_dir,
                 database_url=database_url,
                 max_iterations_override=args.max_iterations,
+                read_urls=read_database_urls(),
             )
         )
     except (ConfigurationError, AIIntegrationError, RuntimeError) as exc:
@@ -115,6 +115,37 @@ class FailedItem:
             raise ModelValidationError("Invalid failed item payload", cause=exc) from exc
         return cls(**data)
 
+    @classmethod
+    def from_record(cls, record: Mapping[str, Any]) -> FailedItem:
+        """Create a failed item from a row returned by our own SQL.
+
+        The query already guarantees column types, so only the schema's value constraints
+        are checked here; quantities decoded as text by the compact codec profile are
+        converted to ``Decimal``. A row that breaks one is handed to :meth:`from_mapping`, which
+        raises the usual validation error.
+        """
+        item = cls(
+            scn_id=record["scn_id"],
+            line_item_id=record["line_item_id"],
+            description=record["description"],
+            quantity=_as_decimal(record["quantity"]),
+            unit_of_measure=record["unit_of_measure"],
+            priority=record["priority"],
+            ros_date=record["ros_date"],
+            commodity_code=record["commodity_code"],
+            equipment_tag=record["equipment_tag"],
+        )
+        if (
+            item.scn_id is not None
+            and item.line_item_id is not None
+            and item.quantity > 0
+            and item.description
+            and item.unit_of_measure
+            and item.priority
+        ):
+            return item
+        return cls.from_mapping(dict(record))
+
     def to_dict(self) -> dict[str, Any]:
         """Serialize the failed item to a JSON-safe dictionary."""
         return {
@@ -157,6 +188,47 @@ class InventoryOption:
             raise ModelValidationError("Invalid inventory option payload", cause=exc) from exc
         return cls(**data)
 
+    @classmethod
+    def from_record(cls, record: Mapping[str, Any]) -> InventoryOption:
+        """Create an inventory option from a candidate row produced by the inventory search.
+
+        Like :meth:`FailedItem.from_record`, only value constraints are checked and rows that
+        break one fall back to full validation. Extra columns such as scores and sort keys
+        are ignored.
+        """
+        option = cls(
+            inventory_id=record["inventory_id"],
+            warehouse_id=record["warehouse_id"],
+            warehouse_name=record["warehouse_name"],
+            material_description=record["material_description"],
+            available_quantity=_as_decimal(record["available_quantity"]),
+            reserved_quantity=_as_decimal(record["reserved_quantity"]),
+            soft_available_quantity=_as_decimal(record["soft_available_quantity"]),
+            hard_available_quantity=_as_decimal(record["hard_available_quantity"]),
+            approval_requirement=record["approval_requirement"],
+            impact_level=record["impact_level"],
+            estimated_recovery_days=record["estimated_recovery_days"],
+            risk_summary=record["risk_summary"],
+            distance_km=record["distance_km"],
+        )
+        if (
+            option.inventory_id is not None
+            and option.warehouse_id is not None
+            and option.warehouse_name
+            and option.material_description
+            and option.available_quantity >= 0
+            and option.reserved_quantity >= 0
+            and option.soft_available_quantity >= 0
+            and option.hard_available_quantity >= 0
+            and option.approval_requirement
+            and option.impact_level
+            and option.estimated_recovery_days >= 0
+            and option.risk_summary
+            and (option.distance_km is None or option.distance_km >= 0)
+        ):
+            return option
+        return cls.from_mapping({field: record[field] for field in _InventoryOptionSchema.model_fields})
+
     def to_dict(self) -> dict[str, Any]:
         """Serialize the inventory option to a JSON-safe dictionary."""
         return {
@@ -278,6 +350,10 @@ class FinalRecommendation:
         }
 
 
+def _as_decimal(value: Any) -> Any:
+    return Decimal(value) if isinstance(value, str) else value
+
+
 def serialize_option_sequence(options: Sequence[InventoryOption]) -> list[dict[str, Any]]:
     """Convert a sequence of inventory options into JSON-safe dictionaries."""
     return [option.to_dict() for option in options]
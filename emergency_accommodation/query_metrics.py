@@ -0,0 +1,273 @@
+"""Per-query timing, row and byte counters for the database calls made by an analysis run."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Mapping, Sequence, TypeVar
+from uuid import UUID
+
+import asyncpg  # type: ignore[import-untyped]
+
+from config.loader import ConfigurationError
+from db_pool import DatabasePool
+from run_budget import RunDeadlineExceeded, call_timeout, deadline_exceeded
+from statement_registry import BoundStatements
+
+__all__ = [
+    "QueryMetrics",
+    "QueryStats",
+    "estimate_bytes",
+    "query_metrics",
+]
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rows inspected per result when estimating decoded bytes; the rest are extrapolated.
+_SIZE_SAMPLE_ROWS = 8
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """Counters for one named query: executions, time, rows, decoded bytes and pool waits."""
+
+    calls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    bytes_decoded: int = 0
+    wait_seconds: float = 0.0
+
+    def record(self, seconds: float, rows: int, size: int) -> None:
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.rows += rows
+        self.bytes_decoded += size
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "mean_ms": round(self.total_seconds * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "rows": self.rows,
+            "bytes_decoded": self.bytes_decoded,
+            "wait_ms": round(self.wait_seconds * 1000, 3),
+        }
+
+
+class QueryMetrics:
+    """Collects :class:`QueryStats` per query name for the whole run and for each iteration.
+
+    Calls are routed through :meth:`fetch`, :meth:`fetchrow`, :meth:`fetchval` or
+    :meth:`fetch_statement`, and connections through :meth:`checkout`, which charges the
+    pool wait to the query it names. Each call gets the time left in the current run budget
+    as its timeout.
+    ``bytes_decoded`` is estimated from the Python values of a sample of the returned rows.
+    When ``slow_query_seconds`` is set, an ``explain_sample_rate`` share of the slower
+    executions is explained on the same connection and the plan is appended to
+    ``explain_path`` as one JSON line. The plan is only estimated unless ``explain_analyze``
+    is set, which runs the query again under ``EXPLAIN (ANALYZE, BUFFERS)``. The EXPLAIN runs
+    in its own transaction, or in a savepoint when the caller already holds one, so a failed
+    EXPLAIN never aborts the caller's transaction.
+    """
+
+    def __init__(self) -> None:
+        self.slow_query_seconds: float | None = None
+        self.explain_sample_rate = 1.0
+        self.explain_analyze = False
+        self.explain_path = Path("logs") / "slow_queries.jsonl"
+        self._random = random.Random()
+        self.reset()
+
+    def configure(self, config: Mapping[str, Any]) -> None:
+        """Apply the slow-query options from the merged search parameters."""
+        threshold = config.get("slow_query_threshold_ms")
+        sample_rate = float(config.get("slow_query_explain_sample_rate", 1.0))
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ConfigurationError("slow_query_explain_sample_rate must be between 0 and 1", code="C118")
+        self.slow_query_seconds = float(threshold) / 1000 if threshold is not None else None
+        self.explain_sample_rate = sample_rate
+        self.explain_analyze = bool(config.get("slow_query_explain_analyze", False))
+        self.explain_path = Path(config.get("slow_query_explain_path", "logs/slow_queries.jsonl"))
+
+    def reset(self) -> None:
+        self._totals: dict[str, QueryStats] = {}
+        self._current: dict[str, QueryStats] = {}
+        self._iterations: list[dict[str, Any]] = []
+        self.explains_captured = 0
+
+    @asynccontextmanager
+    async def checkout(self, pool: DatabasePool, name: str) -> AsyncIterator[asyncpg.Connection]:
+        """Acquire a read connection, charging the time spent waiting for it to ``name``."""
+        started = time.perf_counter()
+        async with pool.acquire_read() as connection:
+            waited = time.perf_counter() - started
+            self._stats(self._totals, name).wait_seconds += waited
+            self._stats(self._current, name).wait_seconds += waited
+            yield connection
+
+    async def fetch(self, name: str, connection: asyncpg.Connection, query: str, *args: Any) -> list[Any]:
+        call = connection.fetch(query, *args, timeout=call_timeout())
+        return await self._observe(name, connection, query, args, call)
+
+    async def fetchval(self, name: str, connection: asyncpg.Connection, query: str, *args: Any) -> Any:
+        call = connection.fetchval(query, *args, timeout=call_timeout())
+        return await self._observe(name, connection, query, args, call)
+
+    async def fetchrow(self, name: str, connection: asyncpg.Connection, query: str, *args: Any) -> Any:
+        call = connection.fetchrow(query, *args, timeout=call_timeout())
+        return await self._observe(name, connection, query, args, call)
+
+    async def fetch_statement(self, name: str, statements: BoundStatements, key: str, *args: Any) -> list[Any]:
+        call = statements.fetch(key, *args, timeout=call_timeout())
+        return await self._observe(name, statements.connection, statements.sql(key), args, call)
+
+    def record(self, name: str, seconds: float, rows: int, size: int) -> None:
+        """Add one execution of ``name`` that was timed by the caller."""
+        self._stats(self._totals, name).record(seconds, rows, size)
+        self._stats(self._current, name).record(seconds, rows, size)
+
+    def end_iteration(self, iteration: int, wall_seconds: float) -> dict[str, Any]:
+        """Close the current iteration's window and return its summary."""
+        queries = {name: stats.to_dict() for name, stats in sorted(self._current.items())}
+        sql_seconds = sum(stats.total_seconds for stats in self._current.values())
+        summary = {
+            "iteration": iteration,
+            "wall_ms": round(wall_seconds * 1000, 3),
+            "sql_ms": round(sql_seconds * 1000, 3),
+            "queries": queries,
+        }
+        self._iterations.append(summary)
+        self._current = {}
+        return summary
+
+    def summary(self) -> dict[str, Any]:
+        """Machine-readable totals, per-iteration breakdowns and the number of captured plans."""
+        return {
+            "queries": {name: stats.to_dict() for name, stats in sorted(self._totals.items())},
+            "iterations": list(self._iterations),
+            "explains_captured": self.explains_captured,
+        }
+
+    def write_summary(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.summary(), indent=2) + "\n", encoding="utf-8")
+
+    async def _observe(
+        self,
+        name: str,
+        connection: asyncpg.Connection,
+        query: str,
+        args: Sequence[Any],
+        call: Awaitable[T],
+    ) -> T:
+        started = time.perf_counter()
+        try:
+            result = await call
+        except asyncio.TimeoutError as exc:
+            error = deadline_exceeded(f"query {name}", exc)
+            if error is None:
+                raise
+            raise error from exc
+        elapsed = time.perf_counter() - started
+        if isinstance(result, list):
+            self.record(name, elapsed, len(result), estimate_bytes(result))
+        elif isinstance(result, (Mapping, asyncpg.Record)):
+            self.record(name, elapsed, 1, estimate_bytes([result]))
+        else:
+            self.record(name, elapsed, int(result is not None), _value_bytes(result))
+
+        if (
+            self.slow_query_seconds is not None
+            and elapsed >= self.slow_query_seconds
+            and self._random.random() < self.explain_sample_rate
+        ):
+            await self._capture_explain(name, connection, query, args, elapsed)
+        return result
+
+    async def _capture_explain(
+        self,
+        name: str,
+        connection: asyncpg.Connection,
+        query: str,
+        args: Sequence[Any],
+        elapsed: float,
+    ) -> None:
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if self.explain_analyze else "FORMAT JSON"
+        try:
+            async with connection.transaction():
+                plan = await connection.fetchval(f"EXPLAIN ({options}) {query}", *args, timeout=call_timeout())
+        except (asyncpg.PostgresError, asyncio.TimeoutError, RunDeadlineExceeded) as exc:
+            logger.warning("Could not capture a plan for slow query %s: %s", name, exc)
+            return
+
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "query": name,
+            "duration_ms": round(elapsed * 1000, 3),
+            "plan": json.loads(plan) if isinstance(plan, str) else plan,
+        }
+        try:
+            self.explain_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.explain_path.open("a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry) + "\n")
+        except OSError as exc:
+            logger.warning("Could not write slow query plan to %s: %s", self.explain_path, exc)
+            return
+        self.explains_captured += 1
+
+    @staticmethod
+    def _stats(table: dict[str, QueryStats], name: str) -> QueryStats:
+        stats = table.get(name)
+        if stats is None:
+            stats = table[name] = QueryStats()
+        return stats
+
+
+def estimate_bytes(records: Sequence[Any]) -> int:
+    """Estimate the decoded size of ``records`` from the values of its first few rows."""
+    if not records:
+        return 0
+    sample = records[:_SIZE_SAMPLE_ROWS]
+    sampled = sum(_value_bytes(value) for record in sample for value in record.values())
+    return sampled * len(records) // len(sample)
+
+
+def _value_bytes(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, UUID):
+        return 16
+    if isinstance(value, Decimal):
+        return len(value.as_tuple().digits) // 2 + 8
+    if isinstance(value, (int, float, date, datetime)):
+        return 8
+    if isinstance(value, (list, tuple)):
+        return sum(_value_bytes(item) for item in value)
+    if isinstance(value, Mapping):
+        return sum(_value_bytes(item) for item in value.values())
+    return 8
+
+
+_QUERY_METRICS = QueryMetrics()
+
+
+def query_metrics() -> QueryMetrics:
+    """Return the process-wide query metrics shared by every database call."""
+    return _QUERY_METRICS
@@ -0,0 +1,163 @@
+"""Run-level latency budget shared by the database and AI calls of one analysis run."""
+
+from __future__ import annotations
+
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Mapping
+
+from config.loader import ConfigurationError
+
+__all__ = [
+    "BudgetStats",
+    "RunBudget",
+    "RunDeadlineExceeded",
+    "call_timeout",
+    "current_budget",
+    "deadline_exceeded",
+    "use_budget",
+]
+
+# Remaining time below which the deadline counts as reached; timers may fire a little early.
+_EXPIRY_SLACK_SECONDS = 0.05
+
+# An iteration cut below this share of its configured batch is skipped instead.
+_MIN_BATCH_SHARE = 0.25
+
+_CURRENT_BUDGET: ContextVar[RunBudget | None] = ContextVar("run_budget", default=None)
+
+
+class RunDeadlineExceeded(RuntimeError):
+    """Raised when a call cannot start or finish before the run deadline."""
+
+    def __init__(self, message: str, code: str = "B600", *, cause: Exception | None = None) -> None:
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.__cause__ = cause
+
+
+@dataclass(slots=True)
+class BudgetStats:
+    """How the run deadline shaped the run: shrunk and skipped iterations and cut-off calls."""
+
+    seconds: float
+    elapsed_seconds: float = 0.0
+    iterations_shrunk: int = 0
+    iterations_skipped: int = 0
+    calls_cut_short: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "seconds": self.seconds,
+            "elapsed_ms": round(self.elapsed_seconds * 1000, 3),
+            "iterations_shrunk": self.iterations_shrunk,
+            "iterations_skipped": self.iterations_skipped,
+            "calls_cut_short": self.calls_cut_short,
+        }
+
+
+class RunBudget:
+    """Deadline for one analysis run, from which every database and AI call takes its timeout.
+
+    The budget is made current with :func:`use_budget`; :func:`call_timeout` then caps each
+    call at the time left. Before every iteration :meth:`iteration_limit` compares the time
+    left with the longest iteration so far, keeping one such iteration in reserve for the
+    final recommendation, and shrinks or skips the iteration when it would not fit.
+    """
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        if seconds <= 0:
+            raise ConfigurationError("run_deadline_seconds must be greater than zero", code="C119")
+        self._clock = clock
+        self._started = clock()
+        self._deadline = self._started + seconds
+        self._longest_iteration: float | None = None
+        self.stats = BudgetStats(seconds=seconds)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> RunBudget | None:
+        """Return the budget set by ``run_deadline_seconds``, or ``None`` when the run has no deadline."""
+        seconds = config.get("run_deadline_seconds")
+        if seconds is None:
+            return None
+        return cls(float(seconds))
+
+    def remaining(self) -> float:
+        return self._deadline - self._clock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining() <= _EXPIRY_SLACK_SECONDS
+
+    def timeout(self, limit: float | None = None) -> float:
+        """Return ``limit`` capped at the time left, failing when no time is left."""
+        if self.exhausted:
+            raise self.exceeded("Run deadline reached before the call started")
+        remaining = self.remaining()
+        return remaining if limit is None else min(limit, remaining)
+
+    def exceeded(self, message: str, *, cause: Exception | None = None) -> RunDeadlineExceeded:
+        """Count a call stopped by the deadline and build the error reporting it."""
+        self.stats.calls_cut_short += 1
+        return RunDeadlineExceeded(message, cause=cause)
+
+    def iteration_limit(self, batch_size: int) -> int:
+        """How many options the next iteration may evaluate; 0 means stop iterating."""
+        if self.exhausted:
+            return 0
+        longest = self._longest_iteration
+        if longest is None or longest <= 0:
+            return batch_size
+        available = self.remaining() - longest
+        if available >= longest:
+            return batch_size
+        share = available / longest
+        if share < _MIN_BATCH_SHARE:
+            return 0
+        return max(1, math.floor(batch_size * share))
+
+    def record_iteration(self, seconds: float) -> None:
+        if self._longest_iteration is None or seconds > self._longest_iteration:
+            self._longest_iteration = seconds
+
+    def finish(self) -> BudgetStats:
+        self.stats.elapsed_seconds = self._clock() - self._started
+        return self.stats
+
+
+def current_budget() -> RunBudget | None:
+    """Return the budget of the run this task belongs to, if it has one."""
+    return _CURRENT_BUDGET.get()
+
+
+@contextmanager
+def use_budget(budget: RunBudget | None) -> Iterator[RunBudget | None]:
+    """Make ``budget`` current for the calls made inside the block and the tasks they start."""
+    token = _CURRENT_BUDGET.set(budget)
+    try:
+        yield budget
+    finally:
+        _CURRENT_BUDGET.reset(token)
+
+
+def call_timeout(limit: float | None = None) -> float | None:
+    """Timeout for one call: ``limit`` capped by the current run budget, if there is one."""
+    budget = _CURRENT_BUDGET.get()
+    if budget is None:
+        return limit
+    return budget.timeout(limit)
+
+
+def deadline_exceeded(what: str, exc: Exception) -> RunDeadlineExceeded | None:
+    """Return the error to raise when a timed-out call was stopped by the run deadline.
+
+    Returns ``None`` when the call hit its own limit instead, so the caller keeps its
+    usual timeout handling.
+    """
+    budget = _CURRENT_BUDGET.get()
+    if budget is None or not budget.exhausted:
+        return None
+    return budget.exceeded(f"Run deadline reached during {what}", cause=exc)
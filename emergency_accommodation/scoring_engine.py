@@ -0,0 +1,722 @@
+"""Vectorized in-memory inventory scoring that mirrors the SQL inventory search."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Mapping, Sequence, cast
+from uuid import UUID
+
+import numpy as np
+
+from db_pool import DatabasePool
+from models import FailedItem
+from query_metrics import query_metrics
+
+if TYPE_CHECKING:
+    from change_listener import ChangeEvent
+    from inventory_snapshot import InventorySnapshot
+
+__all__ = [
+    "InventoryScoringEngine",
+    "ScoringEngineStats",
+]
+
+_LINE_ITEMS_QUERY = """
+SELECT
+    pli.id AS line_item_id,
+    po.project_id,
+    pli.commodity_code_id,
+    pli.equipment_id,
+    pli.wbs_id,
+    (SELECT MIN(r.ros_date) FROM wbs_ros_dates r WHERE r.wbs_id = pli.wbs_id) AS ros_date
+FROM po_line_items pli
+JOIN purchase_orders po ON po.id = pli.po_id
+WHERE pli.id = ANY($1::uuid[]);
+"""
+
+_SCNS_QUERY = "SELECT id, delivery_warehouse_id FROM scns WHERE id = ANY($1::uuid[]);"
+
+_INVENTORY_QUERY = """
+SELECT
+    wi.id,
+    wi.project_id,
+    wi.warehouse_id,
+    w.name AS warehouse_name,
+    COALESCE(cc.short_description, eq.description, 'Unspecified inventory') AS material_description,
+    wi.commodity_code_id,
+    wi.equipment_id,
+    wi.wbs_id,
+    wi.quantity_available,
+    wi.quantity_reserved,
+    wi.quantity_hard_reserved,
+    wi.safety_stock_level,
+    wi.status = 'available' AS is_available,
+    res.next_required_by,
+    res.max_priority,
+    COALESCE(res.any_reassignable, FALSE) AS any_reassignable
+FROM warehouse_inventory wi
+JOIN warehouses w ON w.id = wi.warehouse_id
+LEFT JOIN commodity_codes cc ON cc.id = wi.commodity_code_id
+LEFT JOIN equipment_list eq ON eq.id = wi.equipment_id
+LEFT JOIN inventory_reservation_summary res ON res.inventory_id = wi.id
+WHERE wi.project_id = ANY($1::uuid[])
+ORDER BY wi.id;
+"""
+
+_ROS_DATES_QUERY = "SELECT wbs_id, ros_date FROM wbs_ros_dates WHERE wbs_id = ANY($1::uuid[]);"
+
+_DISTANCES_QUERY = """
+SELECT from_warehouse_id, to_warehouse_id, distance_km
+FROM warehouse_distances
+WHERE from_warehouse_id = ANY($1::uuid[]);
+"""
+
+# NUMERIC(18,4) quantities are compared as exact integers in ten-thousandths.
+_QUANTITY_SCALE = 4
+
+# Distinct sentinels keep NULL codes on either side from ever comparing equal, as in SQL.
+_INVENTORY_NULL = -1
+_LINE_NULL = -2
+
+_APPROVAL_BY_STATUS = {
+    "blocked": "executive",
+    "emergency_only": "manager",
+    "reassignable": "supervisor",
+}
+
+
+@dataclass(slots=True)
+class ScoringEngineStats:
+    """Counters describing the snapshot the engine holds and the work it did."""
+
+    projects_loaded: int = 0
+    inventory_rows: int = 0
+    searches: int = 0
+    pairs_scored: int = 0
+    rows_returned: int = 0
+    load_seconds: float = 0.0
+    score_seconds: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "projects_loaded": self.projects_loaded,
+            "inventory_rows": self.inventory_rows,
+            "searches": self.searches,
+            "pairs_scored": self.pairs_scored,
+            "rows_returned": self.rows_returned,
+            "load_seconds": round(self.load_seconds, 4),
+            "score_seconds": round(self.score_seconds, 4),
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class _LineItem:
+    project_id: UUID
+    commodity_code_id: UUID | None
+    equipment_id: UUID | None
+    wbs_id: UUID | None
+    ros_date: date | None
+
+
+@dataclass(slots=True)
+class _ProjectSnapshot:
+    """Column arrays for one project's warehouse inventory, ordered by inventory id.
+
+    UUID columns are held as 16-byte ``V16`` values, which sort like PostgreSQL's uuid
+    ordering; commodity, equipment and WBS ids are replaced by their position in ``codes``.
+    """
+
+    ids: np.ndarray
+    warehouse_ids: list[UUID]
+    warehouse_names: np.ndarray
+    material_descriptions: np.ndarray
+    warehouse_codes: np.ndarray
+    commodity_codes: np.ndarray
+    equipment_codes: np.ndarray
+    wbs_codes: np.ndarray
+    available: np.ndarray
+    reserved: np.ndarray
+    hard_reserved: np.ndarray
+    safety_stock: np.ndarray
+    is_available: np.ndarray
+    next_required_by: np.ndarray
+    has_next_required_by: np.ndarray
+    max_priority: np.ndarray
+    has_max_priority: np.ndarray
+    any_reassignable: np.ndarray
+    ros_offsets: np.ndarray
+    ros_counts: np.ndarray
+    ros_ordinals: np.ndarray
+    commodity_index: dict[int, np.ndarray]
+    equipment_index: dict[int, np.ndarray]
+    codes: np.ndarray
+    distance_rows: dict[UUID | None, np.ndarray] = field(default_factory=dict)
+
+
+class InventoryScoringEngine:
+    """Scores failed line items against an in-memory snapshot of their projects' inventory.
+
+    The first search for a project bulk-loads its inventory, reservation summary rows, ROS
+    dates and warehouse distances into NumPy arrays; every later search is answered from
+    memory with the same scores, ordering, paging and thresholds as the SQL inventory
+    search. The snapshot is not refreshed on its own: subscribe :meth:`invalidate` to a
+    change listener to keep a long-lived engine current, or keep the engine to one run.
+    """
+
+    def __init__(self) -> None:
+        self._projects: dict[UUID, _ProjectSnapshot] = {}
+        self._line_items: dict[UUID, _LineItem | None] = {}
+        self._deliveries: dict[UUID, UUID | None] = {}
+        self._distances: dict[UUID, dict[UUID, float]] = {}
+        self._today: int | None = None
+        self.stats = ScoringEngineStats()
+
+    @classmethod
+    def from_snapshot(cls, snapshot: InventorySnapshot) -> InventoryScoringEngine:
+        """Build an engine whose project is preloaded from an exported inventory snapshot.
+
+        Line items, SCNs and projects the snapshot does not cover are still loaded from the
+        database on first use. Scores are computed against the snapshot's ``as_of_date``.
+        """
+        started = time.perf_counter()
+        engine = cls()
+        engine._today = snapshot.as_of_date.toordinal()
+
+        inventory = snapshot.columns("inventory")
+        ros_dates = snapshot.columns("ros_dates")
+        engine._projects[snapshot.project_id] = _build_snapshot(inventory, ros_dates["wbs_id"], ros_dates["ros_date"])
+
+        lines = snapshot.columns("line_items")
+        commodities = _to_uuids(lines["commodity_code_id"], lines["commodity_code_id_valid"])
+        equipment = _to_uuids(lines["equipment_id"], lines["equipment_id_valid"])
+        wbs_ids = _to_uuids(lines["wbs_id"], lines["wbs_id_valid"])
+        for position, line_id in enumerate(_to_uuids(lines["id"])):
+            engine._line_items[cast(UUID, line_id)] = _LineItem(
+                project_id=snapshot.project_id,
+                commodity_code_id=commodities[position],
+                equipment_id=equipment[position],
+                wbs_id=wbs_ids[position],
+                ros_date=date.fromordinal(int(lines["ros_date"][position]))
+                if lines["ros_date_valid"][position]
+                else None,
+            )
+
+        scns = snapshot.columns("scns")
+        deliveries = _to_uuids(scns["delivery_warehouse_id"], scns["delivery_warehouse_id_valid"])
+        for scn_id, delivery in zip(_to_uuids(scns["id"]), deliveries):
+            engine._deliveries[cast(UUID, scn_id)] = delivery
+            if delivery is not None:
+                engine._distances.setdefault(delivery, {})
+
+        distances = snapshot.columns("distances")
+        for origin, target, distance in zip(
+            _to_uuids(distances["from_warehouse_id"]),
+            _to_uuids(distances["to_warehouse_id"]),
+            distances["distance_km"].tolist(),
+        ):
+            engine._distances.setdefault(cast(UUID, origin), {})[cast(UUID, target)] = distance
+
+        engine.stats.projects_loaded = 1
+        engine.stats.inventory_rows = len(inventory["id"])
+        engine.stats.load_seconds = time.perf_counter() - started
+        return engine
+
+    async def search(
+        self,
+        pool: DatabasePool,
+        items: Sequence[FailedItem],
+        *,
+        fetch_limit: int,
+        offset: int,
+        window: int,
+        after: Sequence[tuple[float, int, int, UUID] | None] | None,
+        thresholds: tuple[int | None, int | None, float | None],
+        cursor_thresholds: tuple[int | None, int | None, float | None] = (None, None, None),
+        search_order: str,
+    ) -> list[list[dict[str, Any]]]:
+        """Return one page of candidate rows per item, in the same shape as the SQL search."""
+        await self._ensure_loaded(pool, items)
+
+        started = time.perf_counter()
+        results: list[list[dict[str, Any]]] = [[] for _ in items]
+        by_project: dict[UUID, list[int]] = {}
+        for position, item in enumerate(items):
+            line = self._line_items.get(item.line_item_id)
+            if line is not None:
+                by_project.setdefault(line.project_id, []).append(position)
+
+        for project_id, positions in by_project.items():
+            snapshot = self._projects[project_id]
+            pages = self._score_project(
+                snapshot,
+                [items[position] for position in positions],
+                fetch_limit=fetch_limit,
+                offset=offset,
+                window=window,
+                after=[after[position] for position in positions] if after is not None else None,
+                thresholds=thresholds,
+                cursor_thresholds=cursor_thresholds,
+                search_order=search_order,
+            )
+            for position, rows in zip(positions, pages):
+                results[position] = rows
+
+        self.stats.searches += 1
+        self.stats.rows_returned += sum(len(rows) for rows in results)
+        self.stats.score_seconds += time.perf_counter() - started
+        return results
+
+    def invalidate(self, event: ChangeEvent) -> int:
+        """Drop the project snapshots made stale by ``event``; the next search reloads them."""
+        if event.table not in ("warehouse_inventory", "inventory_reservations") and not event.is_reset:
+            return 0
+        if event.is_reset or event.project_id is None:
+            evicted = len(self._projects)
+            self._projects.clear()
+            return evicted
+        return 0 if self._projects.pop(event.project_id, None) is None else 1
+
+    async def _ensure_loaded(self, pool: DatabasePool, items: Sequence[FailedItem]) -> None:
+        line_ids = list({item.line_item_id for item in items if item.line_item_id not in self._line_items})
+        scn_ids = list(
+            {item.scn_id for item in items if item.scn_id is not None and item.scn_id not in self._deliveries}
+        )
+        if not line_ids and not scn_ids and all(
+            line is None or line.project_id in self._projects
+            for line in (self._line_items[item.line_item_id] for item in items)
+        ):
+            return
+
+        started = time.perf_counter()
+        metrics = query_metrics()
+        async with metrics.checkout(pool, "engine_load") as connection:
+            if self._today is None:
+                self._today = (await metrics.fetchval("engine_today", connection, "SELECT CURRENT_DATE")).toordinal()
+
+            if line_ids:
+                self._line_items.update({line_id: None for line_id in line_ids})
+                for record in await metrics.fetch("engine_line_items", connection, _LINE_ITEMS_QUERY, line_ids):
+                    self._line_items[record["line_item_id"]] = _LineItem(
+                        project_id=record["project_id"],
+                        commodity_code_id=record["commodity_code_id"],
+                        equipment_id=record["equipment_id"],
+                        wbs_id=record["wbs_id"],
+                        ros_date=record["ros_date"],
+                    )
+
+            if scn_ids:
+                self._deliveries.update({scn_id: None for scn_id in scn_ids})
+                for record in await metrics.fetch("engine_scns", connection, _SCNS_QUERY, scn_ids):
+                    self._deliveries[record["id"]] = record["delivery_warehouse_id"]
+
+            new_projects = list(
+                {line.project_id for line in self._line_items.values() if line is not None} - self._projects.keys()
+            )
+            if new_projects:
+                inventory = await metrics.fetch("engine_inventory", connection, _INVENTORY_QUERY, new_projects)
+                wbs_ids = list({record["wbs_id"] for record in inventory if record["wbs_id"] is not None})
+                ros_dates = await metrics.fetch("engine_ros_dates", connection, _ROS_DATES_QUERY, wbs_ids)
+                ros_wbs = _uuid_array([record["wbs_id"] for record in ros_dates])
+                ros_ordinals = np.array([record["ros_date"].toordinal() for record in ros_dates], dtype=np.int64)
+                for project_id in new_projects:
+                    records = [record for record in inventory if record["project_id"] == project_id]
+                    self._projects[project_id] = _build_snapshot(_record_columns(records), ros_wbs, ros_ordinals)
+                    self.stats.projects_loaded += 1
+                    self.stats.inventory_rows += len(records)
+
+            origins = list(
+                {origin for origin in self._deliveries.values() if origin is not None} - self._distances.keys()
+            )
+            if origins:
+                self._distances.update({origin: {} for origin in origins})
+                for record in await metrics.fetch("engine_distances", connection, _DISTANCES_QUERY, origins):
+                    self._distances[record["from_warehouse_id"]][record["to_warehouse_id"]] = record["distance_km"]
+                for snapshot in self._projects.values():
+                    snapshot.distance_rows.clear()
+
+        self.stats.load_seconds += time.perf_counter() - started
+
+    def _distance_row(self, snapshot: _ProjectSnapshot, origin: UUID | None) -> np.ndarray:
+        """Distances from ``origin`` to each of the project's warehouses, NaN when unknown."""
+        row = snapshot.distance_rows.get(origin)
+        if row is None:
+            known = self._distances.get(origin, {}) if origin is not None else {}
+            row = np.array(
+                [known.get(warehouse_id, np.nan) for warehouse_id in snapshot.warehouse_ids], dtype=np.float64
+            )
+            snapshot.distance_rows[origin] = row
+        return row
+
+    def _score_project(
+        self,
+        snapshot: _ProjectSnapshot,
+        items: Sequence[FailedItem],
+        *,
+        fetch_limit: int,
+        offset: int,
+        window: int,
+        after: Sequence[tuple[float, int, int, UUID] | None] | None,
+        thresholds: tuple[int | None, int | None, float | None],
+        cursor_thresholds: tuple[int | None, int | None, float | None] = (None, None, None),
+        search_order: str,
+    ) -> list[list[dict[str, Any]]]:
+        lines = [cast(_LineItem, self._line_items[item.line_item_id]) for item in items]
+
+        # Candidate pairs: every inventory row sharing the line's commodity code or equipment.
+        pair_items: list[np.ndarray] = []
+        pair_rows: list[np.ndarray] = []
+        line_commodity = np.empty(len(items), dtype=np.int64)
+        line_equipment = np.empty(len(items), dtype=np.int64)
+        line_wbs = np.empty(len(items), dtype=np.int64)
+        line_ros = np.zeros(len(items), dtype=np.int64)
+        line_has_ros = np.zeros(len(items), dtype=bool)
+        for position, line in enumerate(lines):
+            line_commodity[position] = _line_code(snapshot, line.commodity_code_id)
+            line_equipment[position] = _line_code(snapshot, line.equipment_id)
+            line_wbs[position] = _line_code(snapshot, line.wbs_id)
+            if line.ros_date is not None:
+                line_ros[position] = line.ros_date.toordinal()
+                line_has_ros[position] = True
+            matches = np.union1d(
+                snapshot.commodity_index.get(int(line_commodity[position]), _EMPTY_INDEX),
+                snapshot.equipment_index.get(int(line_equipment[position]), _EMPTY_INDEX),
+            )
+            pair_items.append(np.full(len(matches), position, dtype=np.int64))
+            pair_rows.append(matches)
+
+        item_of = np.concatenate(pair_items) if pair_items else _EMPTY_INDEX
+        row_of = np.concatenate(pair_rows) if pair_rows else _EMPTY_INDEX
+        self.stats.pairs_scored += len(row_of)
+
+        commodity = snapshot.commodity_codes[row_of]
+        compatibility = np.select(
+            [
+                (commodity == line_commodity[item_of]) & (snapshot.wbs_codes[row_of] == line_wbs[item_of]),
+                commodity == line_commodity[item_of],
+                snapshot.equipment_codes[row_of] == line_equipment[item_of],
+            ],
+            [100, 80, 70],
+            default=0,
+        )
+
+        available = snapshot.available[row_of]
+        hard_free = available - snapshot.hard_reserved[row_of] - snapshot.safety_stock[row_of] > 0
+        soft_free = available - snapshot.reserved[row_of] > 0
+        above_safety = available > snapshot.safety_stock[row_of]
+        blocked = ~snapshot.is_available[row_of]
+        availability_score = np.select([blocked, hard_free, soft_free, above_safety], [10, 100, 60, 25], default=5)
+
+        # The search function limits each line item's candidates before anything else.
+        order = np.lexsort((row_of, -availability_score, -compatibility, item_of))
+        keep = order[_rank_within_groups(item_of[order]) < fetch_limit]
+        keep = keep[available[keep] > 0]
+
+        # One output row per ROS date of the inventory's WBS, as the outer LEFT JOIN produces.
+        repeats = np.maximum(snapshot.ros_counts[row_of[keep]], 1)
+        keep = np.repeat(keep, repeats)
+        ros_slot = _rank_within_groups(np.repeat(np.arange(len(repeats)), repeats))
+        item_of, row_of = item_of[keep], row_of[keep]
+        compatibility, availability_score = compatibility[keep], availability_score[keep]
+        hard_free, soft_free = hard_free[keep], soft_free[keep]
+        above_safety, blocked = above_safety[keep], blocked[keep]
+
+        has_ros = snapshot.ros_counts[row_of] > 0
+        ros_ordinal = np.zeros(len(row_of), dtype=np.int64)
+        ros_ordinal[has_ros] = snapshot.ros_ordinals[snapshot.ros_offsets[row_of[has_ros]] + ros_slot[has_ros]]
+
+        next_required = snapshot.next_required_by[row_of]
+        has_next = snapshot.has_next_required_by[row_of]
+        urgency = np.select(
+            [
+                ~line_has_ros[item_of],
+                ~has_next,
+                next_required <= line_ros[item_of],
+                next_required <= line_ros[item_of] + 7,
+            ],
+            [50, 80, 40, 60],
+            default=90,
+        )
+        status = np.select(
+            [blocked, hard_free, soft_free & snapshot.any_reassignable[row_of], above_safety],
+            ["blocked", "free", "reassignable", "emergency_only"],
+            default="unavailable",
+        )
+        impact = np.select(
+            [blocked, hard_free, soft_free],
+            ["blocked", "no_impact", "moderate_impact"],
+            default="critical_decision",
+        )
+        today = self._today or 0
+        recovery = np.maximum(
+            0,
+            np.where(
+                has_next,
+                next_required - today,
+                np.where(has_ros, ros_ordinal - today, np.where(impact == "critical_decision", 1, 3)),
+            ),
+        )
+
+        origins = [self._deliveries.get(item.scn_id) if item.scn_id else None for item in items]
+        distance_matrix = np.vstack([self._distance_row(snapshot, origin) for origin in origins])
+        distance = distance_matrix[item_of, snapshot.warehouse_codes[row_of]]
+
+        key_1, key_2, key_3 = _sort_keys(search_order, distance, compatibility, urgency, availability_score)
+
+        priority = np.where(snapshot.has_max_priority[row_of], snapshot.max_priority[row_of], 0)
+        selected = _passes(thresholds, recovery, priority, distance)
+        if after is not None:
+            # Rows the cursor's threshold filtered out were never read, wherever they rank.
+            selected &= _after_cursor(snapshot, after, item_of, row_of, key_1, key_2, key_3) | ~_passes(
+                cursor_thresholds, recovery, priority, distance
+            )
+
+        candidates = np.flatnonzero(selected)
+        order = candidates[
+            np.lexsort(
+                (row_of[candidates], key_3[candidates], key_2[candidates], key_1[candidates], item_of[candidates])
+            )
+        ]
+        page_row = _rank_within_groups(item_of[order])
+        order = order[(page_row >= offset) & (page_row < offset + window)]
+
+        pages: list[list[dict[str, Any]]] = [[] for _ in items]
+        for index in order.tolist():
+            row = int(row_of[index])
+            has_priority = bool(snapshot.has_max_priority[row])
+            next_date = date.fromordinal(int(next_required[index])) if has_next[index] else None
+            pages[int(item_of[index])].append(
+                {
+                    "inventory_id": UUID(bytes=snapshot.ids[row].tobytes()),
+                    "warehouse_id": snapshot.warehouse_ids[snapshot.warehouse_codes[row]],
+                    "warehouse_name": snapshot.warehouse_names[row],
+                    "material_description": snapshot.material_descriptions[row],
+                    "available_quantity": _to_decimal(snapshot.available[row]),
+                    "reserved_quantity": _to_decimal(snapshot.reserved[row]),
+                    "soft_available_quantity": _to_decimal(
+                        max(snapshot.available[row] - snapshot.reserved[row], 0)
+                    ),
+                    "hard_available_quantity": _to_decimal(
+                        max(snapshot.available[row] - snapshot.hard_reserved[row] - snapshot.safety_stock[row], 0)
+                    ),
+                    "approval_requirement": _APPROVAL_BY_STATUS.get(str(status[index]), "none"),
+                    "impact_level": str(impact[index]),
+                    "estimated_recovery_days": int(recovery[index]),
+                    "risk_summary": "Next required: {} | Priority: {}".format(
+                        next_date.isoformat() if next_date is not None else "",
+                        int(snapshot.max_priority[row]) if has_priority else "none",
+                    ),
+                    "distance_km": None if np.isnan(distance[index]) else float(distance[index]),
+                    "max_priority": int(snapshot.max_priority[row]) if has_priority else None,
+                    "next_required_by": next_date,
+                    "compatibility_score": int(compatibility[index]),
+                    "urgency_score": int(urgency[index]),
+                    "availability_score": int(availability_score[index]),
+                    "availability_status": str(status[index]),
+                    "sort_key_1": float(key_1[index]),
+                    "sort_key_2": int(key_2[index]),
+                    "sort_key_3": int(key_3[index]),
+                }
+            )
+        return pages
+
+
+_EMPTY_INDEX = np.empty(0, dtype=np.int64)
+
+
+def _build_snapshot(
+    columns: Mapping[str, np.ndarray], ros_wbs: np.ndarray, ros_ordinals: np.ndarray
+) -> _ProjectSnapshot:
+    """Build a project snapshot from inventory columns and every known (WBS, ROS date) pair.
+
+    ``columns`` holds the inventory search columns in inventory id order, with UUIDs as
+    ``V16`` values, quantities in ten-thousandths, dates as ordinals and a ``<name>_valid``
+    mask for each nullable column.
+    """
+    warehouses, warehouse_codes = np.unique(columns["warehouse_id"], return_inverse=True)
+    references = ("commodity_code_id", "equipment_id", "wbs_id")
+    codes = np.unique(np.concatenate([columns[name][columns[f"{name}_valid"]] for name in references]))
+    commodity_codes, equipment_codes, wbs_codes = (
+        _codes_of(codes, columns[name], columns[f"{name}_valid"], _INVENTORY_NULL) for name in references
+    )
+
+    # ROS dates grouped by WBS code, so each row's dates are one contiguous slice.
+    ros_codes = _codes_of(codes, ros_wbs, np.ones(len(ros_wbs), dtype=bool), _INVENTORY_NULL)
+    matched = ros_codes != _INVENTORY_NULL
+    order = np.argsort(ros_codes[matched], kind="stable")
+    counts_by_code = np.bincount(ros_codes[matched], minlength=len(codes))
+    offsets_by_code = np.cumsum(counts_by_code) - counts_by_code
+    has_wbs = wbs_codes != _INVENTORY_NULL
+    wbs_slot = np.where(has_wbs, wbs_codes, 0)
+
+    return _ProjectSnapshot(
+        ids=np.asarray(columns["id"]),
+        warehouse_ids=_to_uuids(warehouses),  # type: ignore[arg-type]
+        warehouse_names=np.asarray(columns["warehouse_name"], dtype=object),
+        material_descriptions=np.asarray(columns["material_description"], dtype=object),
+        warehouse_codes=warehouse_codes.astype(np.int64).reshape(-1),
+        commodity_codes=commodity_codes,
+        equipment_codes=equipment_codes,
+        wbs_codes=wbs_codes,
+        available=np.asarray(columns["quantity_available"], dtype=np.int64),
+        reserved=np.asarray(columns["quantity_reserved"], dtype=np.int64),
+        hard_reserved=np.asarray(columns["quantity_hard_reserved"], dtype=np.int64),
+        safety_stock=np.asarray(columns["safety_stock_level"], dtype=np.int64),
+        is_available=np.asarray(columns["is_available"], dtype=bool),
+        next_required_by=np.asarray(columns["next_required_by"], dtype=np.int64),
+        has_next_required_by=np.asarray(columns["next_required_by_valid"], dtype=bool),
+        max_priority=np.asarray(columns["max_priority"], dtype=np.int64),
+        has_max_priority=np.asarray(columns["max_priority_valid"], dtype=bool),
+        any_reassignable=np.asarray(columns["any_reassignable"], dtype=bool),
+        ros_offsets=np.where(has_wbs, offsets_by_code[wbs_slot] if len(codes) else 0, 0),
+        ros_counts=np.where(has_wbs, counts_by_code[wbs_slot] if len(codes) else 0, 0),
+        ros_ordinals=np.asarray(ros_ordinals, dtype=np.int64)[matched][order],
+        commodity_index=_index_by_code(commodity_codes),
+        equipment_index=_index_by_code(equipment_codes),
+        codes=codes,
+    )
+
+
+def _record_columns(records: Sequence[Any]) -> dict[str, np.ndarray]:
+    """Convert inventory query records into the column layout ``_build_snapshot`` expects."""
+    columns: dict[str, np.ndarray] = {}
+    for name in ("id", "warehouse_id", "commodity_code_id", "equipment_id", "wbs_id"):
+        values = [record[name] for record in records]
+        columns[name] = _uuid_array(values)
+        columns[f"{name}_valid"] = np.array([value is not None for value in values], dtype=bool)
+    for name in ("warehouse_name", "material_description"):
+        columns[name] = np.array([str(record[name]) for record in records], dtype=object)
+    for name in ("quantity_available", "quantity_reserved", "quantity_hard_reserved", "safety_stock_level"):
+        columns[name] = np.array([_to_units(record[name]) for record in records], dtype=np.int64)
+    for name in ("is_available", "any_reassignable"):
+        columns[name] = np.array([bool(record[name]) for record in records], dtype=bool)
+    next_dates = [record["next_required_by"] for record in records]
+    columns["next_required_by"] = np.array([value.toordinal() if value else 0 for value in next_dates], dtype=np.int64)
+    columns["next_required_by_valid"] = np.array([value is not None for value in next_dates], dtype=bool)
+    priorities = [record["max_priority"] for record in records]
+    columns["max_priority"] = np.array([value or 0 for value in priorities], dtype=np.int64)
+    columns["max_priority_valid"] = np.array([value is not None for value in priorities], dtype=bool)
+    return columns
+
+
+def _uuid_array(values: Sequence[UUID | None]) -> np.ndarray:
+    """Pack UUIDs into ``V16`` values; NULLs become zero bytes and need a separate mask."""
+    return np.frombuffer(b"".join(value.bytes if value is not None else bytes(16) for value in values), dtype="V16")
+
+
+def _to_uuids(values: np.ndarray, valid: np.ndarray | None = None) -> list[UUID | None]:
+    if valid is None:
+        return [UUID(bytes=value.tobytes()) for value in values]
+    return [UUID(bytes=value.tobytes()) if ok else None for value, ok in zip(values, valid.tolist())]
+
+
+def _codes_of(codes: np.ndarray, values: np.ndarray, valid: np.ndarray, missing: int) -> np.ndarray:
+    """Position of each valid value in the sorted ``codes`` array, ``missing`` otherwise."""
+    positions = np.searchsorted(codes, values).astype(np.int64)
+    found = np.asarray(valid, dtype=bool) & (positions < len(codes))
+    found[found] = codes[positions[found]] == values[found]
+    return np.where(found, positions, missing)
+
+
+def _index_by_code(codes: np.ndarray) -> dict[int, np.ndarray]:
+    index: dict[int, np.ndarray] = {}
+    order = np.argsort(codes, kind="stable")
+    values, starts = np.unique(codes[order], return_index=True)
+    for value, rows in zip(values.tolist(), np.split(order, starts[1:])):
+        if value != _INVENTORY_NULL:
+            index[value] = rows
+    return index
+
+
+def _line_code(snapshot: _ProjectSnapshot, value: UUID | None) -> int:
+    if value is None:
+        return _LINE_NULL
+    key = np.void(value.bytes)
+    position = int(np.searchsorted(snapshot.codes, key))
+    if position < len(snapshot.codes) and snapshot.codes[position] == key:
+        return position
+    return _LINE_NULL
+
+
+def _rank_within_groups(groups: np.ndarray) -> np.ndarray:
+    """Zero-based position of each element within its run of equal, adjacent group values."""
+    if not len(groups):
+        return _EMPTY_INDEX
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    lengths = np.diff(np.r_[starts, len(groups)])
+    return np.arange(len(groups)) - np.repeat(starts, lengths)
+
+
+def _sort_keys(
+    search_order: str,
+    distance: np.ndarray,
+    compatibility: np.ndarray,
+    urgency: np.ndarray,
+    availability: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if search_order == "availability_first":
+        return -availability.astype(np.float64), -compatibility, -urgency
+    if search_order == "proximity_first":
+        return np.where(np.isnan(distance), np.inf, distance), -compatibility, -availability
+    return -urgency.astype(np.float64), -compatibility, -availability
+
+
+def _passes(
+    thresholds: tuple[int | None, int | None, float | None],
+    recovery: np.ndarray,
+    priority: np.ndarray,
+    distance: np.ndarray,
+) -> np.ndarray:
+    """Rows passing the strategy thresholds, as the inventory query applies them."""
+    selected = np.ones(len(recovery), dtype=bool)
+    max_recovery_days, min_priority, max_distance_km = thresholds
+    if max_recovery_days is not None:
+        selected &= recovery <= max_recovery_days
+    if min_priority is not None:
+        selected &= priority >= min_priority
+    if max_distance_km is not None:
+        selected &= np.isnan(distance) | (distance <= max_distance_km)
+    return selected
+
+
+def _after_cursor(
+    snapshot: _ProjectSnapshot,
+    after: Sequence[tuple[float, int, int, UUID] | None],
+    item_of: np.ndarray,
+    row_of: np.ndarray,
+    key_1: np.ndarray,
+    key_2: np.ndarray,
+    key_3: np.ndarray,
+) -> np.ndarray:
+    """Rows whose sort tuple comes strictly after their item's cursor (or with no cursor)."""
+    unset = np.array([cursor is None for cursor in after], dtype=bool)
+    cursor_1 = np.array([cursor[0] if cursor else 0.0 for cursor in after], dtype=np.float64)
+    cursor_2 = np.array([cursor[1] if cursor else 0 for cursor in after], dtype=np.int64)
+    cursor_3 = np.array([cursor[2] if cursor else 0 for cursor in after], dtype=np.int64)
+    # Inventory ids sort like PostgreSQL's uuid ordering; rows are stored in that order, so an
+    # id comes after the cursor's id exactly when its row index reaches the insertion point.
+    cursor_row = np.array(
+        [
+            np.searchsorted(snapshot.ids, np.void(cursor[3].bytes), side="right") if cursor else 0
+            for cursor in after
+        ],
+        dtype=np.int64,
+    )
+    c1, c2, c3, c_row = cursor_1[item_of], cursor_2[item_of], cursor_3[item_of], cursor_row[item_of]
+    return unset[item_of] | (key_1 > c1) | (
+        (key_1 == c1)
+        & ((key_2 > c2) | ((key_2 == c2) & ((key_3 > c3) | ((key_3 == c3) & (row_of >= c_row)))))
+    )
+
+
+def _to_units(value: Decimal | str) -> int:
+    # The compact codec profile hands NUMERIC columns over as text.
+    if isinstance(value, str):
+        value = Decimal(value)
+    return int(value.scaleb(_QUANTITY_SCALE))
+
+
+def _to_decimal(units: Any) -> Decimal:
+    return Decimal(int(units)).scaleb(-_QUANTITY_SCALE)
@@ -0,0 +1,60 @@
+"""Process-wide registry of SQL texts rendered once and run through asyncpg's statement cache."""
+
+from __future__ import annotations
+
+from typing import Any, Mapping
+
+import asyncpg  # type: ignore[import-untyped]
+
+__all__ = [
+    "BoundStatements",
+    "StatementRegistry",
+]
+
+
+class StatementRegistry:
+    """Holds fully rendered SQL keyed by name and runs it through asyncpg's statement cache.
+
+    asyncpg prepares each query text once per physical connection and keeps the statement in
+    that connection's cache across pool checkouts, whereas ``PreparedStatement`` handles are
+    invalidated when a pooled connection is released. Statements therefore go through the
+    connection's own cache rather than ``connection.prepare``. That cache is not observable
+    through asyncpg's public API (it also evicts statements by age and size), so the registry
+    keeps no prepare or hit counts it could not get right.
+    """
+
+    def __init__(self, queries: Mapping[str, str]) -> None:
+        self._queries = dict(queries)
+
+    def sql(self, key: str) -> str:
+        try:
+            return self._queries[key]
+        except KeyError as exc:
+            raise KeyError(f"Unknown statement '{key}'") from exc
+
+    def keys(self) -> tuple[str, ...]:
+        return tuple(self._queries)
+
+    def bind(self, connection: asyncpg.Connection) -> BoundStatements:
+        return BoundStatements(self, connection)
+
+
+class BoundStatements:
+    """The registry's statements bound to one connection checkout."""
+
+    def __init__(self, registry: StatementRegistry, connection: asyncpg.Connection) -> None:
+        self._registry = registry
+        self._connection = connection
+
+    @property
+    def connection(self) -> asyncpg.Connection:
+        return self._connection
+
+    def sql(self, key: str) -> str:
+        return self._registry.sql(key)
+
+    async def fetch(self, key: str, *args: Any, timeout: float | None = None) -> list[Any]:
+        # A stale server-side plan (e.g. the search function was replaced) raises
+        # InvalidCachedStatementError; asyncpg clears the pool's statement caches and, outside
+        # a transaction, has already retried once, so the next use prepares afresh.
+        return await self._connection.fetch(self._registry.sql(key), *args, timeout=timeout)
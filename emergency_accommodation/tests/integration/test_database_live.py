@@ -1,13 +1,44 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
 import time
-from typing import cast
+from contextlib import aclosing
+from pathlib import Path
+from typing import AsyncIterator, cast
+from uuid import UUID
 
+import asyncpg  # type: ignore[import-untyped]
 import pytest
+import pytest_asyncio
 
+from candidate_store import CandidateStore
+from codec_benchmark import benchmark_codec_profiles
+from change_listener import ChangeEvent, ChangeListener
 from config import load_search_parameters
-from database import load_failed_items, load_inventory_by_iteration
+from database import (
+    FailedItemCache,
+    InventoryFetchOptions,
+    InventoryPager,
+    _CandidateFilter,
+    _fetch_candidate_groups,
+    _fetch_inventory_for_items,
+    _gather_candidate_groups,
+    load_failed_items,
+    load_inventory_by_iteration,
+    stream_inventory_options,
+)
+from db_pool import DatabasePool, PoolSettings, ReplicaSettings
+from inventory_snapshot import (
+    _DATA_VERSION_QUERY,
+    export_inventory_snapshot,
+    load_inventory_snapshot,
+    snapshot_is_current,
+)
+from query_metrics import QueryMetrics, query_metrics
+from run_budget import RunBudget, RunDeadlineExceeded, use_budget
+from scoring_engine import InventoryScoringEngine
 
 _database_url = os.getenv("DATABASE_URL")
 if not _database_url:
@@ -17,10 +48,16 @@ DATABASE_URL = cast(str, _database_url)
 SCENARIOS = ("scenario1", "scenario2", "scenario3")
 
 
+@pytest_asyncio.fixture
+async def pool() -> AsyncIterator[DatabasePool]:
+    async with DatabasePool(DATABASE_URL, PoolSettings(min_size=1, max_size=2)) as shared:
+        yield shared
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize("scenario", SCENARIOS)
-async def test_live_failed_items_have_positive_quantity(scenario: str) -> None:
-    items = await load_failed_items(DATABASE_URL, scenario)
+async def test_live_failed_items_have_positive_quantity(pool: DatabasePool, scenario: str) -> None:
+    items = await load_failed_items(pool, scenario)
     assert items, f"expected failed items for {scenario}"
     for item in items:
         assert item.quantity > 0
@@ -29,16 +66,16 @@ async def test_live_failed_items_have_positive_quantity(scenario: str) -> None:
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize("scenario", SCENARIOS)
-async def test_live_inventory_iterations_respect_batch_size(scenario: str) -> None:
+async def test_live_inventory_iterations_respect_batch_size(pool: DatabasePool, scenario: str) -> None:
     config = load_search_parameters(scenario)
     config = {**config, "batch_size_per_iteration": 4}
 
-    failed_items = await load_failed_items(DATABASE_URL, scenario)
+    failed_items = await load_failed_items(pool, scenario)
     assert failed_items
 
     start = time.perf_counter()
     first_iteration = await load_inventory_by_iteration(
-        DATABASE_URL,
+        pool,
         failed_items,
         iteration_num=1,
         config=config,
@@ -49,7 +86,7 @@ async def test_live_inventory_iterations_respect_batch_size(scenario: str) -> No
     assert 0 < len(first_iteration) <= config["batch_size_per_iteration"]
 
     second_iteration = await load_inventory_by_iteration(
-        DATABASE_URL,
+        pool,
         failed_items,
         iteration_num=2,
         config=config,
@@ -62,7 +99,7 @@ async def test_live_inventory_iterations_respect_batch_size(scenario: str) -> No
 
 
 @pytest.mark.asyncio
-async def test_live_distance_strategy_widens_per_iteration() -> None:
+async def test_live_distance_strategy_widens_per_iteration(pool: DatabasePool) -> None:
     config = load_search_parameters("scenario3")
     config = {
         **config,
@@ -71,11 +108,11 @@ async def test_live_distance_strategy_widens_per_iteration() -> None:
         "search_order": "proximity_first",
     }
 
-    failed_items = await load_failed_items(DATABASE_URL, "scenario3")
+    failed_items = await load_failed_items(pool, "scenario3")
     assert failed_items
 
     first_iter = await load_inventory_by_iteration(
-        DATABASE_URL,
+        pool,
         failed_items,
         iteration_num=1,
         config=config,
@@ -84,7 +121,7 @@ async def test_live_distance_strategy_widens_per_iteration() -> None:
     max_distance_first = max((opt.distance_km or 0) for opt in first_iter)
 
     second_iter = await load_inventory_by_iteration(
-        DATABASE_URL,
+        pool,
         failed_items,
         iteration_num=2,
         config=config,
@@ -95,3 +132,698 @@ async def test_live_distance_strategy_widens_per_iteration() -> None:
     max_distance_second = max((opt.distance_km or 0) for opt in second_iter)
 
     assert max_distance_second >= max_distance_first
+
+
+@pytest.mark.asyncio
+async def test_live_pool_reuses_connections_across_iterations(pool: DatabasePool) -> None:
+    config = load_search_parameters("scenario1")
+    failed_items = await load_failed_items(pool, "scenario1")
+    for iteration in (1, 2):
+        await load_inventory_by_iteration(pool, failed_items, iteration_num=iteration, config=config)
+
+    metrics = pool.metrics
+    # One checkout for failed items, one per iteration, plus at most one unfiltered fallback each.
+    assert 3 <= metrics.acquisitions <= 5
+    assert metrics.peak_in_use <= pool.settings.max_size
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("time_window_type", ["weekly", "priority_based", "distance_based"])
+@pytest.mark.parametrize("search_order", ["urgency_first", "availability_first", "proximity_first"])
+async def test_live_fetch_modes_match_sequential(
+    pool: DatabasePool, time_window_type: str, search_order: str
+) -> None:
+    failed_items = await load_failed_items(pool, "scenario1-enhanced")
+    assert failed_items
+
+    base = {
+        "batch_size_per_iteration": 3,
+        "time_window_type": time_window_type,
+        "search_order": search_order,
+    }
+    for iteration in (1, 2, 3):
+        sequential = await load_inventory_by_iteration(
+            pool, failed_items, iteration_num=iteration, config={**base, "inventory_fetch_mode": "sequential"}
+        )
+        expected = [opt.inventory_id for opt in sequential]
+        for mode in ("batched", "concurrent"):
+            options = await load_inventory_by_iteration(
+                pool, failed_items, iteration_num=iteration, config={**base, "inventory_fetch_mode": mode}
+            )
+            assert [opt.inventory_id for opt in options] == expected, mode
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("search_order", ["urgency_first", "availability_first", "proximity_first"])
+@pytest.mark.parametrize("mode", ["batched", "sequential"])
+async def test_live_keyset_pages_match_offset_pages(pool: DatabasePool, search_order: str, mode: str) -> None:
+    failed_items = await load_failed_items(pool, "scenario1-enhanced")
+    fetch = InventoryFetchOptions(mode=mode, max_iterations=4)
+    pager = InventoryPager()
+
+    pages: list[list[object]] = []
+    for iteration in (1, 2, 3, 4):
+        resumed = await _gather_candidate_groups(pool, failed_items, iteration, 2, search_order, fetch, pager)
+        offset = await _gather_candidate_groups(pool, failed_items, iteration, 2, search_order, fetch)
+        pages.append([row["inventory_id"] for rows in resumed for row in rows])
+        assert pages[-1] == [row["inventory_id"] for rows in offset for row in rows]
+
+    assert pages[0], "expected a first page of candidates"
+
+
+@pytest.mark.asyncio
+async def test_live_candidate_store_avoids_repeating_options(pool: DatabasePool) -> None:
+    config = {**load_search_parameters("scenario1-enhanced"), "batch_size_per_iteration": 2}
+    failed_items = await load_failed_items(pool, "scenario1-enhanced")
+    pager, store = InventoryPager(), CandidateStore()
+
+    shown: list[object] = []
+    for iteration in (1, 2, 3):
+        options = await load_inventory_by_iteration(
+            pool, failed_items, iteration_num=iteration, config=config, pager=pager, store=store
+        )
+        shown.extend(opt.inventory_id for opt in options)
+
+    assert shown
+    assert len(shown) == len(set(shown))
+    assert store.stats.misses >= len(failed_items)
+    assert store.stats.rows_reused > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit", [1, 2, 10])
+async def test_live_batch_search_function_matches_per_item_function(pool: DatabasePool, limit: int) -> None:
+    failed_items = await load_failed_items(pool, "scenario1-enhanced")
+    line_item_ids = [item.line_item_id for item in failed_items]
+
+    async with pool.acquire() as connection:
+        expected = []
+        for line_item_id in line_item_ids:
+            rows = await connection.fetch(
+                "SELECT $1::uuid AS source_line_item_id, * FROM fn_emergency_inventory_candidates($1, $2)",
+                line_item_id,
+                limit,
+            )
+            wrapped = await connection.fetch("SELECT * FROM fn_emergency_inventory_search($1, $2)", line_item_id, limit)
+            assert [tuple(row)[1:11] for row in rows] == [tuple(row) for row in wrapped]
+            expected.extend(tuple(row) for row in rows)
+        batched = await connection.fetch(
+            "SELECT * FROM fn_emergency_inventory_search_batch($1, $2)",
+            line_item_ids,
+            [limit] * len(line_item_ids),
+        )
+
+    assert sorted(map(str, expected)) == sorted(str(tuple(row)) for row in batched)
+
+
+@pytest.mark.asyncio
+async def test_live_unknown_line_items_have_no_candidates_and_only_the_wrapper_raises(pool: DatabasePool) -> None:
+    failed_items = await load_failed_items(pool, "scenario1")
+    unknown = UUID(int=0)
+
+    async with pool.acquire() as connection:
+        assert await connection.fetch("SELECT * FROM fn_emergency_inventory_candidates($1)", unknown) == []
+        batched = await connection.fetch(
+            "SELECT DISTINCT source_line_item_id FROM fn_emergency_inventory_search_batch($1)",
+            [unknown, failed_items[0].line_item_id],
+        )
+        with pytest.raises(asyncpg.RaiseError, match="not found"):
+            await connection.fetch("SELECT * FROM fn_emergency_inventory_search($1)", unknown)
+
+    assert [row["source_line_item_id"] for row in batched] == [failed_items[0].line_item_id]
+
+
+@pytest.mark.asyncio
+async def test_live_reservation_summary_tracks_reservation_changes(pool: DatabasePool) -> None:
+    async with pool.acquire() as connection:
+        assert await connection.fetch("SELECT * FROM fn_check_inventory_reservation_summary()") == []
+
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            inventory_id = await connection.fetchval("SELECT inventory_id FROM inventory_reservation_summary LIMIT 1")
+            await connection.execute(
+                "UPDATE inventory_reservations SET priority_level = 99, can_reassign = TRUE WHERE inventory_id = $1",
+                inventory_id,
+            )
+            summary = await connection.fetchrow(
+                "SELECT max_priority, any_reassignable FROM inventory_reservation_summary WHERE inventory_id = $1",
+                inventory_id,
+            )
+            assert tuple(summary) == (99, True)
+
+            await connection.execute("DELETE FROM inventory_reservations WHERE inventory_id = $1", inventory_id)
+            assert await connection.fetchval(
+                "SELECT COUNT(*) FROM inventory_reservation_summary WHERE inventory_id = $1", inventory_id
+            ) == 0
+            assert await connection.fetch("SELECT * FROM fn_check_inventory_reservation_summary()") == []
+        finally:
+            await transaction.rollback()
+
+
+# Ordered pairs of located warehouses within one project: the size of the distance matrix.
+_SAME_PROJECT_PAIRS = """
+SELECT COALESCE(SUM(located * located), 0)
+FROM (
+    SELECT COUNT(*) AS located
+    FROM warehouses
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    GROUP BY project_id
+) AS projects
+"""
+
+
+@pytest.mark.asyncio
+async def test_live_warehouse_distances_follow_coordinate_changes(pool: DatabasePool) -> None:
+    async with pool.acquire() as connection:
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            await connection.execute(
+                "UPDATE warehouses SET latitude = 29.5 + random(), longitude = -95.5 + random()"
+            )
+            stale = await connection.fetchval(
+                """
+                SELECT COUNT(*)
+                FROM warehouse_distances d
+                JOIN warehouses a ON a.id = d.from_warehouse_id
+                JOIN warehouses b ON b.id = d.to_warehouse_id
+                WHERE abs(d.distance_km - fn_great_circle_km(a.latitude, a.longitude, b.latitude, b.longitude)) > 1e-9
+                """
+            )
+            assert await connection.fetchval("SELECT COUNT(*) FROM warehouse_distances") == await connection.fetchval(
+                _SAME_PROJECT_PAIRS
+            )
+            assert stale == 0
+            assert await connection.fetchval(
+                """
+                SELECT COUNT(*)
+                FROM warehouse_distances d
+                JOIN warehouses a ON a.id = d.from_warehouse_id
+                JOIN warehouses b ON b.id = d.to_warehouse_id
+                WHERE a.project_id <> b.project_id
+                """
+            ) == 0
+
+            await connection.execute(
+                "UPDATE warehouses SET latitude = NULL WHERE id = (SELECT id FROM warehouses ORDER BY id LIMIT 1)"
+            )
+            assert await connection.fetchval("SELECT COUNT(*) FROM warehouse_distances") == await connection.fetchval(
+                _SAME_PROJECT_PAIRS
+            )
+        finally:
+            await transaction.rollback()
+
+
+@pytest.mark.asyncio
+async def test_live_nearest_warehouses_respect_radius_and_order(pool: DatabasePool) -> None:
+    async with pool.acquire() as connection:
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            await connection.execute(
+                "UPDATE warehouses SET latitude = 25 + random() * 10, longitude = -100 + random() * 10"
+            )
+            origin = await connection.fetchval("SELECT id FROM warehouses ORDER BY id LIMIT 1")
+            everything = await connection.fetch("SELECT * FROM fn_nearest_warehouses($1)", origin)
+            within = await connection.fetch("SELECT * FROM fn_nearest_warehouses($1, 500, 5)", origin)
+        finally:
+            await transaction.rollback()
+
+    distances = [row["distance_km"] for row in everything]
+    assert everything[0]["warehouse_id"] == origin
+    assert distances == sorted(distances)
+    assert [tuple(row) for row in within] == [tuple(row) for row in everything if row["distance_km"] <= 500][:5]
+
+
+@pytest.mark.asyncio
+async def test_live_distance_band_keeps_nearby_and_unlocated_warehouses(pool: DatabasePool) -> None:
+    items = [item for scenario in SCENARIOS for item in await load_failed_items(pool, scenario)]
+    search = {"fetch_limit": 1000, "offset": 0, "window": 1000, "search_order": "proximity_first"}
+    band = _CandidateFilter(max_distance_km=500.0)
+    fetched: list[tuple[list[list[dict]], list[list[dict]]]] = []
+    async with pool.acquire() as connection:
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            # Each project gets warehouses about 334 and 667 km north of its existing ones, and
+            # its stock alternates between the two.
+            await connection.execute("UPDATE warehouses SET latitude = 30, longitude = -100")
+            await connection.execute(
+                """
+                INSERT INTO warehouses (project_id, name, warehouse_code, latitude, longitude)
+                SELECT p.project_id, 'Band test ' || g, 'BAND-' || g, 30 + g * 3, -100
+                FROM (SELECT DISTINCT project_id FROM warehouses) AS p
+                CROSS JOIN generate_series(1, 2) AS g
+                """
+            )
+            await connection.execute(
+                """
+                UPDATE warehouse_inventory wi
+                SET warehouse_id = w.id
+                FROM (
+                    SELECT id, project_id, row_number() OVER (PARTITION BY project_id ORDER BY id) AS position
+                    FROM warehouse_inventory
+                ) AS stock
+                JOIN warehouses w ON w.project_id = stock.project_id
+                WHERE stock.id = wi.id AND w.warehouse_code = 'BAND-' || (2 - stock.position % 2)
+                """
+            )
+            fetched.append(
+                (
+                    await _fetch_inventory_for_items(connection, items, **search),
+                    await _fetch_inventory_for_items(connection, items, criteria=band, **search),
+                )
+            )
+            # Without coordinates the far warehouses have no distance and stay in every band.
+            await connection.execute("UPDATE warehouses SET latitude = NULL WHERE warehouse_code = 'BAND-2'")
+            fetched.append(
+                (
+                    await _fetch_inventory_for_items(connection, items, **search),
+                    await _fetch_inventory_for_items(connection, items, criteria=band, **search),
+                )
+            )
+        finally:
+            await transaction.rollback()
+
+    distances: list[set[float | None]] = []
+    for everything, banded in fetched:
+        for all_rows, band_rows in zip(everything, banded, strict=True):
+            expected = [row for row in all_rows if row["distance_km"] is None or row["distance_km"] <= 500.0]
+            assert [row["inventory_id"] for row in band_rows] == [row["inventory_id"] for row in expected]
+        distances.append({row["distance_km"] and round(row["distance_km"]) for rows in everything for row in rows})
+    assert distances == [{334, 667}, {334, None}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("search_order", ["availability_first", "proximity_first", "urgency_first"])
+@pytest.mark.parametrize("pagination", ["keyset", "offset"])
+async def test_live_vectorized_engine_matches_sql_rows(pool: DatabasePool, search_order: str, pagination: str) -> None:
+    criteria_options = [
+        _CandidateFilter(),
+        _CandidateFilter(max_recovery_days=7),
+        _CandidateFilter(min_priority=60),
+        _CandidateFilter(max_distance_km=250.0),
+    ]
+    for scenario in SCENARIOS:
+        items = await load_failed_items(pool, scenario)
+        engine = InventoryScoringEngine()
+        for criteria in criteria_options:
+            sql_pager, engine_pager = InventoryPager(), InventoryPager()
+            for iteration in (1, 2, 3):
+                expected = await _fetch_candidate_groups(
+                    pool,
+                    items,
+                    iteration,
+                    2,
+                    search_order,
+                    InventoryFetchOptions(mode="sequential", pagination=pagination),
+                    sql_pager,
+                    criteria=criteria,
+                )
+                actual = await _fetch_candidate_groups(
+                    pool,
+                    items,
+                    iteration,
+                    2,
+                    search_order,
+                    InventoryFetchOptions(pagination=pagination, backend="vectorized"),
+                    engine_pager,
+                    engine,
+                    criteria=criteria,
+                )
+                assert actual == expected, (scenario, criteria, iteration)
+        assert engine.stats.projects_loaded == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scenario", SCENARIOS)
+async def test_live_snapshot_engine_matches_live_engine(pool: DatabasePool, scenario: str, tmp_path: Path) -> None:
+    snapshot = await export_inventory_snapshot(pool, scenario, tmp_path)
+    assert await snapshot_is_current(pool, snapshot)
+
+    items = await load_failed_items(pool, scenario)
+    options = InventoryFetchOptions(backend="vectorized")
+    live_engine = InventoryScoringEngine()
+    snapshot_engine = InventoryScoringEngine.from_snapshot(load_inventory_snapshot(tmp_path))
+    for search_order in ("availability_first", "proximity_first", "urgency_first"):
+        live_pager, snapshot_pager = InventoryPager(), InventoryPager()
+        for iteration in (1, 2):
+            expected = await _fetch_candidate_groups(
+                pool, items, iteration, 3, search_order, options, live_pager, live_engine
+            )
+            actual = await _fetch_candidate_groups(
+                pool, items, iteration, 3, search_order, options, snapshot_pager, snapshot_engine
+            )
+            assert actual == expected, (search_order, iteration)
+    assert snapshot_engine.stats.projects_loaded == 1
+
+    async with pool.acquire() as connection:
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            await connection.execute(
+                "UPDATE warehouse_inventory SET quantity_reserved = quantity_reserved + 1 WHERE id = $1",
+                UUID(bytes=snapshot.columns("inventory")["id"][0].tobytes()),
+            )
+            changed = await connection.fetchval(_DATA_VERSION_QUERY, snapshot.project_id)
+        finally:
+            await transaction.rollback()
+    assert changed != snapshot.data_version
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scenario", SCENARIOS)
+async def test_live_stream_matches_batched_fetch_and_stops_early(pool: DatabasePool, scenario: str) -> None:
+    items = await load_failed_items(pool, scenario)
+    grouped = await _fetch_candidate_groups(
+        pool, items, 1, 5, "proximity_first", InventoryFetchOptions(pagination="offset")
+    )
+    expected: list[object] = []
+    for rows in grouped:
+        expected.extend(row["inventory_id"] for row in rows if row["inventory_id"] not in expected)
+
+    streamed = [
+        option.inventory_id
+        async for batch in stream_inventory_options(
+            pool, items, search_order="proximity_first", batch_size=3, limit_per_item=10
+        )
+        for option in batch
+    ]
+    assert streamed == expected
+
+    async with aclosing(stream_inventory_options(pool, items, batch_size=1)) as stream:
+        async for _ in stream:
+            break
+    assert pool.metrics.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_live_change_listener_receives_committed_inventory_changes(pool: DatabasePool) -> None:
+    received: list[ChangeEvent] = []
+    arrived = asyncio.Event()
+
+    def record(event: ChangeEvent) -> int:
+        received.append(event)
+        arrived.set()
+        return 0
+
+    async with ChangeListener(pool, record):
+        async with pool.acquire() as connection:
+            reservation = await connection.fetchrow(
+                "SELECT ir.id, ir.inventory_id, wi.project_id"
+                " FROM inventory_reservations ir JOIN warehouse_inventory wi ON wi.id = ir.inventory_id"
+                " ORDER BY ir.id LIMIT 1"
+            )
+            async with connection.transaction():
+                await connection.execute(
+                    "UPDATE inventory_reservations SET priority_level = priority_level WHERE id = $1", reservation["id"]
+                )
+                await asyncio.sleep(0.05)
+                assert not received, "notifications must wait for commit"
+        await asyncio.wait_for(arrived.wait(), timeout=5)
+
+    assert received == [
+        ChangeEvent(
+            "inventory_reservations",
+            "UPDATE",
+            reservation["id"],
+            reservation["project_id"],
+            reservation["inventory_id"],
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_live_change_listener_listens_again_after_its_backend_is_terminated(pool: DatabasePool) -> None:
+    received: list[ChangeEvent] = []
+    arrived = asyncio.Event()
+
+    def record(event: ChangeEvent) -> int:
+        received.append(event)
+        if not event.is_reset:
+            arrived.set()
+        return 0
+
+    async with ChangeListener(pool, record) as listener:
+        async with pool.acquire() as connection:
+            listening_pid = await connection.fetchval(
+                "SELECT pid FROM pg_stat_activity WHERE query LIKE 'LISTEN %' AND pid <> pg_backend_pid()"
+            )
+            await connection.execute("SELECT pg_terminate_backend($1)", listening_pid)
+        for _ in range(100):
+            if listener.stats.reconnects:
+                break
+            await asyncio.sleep(0.05)
+        assert listener.is_listening
+
+        async with pool.acquire() as connection:
+            await connection.execute(
+                "SELECT pg_notify('inventory_changes', json_build_object('table', 'warehouse_inventory',"
+                " 'op', 'UPDATE', 'id', gen_random_uuid())::text)"
+            )
+        await asyncio.wait_for(arrived.wait(), timeout=5)
+
+    assert [event.op for event in received] == ["DISCONNECT", "RECONNECT", "UPDATE"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scenario", SCENARIOS)
+async def test_live_reads_route_to_streaming_replicas(pool: DatabasePool, scenario: str) -> None:
+    read_urls = [url for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()]
+    if not read_urls:
+        pytest.skip("DATABASE_READ_URLS is required for read replica routing tests")
+
+    replicas = ReplicaSettings(dsns=tuple(read_urls), max_lag_seconds=60.0)
+    async with DatabasePool(DATABASE_URL, PoolSettings(min_size=1, max_size=2), replicas=replicas) as routed:
+        async with routed.acquire_read() as connection:
+            assert await connection.fetchval("SELECT pg_is_in_recovery()")
+        replica_items = await load_failed_items(routed, scenario)
+        stats = routed.read_stats.to_dict()
+        lags = [metrics["lag_seconds"] for metrics in routed.replica_metrics().values()]
+
+    assert replica_items == await load_failed_items(pool, scenario)
+    assert (stats["replica_reads"], stats["primary_reads"]) == (2, 0)
+    assert all(lag is not None and 0 <= lag <= 60 for lag in lags)
+
+
+@pytest.mark.asyncio
+async def test_live_query_metrics_capture_search_plans(pool: DatabasePool, tmp_path: Path) -> None:
+    config = load_search_parameters("scenario1")
+    plans = tmp_path / "slow_queries.jsonl"
+    metrics = query_metrics()
+    metrics.reset()
+    metrics.configure(
+        {"slow_query_threshold_ms": 0, "slow_query_explain_path": str(plans), "slow_query_explain_analyze": True}
+    )
+    try:
+        failed_items = await load_failed_items(pool, "scenario1")
+        await load_inventory_by_iteration(pool, failed_items, iteration_num=1, config=config)
+        summary = metrics.end_iteration(1, wall_seconds=1.0)
+    finally:
+        metrics.configure({})
+
+    search = summary["queries"]["inventory_search_batch"]
+    assert search["calls"] == 1 and search["rows"] > 0 and search["bytes_decoded"] > 0
+    entries = [json.loads(line) for line in plans.read_text().splitlines()]
+    assert {entry["query"] for entry in entries} == {"failed_items", "inventory_search_batch"}
+    assert all("Execution Time" in entry["plan"][0] for entry in entries)
+
+
+@pytest.mark.asyncio
+async def test_live_failed_explain_keeps_the_session_transaction_usable(pool: DatabasePool, tmp_path: Path) -> None:
+    metrics = QueryMetrics()
+    metrics.configure({"slow_query_threshold_ms": 0, "slow_query_explain_path": str(tmp_path / "slow.jsonl")})
+    async with pool.acquire() as connection:
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            # SHOW runs but cannot be explained, so the plan capture fails inside the transaction.
+            assert await metrics.fetchval("server_version", connection, "SHOW server_version")
+            assert await metrics.fetchval("after", connection, "SELECT 1") == 1
+
+    # Only the plan of the query after the failure was captured.
+    assert metrics.explains_captured == 1
+
+
+@pytest.mark.asyncio
+async def test_live_prune_drops_change_records_older_than_a_day(pool: DatabasePool) -> None:
+    async with pool.acquire() as connection:
+        transaction = connection.transaction()
+        await transaction.start()
+        try:
+            await connection.execute("DELETE FROM failed_item_changes")
+            await connection.execute(
+                "INSERT INTO failed_item_changes (changed_at) VALUES (NOW() - INTERVAL '25 hours'), (NOW() - INTERVAL '1 hour')"
+            )
+            assert await connection.fetchval("SELECT fn_prune_failed_item_changes()") == 1
+            remaining = await connection.fetchval("SELECT COUNT(*) FROM failed_item_changes")
+        finally:
+            await transaction.rollback()
+    assert remaining == 1
+
+
+@pytest.mark.asyncio
+async def test_live_failed_item_cache_refreshes_changed_lines(pool: DatabasePool) -> None:
+    cache = FailedItemCache()
+    items = await cache.load(pool, "scenario1")
+    assert items == await load_failed_items(pool, "scenario1")
+    target = items[0].line_item_id
+
+    async with pool.acquire() as connection:
+        original = await connection.fetchval("SELECT description FROM po_line_items WHERE id = $1", target)
+        update = "UPDATE po_line_items SET description = $2 WHERE id = $1"
+        await connection.execute(update, target, f"{original} (revised)")
+        try:
+            revised = await cache.load(pool, "scenario1")
+            unchanged = await cache.load(pool, "scenario1")
+        finally:
+            await connection.execute(update, target, original)
+    restored = await cache.load(pool, "scenario1")
+
+    assert [item.description for item in revised if item.line_item_id == target] == [f"{original} (revised)"]
+    assert [item for item in revised if item.line_item_id != target] == items[1:]
+    assert unchanged == revised and restored == items
+    assert (cache.hits, cache.refreshes, cache.misses) == (1, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_live_failed_item_cache_tracks_reference_and_order_edits(pool: DatabasePool) -> None:
+    cache = FailedItemCache()
+    items = await cache.load(pool, "scenario1")
+    target = next(item for item in items if item.commodity_code)
+
+    async with pool.acquire() as connection:
+        code_id, po_id = await connection.fetchrow(
+            "SELECT commodity_code_id, po_id FROM po_line_items WHERE id = $1", target.line_item_id
+        )
+        rename = "UPDATE commodity_codes SET engineered_code = $2 WHERE id = $1"
+        await connection.execute(rename, code_id, f"{target.commodity_code}-R")
+        try:
+            renamed = await cache.load(pool, "scenario1")
+        finally:
+            await connection.execute(rename, code_id, target.commodity_code)
+        restored = await cache.load(pool, "scenario1")
+        await connection.execute("UPDATE purchase_orders SET status = status WHERE id = $1", po_id)
+        touched = await cache.load(pool, "scenario1")
+
+    assert [item.commodity_code for item in renamed if item.line_item_id == target.line_item_id] == [
+        f"{target.commodity_code}-R"
+    ]
+    assert restored == touched == items
+    # Both commodity code edits reload the project; the PO edit re-reads only its lines.
+    assert (cache.misses, cache.refreshes, cache.hits) == (3, 1, 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["sql", "vectorized"])
+async def test_live_compact_codec_profile_builds_identical_options(pool: DatabasePool, backend: str) -> None:
+    config = {**load_search_parameters("scenario1-enhanced"), "inventory_search_backend": backend}
+    failed_items = await load_failed_items(pool, "scenario1-enhanced")
+    expected = await load_inventory_by_iteration(
+        pool, failed_items, 1, config, engine=InventoryScoringEngine()
+    )
+
+    settings = PoolSettings(min_size=1, max_size=1, codec_profile="compact")
+    async with DatabasePool(DATABASE_URL, settings) as compact:
+        async with compact.acquire() as connection:
+            assert await connection.fetchval("SELECT 12.5::numeric(18,4)") == "12.5000"
+        assert await load_failed_items(compact, "scenario1-enhanced") == failed_items
+        actual = await load_inventory_by_iteration(
+            compact, failed_items, 1, config, engine=InventoryScoringEngine()
+        )
+
+    assert actual and actual == expected
+
+
+@pytest.mark.asyncio
+async def test_live_codec_benchmark_times_both_profiles() -> None:
+    timings = await benchmark_codec_profiles(DATABASE_URL, "scenario1-enhanced", rounds=3)
+
+    assert set(timings) == {"default", "compact"}
+    assert timings["default"].rows_per_round == timings["compact"].rows_per_round > 0
+    assert all(timing.query_ms > 0 and timing.best_ms <= timing.median_ms for timing in timings.values())
+
+
+@pytest.mark.asyncio
+async def test_live_snapshot_session_hides_changes_committed_during_the_run(pool: DatabasePool) -> None:
+    config = {**load_search_parameters("scenario1"), "inventory_fetch_mode": "concurrent"}
+    query = "SELECT quantity_available FROM warehouse_inventory WHERE id = $1"
+    update = "UPDATE warehouse_inventory SET quantity_available = quantity_available + $2 WHERE id = $1"
+    writer = await asyncpg.connect(DATABASE_URL)
+    target: UUID | None = None
+    try:
+        async with pool.snapshot_session() as session:
+            failed_items = await FailedItemCache().load(pool, "scenario1")
+            first = await load_inventory_by_iteration(pool, failed_items, 1, config)
+            target = first[0].inventory_id
+            async with pool.acquire_read() as connection:
+                before = await connection.fetchval(query, target)
+
+            await writer.execute(update, target, 1)
+            async with pool.acquire() as connection:
+                during = await connection.fetchval(query, target)
+            again = await load_inventory_by_iteration(pool, failed_items, 1, config)
+
+        async with pool.acquire_read() as connection:
+            after = await connection.fetchval(query, target)
+    finally:
+        if target is not None:
+            await writer.execute(update, target, -1)
+        await writer.close()
+
+    assert during == before and again == first
+    assert after == before + 1
+    assert session.snapshot_id and session.connections >= 1 and session.discarded == 0
+    assert pool.session is None
+
+
+@pytest.mark.asyncio
+async def test_live_read_checkouts_skip_the_reset_round_trip() -> None:
+    observer = await asyncpg.connect(DATABASE_URL)
+    last_query = "SELECT query FROM pg_stat_activity WHERE pid = $1"
+    try:
+        async with DatabasePool(DATABASE_URL, PoolSettings(min_size=1, max_size=1)) as pool:
+            await FailedItemCache().load(pool, "scenario1")
+            async with pool.acquire_read() as connection:
+                pid = connection.get_server_pid()
+                await connection.fetchval("SELECT 1 AS probe")
+            assert await observer.fetchval(last_query, pid) == "SELECT 1 AS probe"
+
+            listener = await ChangeListener(pool).start()
+            await listener.stop()
+            assert "RESET ALL" in await observer.fetchval(last_query, pid)
+    finally:
+        await observer.close()
+
+
+@pytest.mark.asyncio
+async def test_live_run_deadline_cancels_the_running_statement(pool: DatabasePool) -> None:
+    metrics = query_metrics()
+    started = time.perf_counter()
+    with use_budget(RunBudget(0.5)):
+        with pytest.raises(RunDeadlineExceeded):
+            async with metrics.checkout(pool, "slow_probe") as connection:
+                await metrics.fetchval("slow_probe", connection, "SELECT pg_sleep(30)")
+    assert time.perf_counter() - started < 5
+
+    # The server-side statement was cancelled, so the pooled connection is usable right away.
+    async with pool.acquire() as connection:
+        assert await connection.fetchval("SELECT 1") == 1
+        running = await connection.fetchval(
+            "SELECT count(*) FROM pg_stat_activity WHERE query = 'SELECT pg_sleep(30)' AND state = 'active'"
+        )
+    assert running == 0
+
+
+@pytest.mark.asyncio
+async def test_live_item_statements_are_reused_across_checkouts() -> None:
+    config = {**load_search_parameters("scenario1"), "inventory_fetch_mode": "sequential"}
+    prepared_query = "SELECT count(*) FROM pg_prepared_statements WHERE statement LIKE '%fn_emergency_inventory%'"
+    async with DatabasePool(DATABASE_URL, PoolSettings(min_size=1, max_size=1)) as single:
+        failed_items = await load_failed_items(single, "scenario1")
+        await load_inventory_by_iteration(single, failed_items, 1, config)
+        async with single.acquire() as connection:
+            prepared = await connection.fetchval(prepared_query)
+        assert prepared >= 1
+        await load_inventory_by_iteration(single, failed_items, 1, config)
+        async with single.acquire() as connection:
+            assert await connection.fetchval(prepared_query) == prepared
@@ -23,6 +23,7 @@ from ai_agent import (
 )
 from config import load_search_parameters
 from models import FailedItem, InventoryOption
+from run_budget import RunBudget, RunDeadlineExceeded, use_budget
 
 
 @pytest.fixture
@@ -274,6 +275,32 @@ async def test_evaluate_iteration_timeout(monkeypatch, sample_config, mock_llm):
     assert "timed out" in str(exc.value).lower()
 
 
+@pytest.mark.asyncio
+async def test_evaluate_iteration_stops_at_the_run_deadline(monkeypatch, sample_config, mock_llm):
+    """Test the run budget caps the AI timeout and is reported as a deadline, not I309."""
+    mock_llm_client, mock_structured = mock_llm
+    monkeypatch.setattr("ai_agent._create_llm_client", lambda config: mock_llm_client)
+
+    async def _hang(*args, **kwargs):
+        await asyncio.sleep(100)
+
+    mock_structured.ainvoke.side_effect = _hang
+
+    templates = load_prompt_templates()
+    agent = AccommodationAgent(sample_config, prompt_templates=templates)
+
+    with use_budget(RunBudget(0.2)):
+        with pytest.raises(RunDeadlineExceeded) as exc:
+            await agent.evaluate_iteration(
+                iteration_num=1,
+                inventory_batch=[_inventory_option()],
+                failed_items=[_failed_item()],
+                scenario_name="scenario1",
+            )
+
+    assert "iteration evaluation" in str(exc.value)
+
+
 @pytest.mark.asyncio
 async def test_evaluate_iteration_generic_error(monkeypatch, sample_config, mock_llm):
     """Test generic error is mapped to I307."""
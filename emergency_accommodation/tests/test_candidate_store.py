@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from typing import Any
+from uuid import UUID
+
+from candidate_store import CandidateStore
+from change_listener import ChangeEvent
+from models import FailedItem
+
+
+def _item() -> FailedItem:
+    return FailedItem.from_mapping(
+        {
+            "scn_id": "6a6c37f8-23dc-4f18-9581-1c31b3dd7b74",
+            "line_item_id": "7fbf34d4-64fa-4ec0-9fb8-47d3a9bf5b8a",
+            "description": "HVAC compressor failure",
+            "quantity": "4",
+            "unit_of_measure": "EA",
+            "priority": "critical",
+        }
+    )
+
+
+def _row(index: int) -> dict[str, Any]:
+    return {"inventory_id": UUID(int=index), "estimated_recovery_days": index}
+
+
+def test_store_serves_earlier_pages_and_counts_hits() -> None:
+    store = CandidateStore()
+    item = _item()
+
+    assert store.missing([item], "urgency_first", 1) == [item]
+    store.add(item, "urgency_first", 1, [_row(1), _row(2)])
+    assert store.missing([item], "urgency_first", 1) == []
+
+    store.add(item, "urgency_first", 2, [_row(2), _row(3)])
+    rows = store.candidates([item], "urgency_first", 2)
+
+    assert [row["inventory_id"] for row in rows] == [UUID(int=1), UUID(int=2), UUID(int=3)]
+    stats = store.stats.to_dict()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["rows_fetched"] == 4
+    assert stats["rows_reused"] == 2
+    assert stats["approximate_bytes"] > 0
+
+
+def test_store_hides_inventory_shown_in_earlier_iterations() -> None:
+    store = CandidateStore()
+    item = _item()
+    store.add(item, "urgency_first", 1, [_row(1), _row(2)])
+    store.mark_shown("urgency_first", [UUID(int=1)], 1)
+
+    assert len(store.candidates([item], "urgency_first", 1)) == 2
+    assert [row["inventory_id"] for row in store.candidates([item], "urgency_first", 2)] == [UUID(int=2)]
+    assert store.candidates([item], "proximity_first", 2) == []
+
+
+def test_store_evicts_only_entries_holding_changed_inventory() -> None:
+    store = CandidateStore()
+    item = _item()
+    store.add(item, "urgency_first", 1, [_row(1), _row(2)])
+    store.add(item, "proximity_first", 1, [_row(3)])
+
+    assert store.invalidate(ChangeEvent("emergency_incidents", "UPDATE", UUID(int=9), UUID(int=8))) == 0
+    stored_bytes = store.stats.approximate_bytes
+    assert store.invalidate(ChangeEvent("inventory_reservations", "UPDATE", UUID(int=7), inventory_id=UUID(int=2))) == 1
+    assert store.missing([item], "urgency_first", 1) == [item]
+    assert store.missing([item], "proximity_first", 1) == []
+    assert 0 < store.stats.approximate_bytes < stored_bytes
+
+    assert store.invalidate(ChangeEvent("warehouse_inventory", "INSERT", UUID(int=4), inventory_id=UUID(int=4))) == 1
+    assert store.missing([item], "proximity_first", 1) == [item]
+    assert store.stats.approximate_bytes == 0
+
+    # Evicted entries are reported until they are stored again.
+    assert store.evicted([item], "urgency_first") == [item]
+    assert store.evicted([item], "proximity_first") == [item]
+    store.add(item, "urgency_first", 2, [_row(1)])
+    assert store.evicted([item], "urgency_first") == []
+    assert store.evicted([item], "proximity_first") == [item]
+
+
+def test_store_keeps_pages_per_threshold_and_reuses_rows_that_still_match() -> None:
+    store = CandidateStore()
+    item = _item()
+    week, fortnight = (7, None, None), (14, None, None)
+
+    store.add(item, "urgency_first", 1, [_row(3), _row(5)], week)
+    assert store.missing([item], "urgency_first", 2, fortnight) == [item]
+    store.add(item, "urgency_first", 2, [_row(5), _row(12)], fortnight)
+
+    def within(row: dict[str, Any]) -> bool:
+        return row["estimated_recovery_days"] <= 14
+
+    rows = store.candidates([item], "urgency_first", 2, fortnight, within)
+    assert [row["inventory_id"] for row in rows] == [UUID(int=5), UUID(int=12), UUID(int=3)]
+    assert store.candidates([item], "urgency_first", 2, fortnight) == rows[:2]
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import date
+from decimal import Decimal
+from typing import Any, AsyncIterator, Callable
+from uuid import UUID
+
+import pytest
+
+import change_listener
+from change_listener import CHANGE_CHANNEL, ChangeEvent, ChangeListener
+from database import FailedItemCache
+
+PROJECT = UUID(int=1)
+OTHER_PROJECT = UUID(int=2)
+
+
+class ListenConnection:
+    def __init__(self) -> None:
+        self.listeners: dict[str, Callable[..., None]] = {}
+        self.termination: Callable[[Any], None] | None = None
+        self.fetches = 0
+
+    async def add_listener(self, channel: str, callback: Callable[..., None]) -> None:
+        self.listeners[channel] = callback
+
+    async def remove_listener(self, channel: str, callback: Callable[..., None]) -> None:
+        assert self.listeners.pop(channel) == callback
+
+    def add_termination_listener(self, callback: Callable[[Any], None]) -> None:
+        self.termination = callback
+
+    def remove_termination_listener(self, callback: Callable[[Any], None]) -> None:
+        self.termination = None
+
+    def is_closed(self) -> bool:
+        return False
+
+    def notify(self, payload: str) -> None:
+        self.listeners[CHANGE_CHANNEL](self, 4242, CHANGE_CHANNEL, payload)
+
+    async def fetch(self, query: str, *params: Any, timeout: float | None = None) -> list[dict[str, Any]]:
+        previous = params[1]
+        state = {"project_id": PROJECT, "snapshot": "10:10:", "as_of": date(2024, 5, 1), "line_item_ids": []}
+        if previous is not None:
+            # Nothing changed since the previous load.
+            return [{**state, "reload": False, "line_item_id": None}]
+        self.fetches += 1
+        return [
+            {
+                **state,
+                "reload": True,
+                "scn_id": UUID(int=10),
+                "line_item_id": UUID(int=11),
+                "description": "HVAC compressor failure",
+                "quantity": Decimal("4"),
+                "unit_of_measure": "EA",
+                "priority": "critical",
+                "ros_date": date(2024, 5, 1),
+                "commodity_code": None,
+                "equipment_tag": None,
+            }
+        ]
+
+
+class ListenPool:
+    def __init__(self, connection: ListenConnection) -> None:
+        self.connection = connection
+        self.in_use = 0
+        self.marked: list[ListenConnection] = []
+        self.failures = 0
+
+    def mark_session_state(self, connection: ListenConnection) -> None:
+        self.marked.append(connection)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[ListenConnection]:
+        # ``failures`` makes the next connection attempts of the listener fail.
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection refused")
+        async with self.acquire_read() as connection:
+            yield connection
+
+    @asynccontextmanager
+    async def acquire_read(self) -> AsyncIterator[ListenConnection]:
+        self.in_use += 1
+        try:
+            yield self.connection
+        finally:
+            self.in_use -= 1
+
+
+def _incident_payload(op: str, project_id: UUID) -> str:
+    return json.dumps({"table": "emergency_incidents", "op": op, "id": str(UUID(int=5)), "project_id": str(project_id)})
+
+
+def test_change_event_parses_trigger_payloads() -> None:
+    event = ChangeEvent.from_payload(
+        '{"table" : "inventory_reservations", "op" : "DELETE", "id" : "00000000-0000-0000-0000-000000000003",'
+        ' "project_id" : null, "inventory_id" : "00000000-0000-0000-0000-000000000004"}'
+    )
+    truncate = ChangeEvent.from_payload('{"table" : "warehouse_inventory", "op" : "TRUNCATE"}')
+
+    assert (event.record_id, event.project_id, event.inventory_id) == (UUID(int=3), None, UUID(int=4))
+    assert not event.is_reset and truncate.is_reset
+
+
+@pytest.mark.asyncio
+async def test_listener_routes_notifications_to_failed_item_cache() -> None:
+    connection = ListenConnection()
+    pool = ListenPool(connection)
+    cache = FailedItemCache()
+    seen: list[ChangeEvent] = []
+
+    async with ChangeListener(pool, cache.invalidate) as listener:  # type: ignore[arg-type]
+        listener.subscribe(lambda event: seen.append(event) or 0)
+        assert pool.in_use == 1
+        await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+        await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+
+        connection.notify(_incident_payload("UPDATE", OTHER_PROJECT))
+        await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+        connection.notify(_incident_payload("INSERT", PROJECT))
+        connection.notify("not json")
+        items = await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+
+    assert [item.line_item_id for item in items] == [UUID(int=11)]
+    assert connection.fetches == 2 and (cache.hits, cache.misses) == (2, 2)
+    assert [event.op for event in seen] == ["UPDATE", "INSERT"]
+    assert listener.stats.to_dict() == {
+        "events": 2,
+        "resets": 0,
+        "malformed": 1,
+        "evictions": 1,
+        "reconnects": 0,
+    }
+    assert pool.in_use == 0 and not connection.listeners and pool.marked == [connection]
+
+
+@pytest.mark.asyncio
+async def test_lost_listener_connection_resets_caches_and_listens_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(change_listener, "_RECONNECT_DELAYS", (0.0,))
+    connection = ListenConnection()
+    pool = ListenPool(connection)
+    cache = FailedItemCache()
+    listener = await ChangeListener(pool, cache.invalidate).start()  # type: ignore[arg-type]
+    await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+
+    assert connection.termination is not None
+    pool.failures = 2
+    connection.termination(connection)
+
+    assert not listener.is_listening
+    assert listener.stats.resets == 1 and listener.stats.evictions == 1
+    # Items cached while nobody listens are dropped again once the listener is back.
+    await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+    await _until(lambda: listener.is_listening)
+
+    assert pool.failures == 0 and pool.in_use == 1
+    assert listener.stats.to_dict() == {
+        "events": 2,
+        "resets": 2,
+        "malformed": 0,
+        "evictions": 2,
+        "reconnects": 1,
+    }
+    connection.notify(_incident_payload("UPDATE", PROJECT))
+    assert listener.stats.events == 3
+    await listener.stop()
+    assert pool.in_use == 0 and not connection.listeners
+
+
+@pytest.mark.asyncio
+async def test_stopping_a_reconnecting_listener_cancels_the_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(change_listener, "_RECONNECT_DELAYS", (0.0,))
+    connection = ListenConnection()
+    pool = ListenPool(connection)
+    listener = await ChangeListener(pool).start()  # type: ignore[arg-type]
+
+    pool.failures = 10**6
+    assert connection.termination is not None
+    connection.termination(connection)
+    await _until(lambda: pool.failures < 10**6 - 3)
+    await listener.stop()
+
+    assert not listener.is_listening and pool.in_use == 0
+    # A stopped listener can be started again.
+    pool.failures = 0
+    await listener.start()
+    assert listener.is_listening
+    await listener.stop()
+
+
+async def _until(condition: Callable[[], bool]) -> None:
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition not reached")
@@ -6,6 +6,7 @@ from cli_display import (
     display_final_recommendation,
     display_iteration_results,
     display_progress_bar,
+    display_query_metrics,
     display_scenario_header,
 )
 from models import FinalRecommendation, IterationDecision, OptionAssessment
@@ -92,6 +93,33 @@ def test_display_iteration_results_renders_table() -> None:
     assert "Allocate Regional Hub" in output
 
 
+def test_display_query_metrics_renders_per_query_rows() -> None:
+    record = Console(record=True)
+    summary = {
+        "iteration": 2,
+        "wall_ms": 812.4,
+        "sql_ms": 96.25,
+        "queries": {
+            "inventory_search_batch": {
+                "calls": 1,
+                "total_ms": 96.25,
+                "mean_ms": 96.25,
+                "max_ms": 96.25,
+                "rows": 40,
+                "bytes_decoded": 20480,
+                "wait_ms": 0.4,
+            }
+        },
+    }
+
+    display_query_metrics(summary, console_override=record)
+    output = record.export_text()
+
+    assert "96.2 ms of 812.4 ms" in output
+    assert "inventory_search_batch" in output
+    assert "20.0" in output
+
+
 def test_display_final_recommendation_shows_summary_and_alternatives() -> None:
     record = Console(record=True)
 
@@ -1,16 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import random
+from contextlib import aclosing, asynccontextmanager
 from datetime import date
 from decimal import Decimal
-from typing import Any
+from pathlib import Path
+from typing import Any, AsyncIterator
 from uuid import UUID
 
 import pytest
 
+from candidate_store import CandidateStore
+from change_listener import ChangeEvent
+from config.loader import ConfigurationError, load_search_parameters
 from database import (
+    _FAILED_ITEM_REFRESH_QUERY,
+    FailedItemCache,
+    InventoryFetchOptions,
+    InventoryPager,
+    _gather_candidate_groups,
+    _merge_top_options,
     load_failed_items,
     load_inventory_by_iteration,
+    stream_inventory_options,
 )
+from db_pool import DatabasePoolError
 from models import FailedItem
 
 
@@ -21,20 +36,48 @@ class FakeConnection:
         self._idx = 0
         self.closed = False
 
-    async def fetch(self, query: str, *params: Any) -> list[dict[str, Any]]:
+    async def fetch(self, query: str, *params: Any, timeout: float | None = None) -> list[dict[str, Any]]:
         self._calls.append((query, params))
         if not self._records:
             return []
         index = min(self._idx, len(self._records) - 1)
         self._idx += 1
+        if len(params) == 15:
+            return [row for row in self._records[index] if _passes_sql_filter(row, *params[9:12])]
         return self._records[index]
 
     async def close(self) -> None:
         self.closed = True
 
 
+def _passes_sql_filter(
+    row: dict[str, Any], max_days: int | None, min_priority: int | None, max_distance: float | None
+) -> bool:
+    """Mirror of the strategy predicates the inventory query applies in PostgreSQL."""
+    if max_days is not None and row["estimated_recovery_days"] > max_days:
+        return False
+    if min_priority is not None and (row["max_priority"] or 0) < min_priority:
+        return False
+    if max_distance is not None and row["distance_km"] is not None and row["distance_km"] > max_distance:
+        return False
+    return True
+
+
+class FakePool:
+    def __init__(self, connection: FakeConnection) -> None:
+        self.connection = connection
+        self.acquisitions = 0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[FakeConnection]:
+        self.acquisitions += 1
+        yield self.connection
+
+    acquire_read = acquire
+
+
 @pytest.mark.asyncio
-async def test_load_failed_items_returns_models(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_load_failed_items_returns_models() -> None:
     scn_id = UUID("6a6c37f8-23dc-4f18-9581-1c31b3dd7b74")
     line_id = UUID("7fbf34d4-64fa-4ec0-9fb8-47d3a9bf5b8a")
     records = [
@@ -51,21 +94,113 @@ async def test_load_failed_items_returns_models(monkeypatch: pytest.MonkeyPatch)
         }
     ]
 
-    async def fake_connect(url: str) -> FakeConnection:  # type: ignore[override]
-        return FakeConnection([records])
-
-    monkeypatch.setattr("asyncpg.connect", fake_connect)
+    pool = FakePool(FakeConnection([records]))
 
-    result = await load_failed_items("postgres://example", "scenario1")
+    result = await load_failed_items(pool, "scenario1")  # type: ignore[arg-type]
     assert len(result) == 1
     assert result[0].line_item_id == line_id
     assert result[0].priority == "critical"
+    assert pool.acquisitions == 1
 
 
 @pytest.mark.asyncio
 async def test_load_failed_items_unknown_scenario() -> None:
     with pytest.raises(ValueError):
-        await load_failed_items("postgres://example", "unknown")
+        await load_failed_items(FakePool(FakeConnection([])), "unknown")  # type: ignore[arg-type]
+
+
+def _failed_row(line: int, description: str = "HVAC compressor failure") -> dict[str, Any]:
+    return {
+        "scn_id": UUID(int=10),
+        "line_item_id": UUID(int=line),
+        "description": description,
+        "quantity": Decimal("4"),
+        "unit_of_measure": "EA",
+        "priority": "critical",
+        "ros_date": date(2024, 5, 1),
+        "commodity_code": None,
+        "equipment_tag": None,
+    }
+
+
+class ChangeLogConnection:
+    """Answers the failed-item refresh query from ``rows`` and the changes queued in ``changes``."""
+
+    def __init__(self, rows: dict[UUID, dict[str, Any]]) -> None:
+        self.rows = rows
+        self.changes: list[dict[str, Any]] = []
+        self.today = date(2024, 5, 1)
+        self.round_trips = 0
+        self.fetched: list[list[UUID] | None] = []
+        self.snapshots: list[str] = []
+
+    async def fetch(self, query: str, *params: Any, timeout: float | None = None) -> list[dict[str, Any]]:
+        assert query == _FAILED_ITEM_REFRESH_QUERY
+        self.round_trips += 1
+        project_name, previous, as_of = params
+        assert project_name == "Scenario 1 - Coastal Relief"
+        assert previous is None or previous == self.snapshots[-1]
+        change = self.changes.pop(0) if self.changes and previous is not None else {}
+        reload = previous is None or as_of != self.today or change.get("reload", False)
+        line_ids = change.get("line_item_ids", [])
+        self.snapshots.append(f"{100 + len(self.snapshots)}:{100 + len(self.snapshots)}:")
+        state = {
+            "project_id": UUID(int=1),
+            "snapshot": self.snapshots[-1],
+            "as_of": self.today,
+            "reload": reload,
+            "line_item_ids": line_ids,
+        }
+        if reload or line_ids:
+            self.fetched.append(None if reload else line_ids)
+        rows = [
+            {**state, **row}
+            for line_id, row in sorted(self.rows.items())
+            if reload or line_id in line_ids
+        ]
+        return rows or [{**state, "line_item_id": None}]
+
+
+@pytest.mark.asyncio
+async def test_failed_item_cache_refreshes_only_changed_lines(tmp_path: Path) -> None:
+    connection = ChangeLogConnection({UUID(int=line): _failed_row(line) for line in (1, 2)})
+    pool = FakePool(connection)  # type: ignore[arg-type]
+    cache = FailedItemCache()
+
+    first = await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+    unchanged = await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+
+    connection.rows[UUID(int=2)] = _failed_row(2, "Chiller failure")
+    connection.rows[UUID(int=3)] = _failed_row(3)
+    del connection.rows[UUID(int=1)]
+    connection.changes.append({"line_item_ids": [UUID(int=1), UUID(int=2), UUID(int=3)]})
+    refreshed = await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+
+    connection.today = date(2024, 5, 2)
+    await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+    connection.changes.append({"reload": True})
+    await cache.load(pool, "scenario1")  # type: ignore[arg-type]
+
+    assert [item.line_item_id for item in first] == [UUID(int=1), UUID(int=2)] == [
+        item.line_item_id for item in unchanged
+    ]
+    assert [(item.line_item_id, item.description) for item in refreshed] == [
+        (UUID(int=2), "Chiller failure"),
+        (UUID(int=3), "HVAC compressor failure"),
+    ]
+    assert connection.fetched == [None, [UUID(int=1), UUID(int=2), UUID(int=3)], None, None]
+    assert (cache.hits, cache.refreshes, cache.misses) == (1, 1, 3)
+    assert connection.round_trips == 5
+
+    path = tmp_path / "cache" / "failed_items.json"
+    cache.save(path)
+    reopened = FailedItemCache.open(path)
+    again = await reopened.load(pool, "scenario1")  # type: ignore[arg-type]
+    assert again == refreshed and reopened.hits == 1 and connection.round_trips == 6
+
+    path.write_text("{not json")
+    assert FailedItemCache.open(path).to_dict()["projects"] == {}
+    assert FailedItemCache.open(tmp_path / "missing.json").to_dict()["project_ids"] == {}
 
 
 def _build_failed_item() -> FailedItem:
@@ -112,11 +247,15 @@ def _option_dict(
         "urgency_score": urgency_score,
         "availability_score": availability_score,
         "availability_status": "free",
+        "source_line_item_id": UUID("7fbf34d4-64fa-4ec0-9fb8-47d3a9bf5b8a"),
+        "sort_key_1": float(-urgency_score),
+        "sort_key_2": -96,
+        "sort_key_3": -availability_score,
     }
 
 
 @pytest.mark.asyncio
-async def test_load_inventory_by_iteration_time_window_filters(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_load_inventory_by_iteration_time_window_filters() -> None:
     records = [
         _option_dict(
             inventory_id="de7cc0d2-bc0f-4e8c-9f03-91f119626b20",
@@ -136,10 +275,7 @@ async def test_load_inventory_by_iteration_time_window_filters(monkeypatch: pyte
         ),
     ]
 
-    async def fake_connect(url: str) -> FakeConnection:  # type: ignore[override]
-        return FakeConnection([records])
-
-    monkeypatch.setattr("asyncpg.connect", fake_connect)
+    pool = FakePool(FakeConnection([records]))
 
     config = {
         "time_window_type": "weekly",
@@ -148,7 +284,7 @@ async def test_load_inventory_by_iteration_time_window_filters(monkeypatch: pyte
     }
 
     options = await load_inventory_by_iteration(
-        "postgres://example",
+        pool,  # type: ignore[arg-type]
         [_build_failed_item()],
         iteration_num=1,
         config=config,
@@ -159,7 +295,7 @@ async def test_load_inventory_by_iteration_time_window_filters(monkeypatch: pyte
 
 
 @pytest.mark.asyncio
-async def test_load_inventory_by_iteration_priority_filters(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_load_inventory_by_iteration_priority_filters() -> None:
     records = [
         _option_dict(
             inventory_id="de7cc0d2-bc0f-4e8c-9f03-91f119626b20",
@@ -179,10 +315,7 @@ async def test_load_inventory_by_iteration_priority_filters(monkeypatch: pytest.
         ),
     ]
 
-    async def fake_connect(url: str) -> FakeConnection:  # type: ignore[override]
-        return FakeConnection([records])
-
-    monkeypatch.setattr("asyncpg.connect", fake_connect)
+    pool = FakePool(FakeConnection([records]))
 
     config = {
         "time_window_type": "priority_based",
@@ -191,7 +324,7 @@ async def test_load_inventory_by_iteration_priority_filters(monkeypatch: pytest.
     }
 
     options = await load_inventory_by_iteration(
-        "postgres://example",
+        pool,  # type: ignore[arg-type]
         [_build_failed_item()],
         iteration_num=1,
         config=config,
@@ -203,7 +336,7 @@ async def test_load_inventory_by_iteration_priority_filters(monkeypatch: pytest.
 
 
 @pytest.mark.asyncio
-async def test_load_inventory_by_iteration_distance_filters(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_load_inventory_by_iteration_distance_filters() -> None:
     records = [
         _option_dict(
             inventory_id="de7cc0d2-bc0f-4e8c-9f03-91f119626b20",
@@ -223,10 +356,7 @@ async def test_load_inventory_by_iteration_distance_filters(monkeypatch: pytest.
         ),
     ]
 
-    async def fake_connect(url: str) -> FakeConnection:  # type: ignore[override]
-        return FakeConnection([records])
-
-    monkeypatch.setattr("asyncpg.connect", fake_connect)
+    pool = FakePool(FakeConnection([records]))
 
     config = {
         "time_window_type": "distance_based",
@@ -235,7 +365,7 @@ async def test_load_inventory_by_iteration_distance_filters(monkeypatch: pytest.
     }
 
     options = await load_inventory_by_iteration(
-        "postgres://example",
+        pool,  # type: ignore[arg-type]
         [_build_failed_item()],
         iteration_num=1,
         config=config,
@@ -245,3 +375,638 @@ async def test_load_inventory_by_iteration_distance_filters(monkeypatch: pytest.
     assert options[0].warehouse_name == "Regional Hub"
     assert options[0].distance_km == pytest.approx(180.0)
 
+
+
+@pytest.mark.asyncio
+async def test_load_inventory_by_iteration_batches_items_into_one_query() -> None:
+    first = _build_failed_item()
+    second = FailedItem.from_mapping(
+        {**first.to_dict(), "line_item_id": "0d9d3f76-3b8e-4a43-bd0c-6a52f0e4b5a1"}
+    )
+    records = [
+        {
+            **_option_dict(
+                inventory_id="de7cc0d2-bc0f-4e8c-9f03-91f119626b20",
+                availability_score=90,
+                urgency_score=80,
+                distance_km=110.0,
+                estimated_recovery_days=3,
+                max_priority=70,
+            ),
+            "source_line_item_id": first.line_item_id,
+        }
+    ]
+    connection = FakeConnection([records])
+
+    options = await load_inventory_by_iteration(
+        FakePool(connection),  # type: ignore[arg-type]
+        [first, second],
+        iteration_num=2,
+        config={"batch_size_per_iteration": 5, "inventory_fetch_mode": "batched"},
+    )
+
+    assert len(options) == 1
+    assert len(connection._calls) == 1
+    query, params = connection._calls[0]
+    assert "$1::uuid[], $2::uuid[]" in query
+    assert params == (
+        [first.line_item_id, second.line_item_id],
+        [first.scn_id, second.scn_id],
+        30,
+        10,
+        10,
+        [None, None],
+        [None, None],
+        [None, None],
+        [None, None],
+        14,
+        None,
+        None,
+        14,
+        None,
+        None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_load_inventory_by_iteration_offset_pagination_grows_window() -> None:
+    connection = FakeConnection([])
+
+    await load_inventory_by_iteration(
+        FakePool(connection),  # type: ignore[arg-type]
+        [_build_failed_item()],
+        iteration_num=2,
+        config={"batch_size_per_iteration": 5, "inventory_pagination": "offset"},
+    )
+
+    _, params = connection._calls[0]
+    assert params[2:5] == (20, 5, 20)
+
+
+@pytest.mark.asyncio
+async def test_pager_resumes_after_last_row_of_previous_page() -> None:
+    item = _build_failed_item()
+    page = [
+        _option_dict(
+            inventory_id=f"00000000-0000-0000-0000-00000000000{index}",
+            availability_score=90,
+            urgency_score=90 - index,
+            distance_km=100.0,
+            estimated_recovery_days=2,
+            max_priority=70,
+        )
+        for index in range(4)
+    ]
+    connection = FakeConnection([page, page[:1], []])
+    pool = FakePool(connection)
+    pager = InventoryPager()
+    config = {"batch_size_per_iteration": 2, "time_window_type": "none"}
+
+    for iteration in (1, 2, 3):
+        await load_inventory_by_iteration(
+            pool,  # type: ignore[arg-type]
+            [item],
+            iteration_num=iteration,
+            config=config,
+            pager=pager,
+        )
+
+    first_params = connection._calls[0][1]
+    second_params = connection._calls[1][1]
+    assert first_params[3] == 0 and first_params[5:9] == ([None], [None], [None], [None])
+    assert second_params[3] == 0
+    assert second_params[5:9] == ([-87.0], [-96], [-90], [UUID("00000000-0000-0000-0000-000000000003")])
+    # The second page came back short, so the item is exhausted and iteration 3 skips the query.
+    assert len(connection._calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_candidate_store_reuses_earlier_pages_without_refetching() -> None:
+    item = _build_failed_item()
+    first_page = [
+        _option_dict(
+            inventory_id=f"00000000-0000-0000-0000-00000000000{index}",
+            availability_score=90,
+            urgency_score=90 - index,
+            distance_km=100.0,
+            estimated_recovery_days=2,
+            max_priority=70,
+        )
+        for index in range(4)
+    ]
+    connection = FakeConnection([first_page, []])
+    pool = FakePool(connection)
+    pager, store = InventoryPager(), CandidateStore()
+    config = {"batch_size_per_iteration": 2, "time_window_type": "none"}
+
+    shown = []
+    for iteration in (1, 2, 2):
+        options = await load_inventory_by_iteration(
+            pool,  # type: ignore[arg-type]
+            [item],
+            iteration_num=iteration,
+            config=config,
+            pager=pager,
+            store=store,
+        )
+        shown.append([str(option.inventory_id)[-1] for option in options])
+
+    assert shown == [["0", "1"], ["2", "3"], ["2", "3"]]
+    assert len(connection._calls) == 2
+    assert store.stats.hits == 1
+    assert store.stats.rows_reused == 4
+
+
+@pytest.mark.asyncio
+async def test_evicted_items_are_fetched_again_from_the_first_row() -> None:
+    item = _build_failed_item()
+    page = [
+        _option_dict(
+            inventory_id=f"00000000-0000-0000-0000-00000000000{index}",
+            availability_score=90,
+            urgency_score=90 - index,
+            distance_km=100.0,
+            estimated_recovery_days=2,
+            max_priority=70,
+        )
+        for index in range(8)
+    ]
+    connection = FakeConnection([page[:4], page, []])
+    pool = FakePool(connection)
+    pager, store = InventoryPager(), CandidateStore()
+    config = {"batch_size_per_iteration": 2, "time_window_type": "none"}
+
+    await load_inventory_by_iteration(
+        pool,  # type: ignore[arg-type]
+        [item],
+        iteration_num=1,
+        config=config,
+        pager=pager,
+        store=store,
+    )
+    store.invalidate(ChangeEvent("warehouse_inventory", "UPDATE", UUID(int=9), inventory_id=page[1]["inventory_id"]))
+    for iteration in (2, 3):
+        await load_inventory_by_iteration(
+            pool,  # type: ignore[arg-type]
+            [item],
+            iteration_num=iteration,
+            config=config,
+            pager=pager,
+            store=store,
+        )
+
+    # The old cursor pointed into evicted rows: pages 1 and 2 are read again from offset 0 ...
+    reload_params = connection._calls[1][1]
+    assert reload_params[3:5] == (0, 8) and reload_params[5:9] == ([None], [None], [None], [None])
+    # ... and the next page resumes after the last row of that read.
+    assert connection._calls[2][1][5:9] == ([-83.0], [-96], [-90], [UUID("00000000-0000-0000-0000-000000000007")])
+    assert store.evicted([item], "urgency_first") == []
+
+
+class RankedConnection:
+    """Answers the batched inventory query for one item the way PostgreSQL pages it."""
+
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self.rows = rows
+        self.calls: list[tuple[Any, ...]] = []
+
+    async def fetch(self, query: str, *params: Any, timeout: float | None = None) -> list[dict[str, Any]]:
+        self.calls.append(params)
+        offset, window = params[3], params[4]
+        after = tuple(values[0] for values in params[5:9])
+        thresholds, cursor_thresholds = params[9:12], params[12:15]
+        selected = sorted(
+            (
+                row
+                for row in self.rows
+                if _passes_sql_filter(row, *thresholds)
+                and (
+                    after[3] is None
+                    or _sort_tuple(row) > after
+                    or not _passes_sql_filter(row, *cursor_thresholds)
+                )
+            ),
+            key=_sort_tuple,
+        )
+        return selected[offset : offset + window]
+
+
+def _sort_tuple(row: dict[str, Any]) -> tuple[Any, ...]:
+    return (row["sort_key_1"], row["sort_key_2"], row["sort_key_3"], row["inventory_id"])
+
+
+def _ranked_rows(priorities: list[int]) -> list[dict[str, Any]]:
+    return [
+        _option_dict(
+            inventory_id=str(UUID(int=index + 1)),
+            availability_score=90,
+            urgency_score=95 - index,
+            distance_km=100.0,
+            estimated_recovery_days=2,
+            max_priority=priority,
+        )
+        for index, priority in enumerate(priorities)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_widening_thresholds_never_skip_higher_ranked_candidates() -> None:
+    rows = _ranked_rows([90, 70, 40] * 4)
+    connection = RankedConnection(rows)
+    pool = FakePool(connection)  # type: ignore[arg-type]
+    pager, store = InventoryPager(), CandidateStore()
+    config = {"batch_size_per_iteration": 2, "time_window_type": "priority_based"}
+
+    shown: list[UUID] = []
+    for iteration, min_priority in ((1, 80), (2, 60), (3, 0)):
+        options = await load_inventory_by_iteration(
+            pool,  # type: ignore[arg-type]
+            [_build_failed_item()],
+            iteration_num=iteration,
+            config=config,
+            pager=pager,
+            store=store,
+        )
+        # Each iteration shows the best candidates at its threshold that were not shown yet.
+        expected = [
+            row["inventory_id"]
+            for row in sorted(rows, key=_sort_tuple)
+            if (row["max_priority"] or 0) >= min_priority and row["inventory_id"] not in shown
+        ][:2]
+        assert [option.inventory_id for option in options] == expected
+        shown.extend(expected)
+
+    # Iterations 2 and 3 resume after the previous page and also read the rows its threshold
+    # filtered out, so every query is a filtered keyset page and nothing falls back.
+    assert [params[3:5] for params in connection.calls] == [(0, 4)] * 3
+    assert [params[8][0] for params in connection.calls] == [None, rows[9]["inventory_id"], rows[10]["inventory_id"]]
+    assert [params[12:15] for params in connection.calls][1:] == [(None, 80, None), (None, 60, None)]
+
+
+@pytest.mark.asyncio
+async def test_cli_iterations_page_every_item_by_keyset() -> None:
+    # The CLI's loop: one pager and one store for the run, iterations 1..max_iterations with
+    # the scenario's own strategy (weekly: 7, 14, 21 days) and keyset pagination.
+    config = load_search_parameters("scenario2")
+    batch_size = config["batch_size_per_iteration"]
+    rows = [
+        {**row, "estimated_recovery_days": (3, 10, 17, 30)[index % 4]}
+        for index, row in enumerate(_ranked_rows([70] * 200))
+    ]
+    connection = RankedConnection(rows)
+    pager, store = InventoryPager(), CandidateStore()
+
+    shown: list[UUID] = []
+    for iteration in range(1, config["max_iterations"] + 1):
+        options = await load_inventory_by_iteration(
+            FakePool(connection),  # type: ignore[arg-type]
+            [_build_failed_item()],
+            iteration_num=iteration,
+            config=config,
+            pager=pager,
+            store=store,
+        )
+        expected = [
+            row["inventory_id"]
+            for row in sorted(rows, key=_sort_tuple)
+            if row["estimated_recovery_days"] <= 7 * iteration and row["inventory_id"] not in shown
+        ][:batch_size]
+        assert [option.inventory_id for option in options] == expected
+        shown.extend(expected)
+
+    # Every iteration after the first resumes from the previous page's last row: a fixed page
+    # at offset 0 behind a cursor, never an OFFSET that grows with the iteration.
+    assert len(connection.calls) == config["max_iterations"]
+    assert [params[3:5] for params in connection.calls] == [(0, 2 * batch_size)] * len(connection.calls)
+    assert [params[8][0] is not None for params in connection.calls] == [False, True, True]
+
+
+@pytest.mark.asyncio
+async def test_fallback_needs_a_threshold_nothing_ever_matched() -> None:
+    rows = _ranked_rows([90, 10])
+    connection = RankedConnection(rows)
+    pager, store = InventoryPager(), CandidateStore()
+    config = {"batch_size_per_iteration": 1, "time_window_type": "priority_based"}
+
+    shown = []
+    for iteration in (1, 2, 3):
+        options = await load_inventory_by_iteration(
+            FakePool(connection),  # type: ignore[arg-type]
+            [_build_failed_item()],
+            iteration_num=iteration,
+            config=config,
+            pager=pager,
+            store=store,
+        )
+        shown.append([option.inventory_id.int for option in options])
+
+    # Iteration 2's threshold only matches the row iteration 1 already showed; that is not
+    # "nothing matched", so it does not fall back to the unfiltered row.
+    assert shown == [[1], [], [2]]
+    assert [params[10] for params in connection.calls] == [80, 60, None]
+
+
+@pytest.mark.asyncio
+async def test_load_inventory_by_iteration_sequential_mode_queries_each_item() -> None:
+    first = _build_failed_item()
+    second = FailedItem.from_mapping(
+        {**first.to_dict(), "line_item_id": "0d9d3f76-3b8e-4a43-bd0c-6a52f0e4b5a1"}
+    )
+    connection = FakeConnection([])
+
+    await load_inventory_by_iteration(
+        FakePool(connection),  # type: ignore[arg-type]
+        [first, second],
+        iteration_num=1,
+        config={"inventory_fetch_mode": "sequential"},
+    )
+
+    # Nothing matched the pushed-down threshold, so both items are queried again unfiltered.
+    assert [params[0] for _, params in connection._calls] == [first.line_item_id, second.line_item_id] * 2
+    assert [params[9:12] for _, params in connection._calls][1:3] == [(7, None, None), (None, None, None)]
+    # The filtered and unfiltered queries share one statement text, so the connection's
+    # statement cache prepares it once.
+    assert len({query for query, _ in connection._calls}) == 1
+
+
+@pytest.mark.asyncio
+async def test_filters_push_down_and_fall_back_only_when_nothing_matches() -> None:
+    slow = _option_dict(
+        inventory_id="de7cc0d2-bc0f-4e8c-9f03-91f119626b20",
+        availability_score=90,
+        urgency_score=80,
+        distance_km=110.0,
+        estimated_recovery_days=30,
+        max_priority=70,
+    )
+    connection = FakeConnection([[slow]])
+    pool = FakePool(connection)
+    config = {"time_window_type": "weekly", "batch_size_per_iteration": 5}
+
+    options = await load_inventory_by_iteration(
+        pool,  # type: ignore[arg-type]
+        [_build_failed_item()],
+        iteration_num=1,
+        config=config,
+    )
+
+    assert [option.estimated_recovery_days for option in options] == [30]
+    assert [params[9:12] for _, params in connection._calls] == [(7, None, None), (None, None, None)]
+
+
+@pytest.mark.asyncio
+async def test_paged_runs_push_filters_down_and_cache_pages_per_threshold() -> None:
+    near = _option_dict(
+        inventory_id="de7cc0d2-bc0f-4e8c-9f03-91f119626b20",
+        availability_score=90,
+        urgency_score=80,
+        distance_km=110.0,
+        estimated_recovery_days=5,
+        max_priority=70,
+    )
+    later = {**near, "inventory_id": UUID("5e7cc0d2-bc0f-4e8c-9f03-91f119626b21"), "estimated_recovery_days": 12}
+    connection = FakeConnection([[near, later]])
+    pool = FakePool(connection)
+    pager, store = InventoryPager(), CandidateStore()
+    config = {"time_window_type": "weekly", "batch_size_per_iteration": 5}
+
+    first = await load_inventory_by_iteration(
+        pool, [_build_failed_item()], iteration_num=1, config=config, pager=pager, store=store  # type: ignore[arg-type]
+    )
+    second = await load_inventory_by_iteration(
+        pool, [_build_failed_item()], iteration_num=2, config=config, pager=pager, store=store  # type: ignore[arg-type]
+    )
+
+    assert [option.estimated_recovery_days for option in first] == [5]
+    assert [option.estimated_recovery_days for option in second] == [12]
+    # Both iterations send their own threshold; the widened one starts a new set of pages.
+    assert [params[9:12] for _, params in connection._calls] == [(7, None, None), (14, None, None)]
+
+    assert store.missing([_build_failed_item()], "urgency_first", 1, (7, None, None)) == []
+    assert store.missing([_build_failed_item()], "urgency_first", 1, (14, None, None))
+
+
+@pytest.mark.asyncio
+async def test_load_inventory_by_iteration_rejects_unknown_fetch_mode() -> None:
+    with pytest.raises(ConfigurationError, match="fetch mode") as exc:
+        await load_inventory_by_iteration(
+            FakePool(FakeConnection([])),  # type: ignore[arg-type]
+            [_build_failed_item()],
+            iteration_num=1,
+            config={"inventory_fetch_mode": "parallel"},
+        )
+    assert exc.value.code == "C120"
+
+
+class KeyedConnection:
+    """Returns one row per queried line item, finishing later items first."""
+
+    def __init__(self, tracker: dict[str, int], rows_by_item: dict[UUID, list[dict[str, Any]]]) -> None:
+        self._tracker = tracker
+        self._rows_by_item = rows_by_item
+        self._order = list(rows_by_item)
+
+    async def fetch(self, query: str, *params: Any, timeout: float | None = None) -> list[dict[str, Any]]:
+        self._tracker["in_flight"] += 1
+        self._tracker["peak"] = max(self._tracker["peak"], self._tracker["in_flight"])
+        try:
+            position = self._order.index(params[0])
+            await asyncio.sleep(0.001 * (len(self._order) - position))
+            rows = self._rows_by_item[params[0]]
+            if isinstance(rows, Exception):
+                raise rows
+            return rows
+        finally:
+            self._tracker["in_flight"] -= 1
+
+
+class KeyedPool:
+    def __init__(self, rows_by_item: dict[UUID, list[dict[str, Any]]]) -> None:
+        self.tracker = {"in_flight": 0, "peak": 0}
+        self._rows_by_item = rows_by_item
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[KeyedConnection]:
+        yield KeyedConnection(self.tracker, self._rows_by_item)
+
+    acquire_read = acquire
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetch_limits_in_flight_queries_and_keeps_item_order() -> None:
+    base = _build_failed_item()
+    items = [
+        FailedItem.from_mapping({**base.to_dict(), "line_item_id": str(UUID(int=index + 1))})
+        for index in range(6)
+    ]
+    rows_by_item = {
+        item.line_item_id: [
+            _option_dict(
+                inventory_id=str(UUID(int=100 + index)),
+                availability_score=90,
+                urgency_score=80,
+                distance_km=100.0,
+                estimated_recovery_days=3,
+                max_priority=70,
+            )
+        ]
+        for index, item in enumerate(items)
+    }
+    pool = KeyedPool(rows_by_item)
+
+    groups = await _gather_candidate_groups(
+        pool,  # type: ignore[arg-type]
+        items,
+        1,
+        10,
+        "urgency_first",
+        InventoryFetchOptions(mode="concurrent", concurrency=2),
+    )
+
+    assert [row["inventory_id"] for rows in groups for row in rows] == [UUID(int=100 + index) for index in range(6)]
+    assert pool.tracker["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetch_raises_the_failing_worker_error_itself() -> None:
+    base = _build_failed_item()
+    items = [
+        FailedItem.from_mapping({**base.to_dict(), "line_item_id": str(UUID(int=index + 1))})
+        for index in range(4)
+    ]
+    rows_by_item: dict[UUID, Any] = {item.line_item_id: [] for item in items}
+    rows_by_item[items[2].line_item_id] = DatabasePoolError("Timed out waiting for a pooled connection", code="D404")
+
+    with pytest.raises(DatabasePoolError) as exc:
+        await _gather_candidate_groups(
+            KeyedPool(rows_by_item),  # type: ignore[arg-type]
+            items,
+            1,
+            10,
+            "urgency_first",
+            InventoryFetchOptions(mode="concurrent", concurrency=2),
+        )
+
+    assert exc.value.code == "D404"
+
+
+@pytest.mark.parametrize("search_order", ["availability_first", "proximity_first", "urgency_first"])
+def test_merge_top_options_matches_sorting_every_candidate(search_order: str) -> None:
+    rng = random.Random(7)
+    groups = [
+        [
+            _option_dict(
+                inventory_id=str(UUID(int=rng.randrange(40))),
+                availability_score=rng.choice([40, 70, 90]),
+                urgency_score=rng.choice([50, 80]),
+                distance_km=rng.choice([None, 100.0, 300.0]),
+                estimated_recovery_days=3,
+                max_priority=70,
+            )
+            for _ in range(rng.randrange(12))
+        ]
+        for _ in range(6)
+    ]
+    keys = {
+        "availability_first": lambda opt: (
+            -opt["availability_score"],
+            -opt["compatibility_score"],
+            opt["distance_km"] if opt["distance_km"] is not None else float("inf"),
+        ),
+        "proximity_first": lambda opt: (
+            opt["distance_km"] if opt["distance_km"] is not None else float("inf"),
+            -opt["compatibility_score"],
+            -opt["availability_score"],
+        ),
+        "urgency_first": lambda opt: (-opt["urgency_score"], -opt["compatibility_score"], -opt["availability_score"]),
+    }
+
+    for batch_size in (1, 5, 50):
+        expected: list[dict[str, Any]] = []
+        for option in sorted((row for rows in groups for row in rows), key=keys[search_order]):
+            if option["inventory_id"] not in {seen["inventory_id"] for seen in expected}:
+                expected.append(option)
+        merged = _merge_top_options(groups, search_order, batch_size)
+        assert [id(option) for option in merged] == [id(option) for option in expected[:batch_size]]
+
+    assert _merge_top_options([[], []], search_order, 5) == []
+
+
+def test_fetch_options_from_config() -> None:
+    options = InventoryFetchOptions.from_config(
+        {"inventory_fetch_mode": "concurrent", "inventory_fetch_concurrency": 8}
+    )
+    assert options == InventoryFetchOptions(mode="concurrent", concurrency=8)
+    assert InventoryFetchOptions.from_config({"inventory_search_backend": "vectorized"}).backend == "vectorized"
+    with pytest.raises(ConfigurationError, match="concurrency"):
+        InventoryFetchOptions(mode="concurrent", concurrency=0)
+    with pytest.raises(ConfigurationError, match="pagination"):
+        InventoryFetchOptions.from_config({"inventory_pagination": "cursor"})
+    with pytest.raises(ConfigurationError, match="search backend") as exc:
+        InventoryFetchOptions(backend="gpu")
+    assert exc.value.code == "C120"
+
+
+class CursorConnection:
+    """Serves rows through a fake server-side cursor, counting what was actually fetched."""
+
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self.rows = rows
+        self.fetched = 0
+        self.prefetch: int | None = None
+        self.params: tuple[Any, ...] = ()
+        self.in_transaction = False
+
+    @asynccontextmanager
+    async def transaction(self, **options: Any) -> AsyncIterator[None]:
+        assert options == {"readonly": True}
+        self.in_transaction = True
+        try:
+            yield
+        finally:
+            self.in_transaction = False
+
+    async def cursor(
+        self, query: str, *params: Any, prefetch: int, timeout: float | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        assert self.in_transaction and "fn_emergency_inventory_search_batch" in query
+        self.params, self.prefetch = params, prefetch
+        for row in self.rows:
+            self.fetched += 1
+            yield row
+
+
+@pytest.mark.asyncio
+async def test_stream_inventory_options_yields_batches_and_stops_early() -> None:
+    rows = [
+        _option_dict(
+            inventory_id=str(UUID(int=index)),
+            availability_score=90,
+            urgency_score=80,
+            distance_km=None,
+            estimated_recovery_days=3,
+            max_priority=70,
+        )
+        for index in (1, 2, 2, 3, 4, 5, 6)
+    ]
+    connection = CursorConnection(rows)
+    pool = FakePool(connection)  # type: ignore[arg-type]
+    item = _build_failed_item()
+
+    batches = [
+        batch
+        async for batch in stream_inventory_options(
+            pool, [item], batch_size=2, limit_per_item=50, min_priority=60  # type: ignore[arg-type]
+        )
+    ]
+    assert [[option.inventory_id.int for option in batch] for batch in batches] == [[1, 2], [3, 4], [5, 6]]
+    assert connection.params[2:5] == (50, 0, 50) and connection.params[9:12] == (None, 60, None)
+    assert connection.prefetch == 2
+
+    connection.fetched = 0
+    async with aclosing(stream_inventory_options(pool, [item], batch_size=2)) as stream:  # type: ignore[arg-type]
+        async for batch in stream:
+            break
+    assert [option.inventory_id.int for option in batch] == [1, 2]
+    assert connection.fetched == 2
+    assert not connection.in_transaction
@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from config.loader import ConfigurationError
+from db_pool import _REPLICA_LAG_QUERY, DatabasePool, DatabasePoolError, PoolSettings, ReplicaSettings
+
+
+class FakeConnection:
+    def __init__(self, pool: FakeAsyncpgPool | None = None) -> None:
+        self.pool = pool
+        self.probes = 0
+        self.codecs: dict[str, dict[str, Any]] = {}
+        self.statements: list[str] = []
+
+    def get_server_pid(self) -> int:
+        return id(self)
+
+    def get_reset_query(self) -> str:
+        return "RESET ALL;"
+
+    def transaction(self, **options: Any) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    async def execute(self, query: str) -> None:
+        self.statements.append(query)
+
+    async def set_type_codec(self, typename: str, **options: Any) -> None:
+        self.codecs[typename] = options
+
+    async def fetchval(self, query: str, *params: Any) -> Any:
+        if query == _REPLICA_LAG_QUERY:
+            assert self.pool is not None
+            return self.pool.lag
+        if query == "SELECT pg_export_snapshot()":
+            self.statements.append(query)
+            return "00000003-0000001B-1"
+        self.probes += 1
+        return 1
+
+
+class FakeTransaction:
+    def __init__(self, connection: FakeConnection) -> None:
+        self._connection = connection
+
+    async def __aenter__(self) -> None:
+        self._connection.statements.append("BEGIN")
+
+    async def __aexit__(self, exc_type: Any, *exc: Any) -> None:
+        self._connection.statements.append("ROLLBACK" if exc_type else "COMMIT")
+
+
+class FakeAcquireContext:
+    def __init__(self, pool: FakeAsyncpgPool) -> None:
+        self._pool = pool
+        self._connection: FakeConnection | None = None
+
+    async def __aenter__(self) -> FakeConnection:
+        if self._pool.unreachable:
+            raise ConnectionRefusedError("connection refused")
+        self._connection = self._pool.idle.pop() if self._pool.idle else FakeConnection(self._pool)
+        return self._connection
+
+    async def __aexit__(self, *exc: Any) -> None:
+        assert self._connection is not None
+        self._pool.idle.append(self._connection)
+
+
+class FakeAsyncpgPool:
+    def __init__(self, min_size: int) -> None:
+        self.idle = [FakeConnection(self) for _ in range(min_size)]
+        self.closed = False
+        self.lag: float | None = 0.0
+        self.unreachable = False
+
+    def acquire(self, *, timeout: float | None = None) -> FakeAcquireContext:
+        return FakeAcquireContext(self)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def fake_create_pool(monkeypatch: pytest.MonkeyPatch) -> dict[str, Any]:
+    captured: dict[str, Any] = {}
+
+    async def create_pool(dsn: str, **kwargs: Any) -> FakeAsyncpgPool:
+        captured["dsn"] = dsn
+        captured.update(kwargs)
+        pool = FakeAsyncpgPool(kwargs["min_size"])
+        for connection in pool.idle:
+            await kwargs["init"](connection)
+        captured["pool"] = pool
+        captured.setdefault("pools", {})[dsn] = pool
+        return pool
+
+    monkeypatch.setattr("asyncpg.create_pool", create_pool)
+    return captured
+
+
+def test_pool_settings_from_config() -> None:
+    settings = PoolSettings.from_config(
+        {"db_pool_min_size": 2, "db_pool_max_size": 6, "db_pool_warmup": False}
+    )
+    assert settings == PoolSettings(min_size=2, max_size=6, warmup=False, acquire_timeout=None)
+    assert PoolSettings.from_config({}) == PoolSettings()
+    assert PoolSettings.from_config({"db_codec_profile": "compact"}).codec_profile == "compact"
+
+
+def test_pool_settings_reject_inverted_bounds() -> None:
+    with pytest.raises(ConfigurationError, match="C116"):
+        PoolSettings(min_size=5, max_size=2)
+    with pytest.raises(ConfigurationError, match="C116"):
+        PoolSettings(codec_profile="binary")
+
+
+def test_replica_settings_from_config() -> None:
+    settings = ReplicaSettings.from_config(
+        {"db_read_routing": "least_busy", "db_replica_max_lag_seconds": 5}, [" postgresql://r1 ", ""]
+    )
+    assert settings == ReplicaSettings(dsns=("postgresql://r1",), routing="least_busy", max_lag_seconds=5.0)
+    assert ReplicaSettings.from_config({}) == ReplicaSettings()
+    with pytest.raises(ConfigurationError, match="C117"):
+        ReplicaSettings(routing="random")
+
+
+@pytest.mark.asyncio
+async def test_pool_runs_init_hooks_and_warms_connections(fake_create_pool: dict[str, Any]) -> None:
+    initialised: list[FakeConnection] = []
+
+    async def hook(connection: FakeConnection) -> None:
+        initialised.append(connection)
+
+    async with DatabasePool("postgresql://example", PoolSettings(min_size=2, max_size=3), init_hooks=[hook]):
+        pool = fake_create_pool["pool"]
+        assert fake_create_pool["max_size"] == 3
+        assert len(initialised) == 2
+        assert all(connection.probes == 1 for connection in pool.idle)
+
+    assert pool.closed
+
+
+@pytest.mark.asyncio
+async def test_compact_profile_decodes_numeric_as_text(fake_create_pool: dict[str, Any]) -> None:
+    settings = PoolSettings(min_size=1, max_size=1, codec_profile="compact")
+    async with DatabasePool("postgresql://example", settings):
+        [connection] = fake_create_pool["pool"].idle
+        assert set(connection.codecs) == {"numeric"}
+        assert connection.codecs["numeric"]["format"] == "text"
+        assert connection.codecs["numeric"]["decoder"]("12.5000") == "12.5000"
+
+    async with DatabasePool("postgresql://example", PoolSettings(min_size=1, max_size=1)):
+        assert fake_create_pool["pool"].idle[0].codecs == {}
+
+
+@pytest.mark.asyncio
+async def test_only_connections_with_session_state_are_reset(fake_create_pool: dict[str, Any]) -> None:
+    async with DatabasePool("postgresql://example", PoolSettings(min_size=2, max_size=2)) as pool:
+        reset = fake_create_pool["reset"]
+        plain, listening = fake_create_pool["pool"].idle
+        pool.mark_session_state(listening)
+        for connection in (plain, listening, listening):
+            await reset(connection)
+
+    assert plain.statements == []
+    assert listening.statements == ["RESET ALL;"]
+
+
+@pytest.mark.asyncio
+async def test_pool_records_wait_and_utilization(fake_create_pool: dict[str, Any]) -> None:
+    async with DatabasePool("postgresql://example", PoolSettings(min_size=1, max_size=2)) as pool:
+        async with pool.acquire():
+            async with pool.acquire():
+                assert pool.metrics.in_use == 2
+        metrics = pool.metrics.to_dict()
+
+    assert metrics["acquisitions"] == 2
+    assert metrics["peak_in_use"] == 2
+    assert metrics["in_use"] == 0
+    assert 0.0 <= metrics["utilization"] <= 1.0
+
+
+@pytest.mark.asyncio
+async def test_pool_acquire_requires_open_pool() -> None:
+    pool = DatabasePool("postgresql://example")
+    with pytest.raises(DatabasePoolError, match="D403"):
+        async with pool.acquire():
+            pass
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_hooks_after_open(fake_create_pool: dict[str, Any]) -> None:
+    async def hook(connection: FakeConnection) -> None:
+        return None
+
+    async with DatabasePool("postgresql://example") as pool:
+        with pytest.raises(DatabasePoolError, match="D401"):
+            pool.add_init_hook(hook)
+
+
+def _replica_pool(routing: str = "round_robin") -> DatabasePool:
+    replicas = ReplicaSettings(
+        dsns=("postgresql://replica1", "postgresql://replica2"),
+        routing=routing,
+        max_lag_seconds=10.0,
+        lag_check_interval=0.0,
+    )
+    return DatabasePool("postgresql://primary", PoolSettings(min_size=1, max_size=2), replicas=replicas)
+
+
+async def _read_from(pool: DatabasePool, pools: dict[str, FakeAsyncpgPool]) -> str:
+    async with pool.acquire_read() as connection:
+        return next(dsn for dsn, fake in pools.items() if fake is connection.pool)
+
+
+@pytest.mark.asyncio
+async def test_reads_rotate_over_current_replicas_and_fall_back_to_primary(fake_create_pool: dict[str, Any]) -> None:
+    async with _replica_pool() as pool:
+        pools = fake_create_pool["pools"]
+        rotation = [await _read_from(pool, pools) for _ in range(4)]
+
+        pools["postgresql://replica2"].lag = 60.0
+        lagging = {await _read_from(pool, pools) for _ in range(3)}
+
+        pools["postgresql://replica1"].unreachable = True
+        fallback = await _read_from(pool, pools)
+
+        pools["postgresql://replica2"].lag = None
+        pools["postgresql://replica1"].unreachable = False
+        recovered = await _read_from(pool, pools)
+
+    assert sorted(rotation) == ["postgresql://replica1"] * 2 + ["postgresql://replica2"] * 2
+    assert rotation[0] != rotation[1]
+    assert lagging == {"postgresql://replica1"}
+    assert fallback == "postgresql://primary"
+    assert recovered == "postgresql://replica1"
+    stats = pool.read_stats.to_dict()
+    assert (stats["replica_reads"], stats["primary_reads"]) == (8, 1)
+    assert stats["failures"] == 1 and stats["lagging"] >= 1
+    assert all(fake.closed for fake in pools.values())
+
+
+@pytest.mark.asyncio
+async def test_least_busy_routing_prefers_the_idle_replica(fake_create_pool: dict[str, Any]) -> None:
+    async with _replica_pool("least_busy") as pool:
+        pools = fake_create_pool["pools"]
+        async with pool.acquire_read() as busy:
+            others = {await _read_from(pool, pools) for _ in range(3)}
+
+    assert others == {"postgresql://replica1", "postgresql://replica2"} - {
+        dsn for dsn, fake in pools.items() if fake is busy.pool
+    }
+
+
+@pytest.mark.asyncio
+async def test_reads_use_the_primary_without_replicas(fake_create_pool: dict[str, Any]) -> None:
+    async with DatabasePool("postgresql://primary") as pool:
+        async with pool.acquire_read():
+            assert pool.metrics.in_use == 1
+
+    assert pool.read_stats.primary_reads == 1 and pool.replica_metrics() == {}
+
+
+@pytest.mark.asyncio
+async def test_snapshot_session_shares_one_snapshot_across_checkouts(fake_create_pool: dict[str, Any]) -> None:
+    async with DatabasePool("postgresql://primary", PoolSettings(min_size=2, max_size=2)) as pool:
+        async with pool.snapshot_session() as session:
+            async with pool.acquire_read() as first:
+                async with pool.acquire() as second:
+                    assert second is not first
+            for _ in range(3):
+                async with pool.acquire_read() as again:
+                    assert again in (first, second)
+            with pytest.raises(DatabasePoolError, match="D406"):
+                async with pool.snapshot_session():
+                    pass
+            assert pool.metrics.in_use == 2
+        assert pool.session is None and pool.metrics.in_use == 0
+
+    assert session.to_dict() == {
+        "server": "primary",
+        "snapshot_id": "00000003-0000001B-1",
+        "connections": 2,
+        "checkouts": 6,
+        "discarded": 0,
+    }
+    assert first.statements == ["BEGIN", "SELECT pg_export_snapshot()", "COMMIT"]
+    assert second.statements == ["BEGIN", "SET TRANSACTION SNAPSHOT '00000003-0000001B-1'", "COMMIT"]
+    assert pool.read_stats.primary_reads == 4
+
+
+@pytest.mark.asyncio
+async def test_snapshot_session_waits_for_members_and_drops_failed_ones(fake_create_pool: dict[str, Any]) -> None:
+    async with DatabasePool("postgresql://primary", PoolSettings(min_size=1, max_size=1)) as pool:
+        async with pool.snapshot_session() as session:
+
+            async def hold() -> FakeConnection:
+                async with pool.acquire_read() as connection:
+                    await asyncio.sleep(0)
+                    return connection
+
+            held = await asyncio.gather(hold(), hold(), hold())
+            with pytest.raises(ValueError):
+                async with pool.acquire_read():
+                    raise ValueError("bad row")
+
+    assert len(set(map(id, held))) == 1
+    assert held[0].statements[-1] == "ROLLBACK"
+    assert (session.connections, session.checkouts, session.discarded) == (1, 5, 1)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_session_prefers_a_current_replica(fake_create_pool: dict[str, Any]) -> None:
+    async with _replica_pool() as pool:
+        pools = fake_create_pool["pools"]
+        pools["postgresql://replica1"].unreachable = True
+        async with pool.snapshot_session() as session:
+            source = await _read_from(pool, pools)
+
+    assert session.server == "replica2" and source == "postgresql://replica2"
+    assert pool.read_stats.failures == 1
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import struct
+from contextlib import asynccontextmanager
+from datetime import date
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+from uuid import UUID
+
+import numpy as np
+import pytest
+
+from inventory_snapshot import (
+    _TABLES,
+    InventorySnapshotError,
+    _BinaryCopyReader,
+    _parse_binary_copy,
+    export_inventory_snapshot,
+    load_inventory_snapshot,
+    snapshot_is_current,
+)
+from models import FailedItem
+from scoring_engine import InventoryScoringEngine
+
+PROJECT = UUID(int=1)
+COMMODITY = UUID(int=2)
+WBS = UUID(int=4)
+WAREHOUSE = UUID(int=6)
+DELIVERY = UUID(int=7)
+SCN = UUID(int=8)
+LINE = UUID(int=9)
+TODAY = date(2024, 5, 1)
+
+
+def _encode(kind: str, value: Any) -> bytes:
+    if value is None:
+        return struct.pack(">i", -1)
+    if kind == "uuid":
+        payload = value.bytes
+    elif kind == "int8":
+        payload = struct.pack(">q", value)
+    elif kind == "int4":
+        payload = struct.pack(">i", value)
+    elif kind == "bool":
+        payload = b"\x01" if value else b"\x00"
+    elif kind == "date":
+        payload = struct.pack(">i", value.toordinal() - date(2000, 1, 1).toordinal())
+    elif kind == "float8":
+        payload = struct.pack(">d", value)
+    else:
+        payload = value.encode("utf-8")
+    return struct.pack(">i", len(payload)) + payload
+
+
+def _binary_copy(columns: tuple[tuple[str, str], ...], rows: list[tuple[Any, ...]]) -> bytes:
+    payload = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">iI", 0, 0)
+    for row in rows:
+        payload += struct.pack(">h", len(columns))
+        payload += b"".join(_encode(kind, value) for (_, kind), value in zip(columns, row))
+    return payload + struct.pack(">h", -1)
+
+
+def _inventory_row(index: int, **overrides: Any) -> tuple[Any, ...]:
+    row = {
+        "id": UUID(int=100 + index),
+        "warehouse_id": WAREHOUSE,
+        "warehouse_name": "Main",
+        "material_description": "Compressor",
+        "commodity_code_id": COMMODITY,
+        "equipment_id": None,
+        "wbs_id": WBS,
+        "quantity_available": 100_000,
+        "quantity_reserved": 20_000,
+        "quantity_hard_reserved": 10_000,
+        "safety_stock_level": 10_000,
+        "is_available": True,
+        "next_required_by": None,
+        "max_priority": None,
+        "any_reassignable": False,
+    }
+    row.update(overrides)
+    return tuple(row.values())
+
+
+TABLE_ROWS: dict[str, list[tuple[Any, ...]]] = {
+    "inventory": [
+        _inventory_row(1),
+        _inventory_row(2, next_required_by=date(2024, 5, 20), max_priority=70, material_description="Spare fan"),
+    ],
+    "reservations": [(UUID(int=300), UUID(int=102), "soft", 10_000, date(2024, 5, 20), 70, True)],
+    "warehouses": [(WAREHOUSE, "Main", "WH-1", 29.76, None, True)],
+    "ros_dates": [(WBS, date(2024, 5, 4))],
+    "line_items": [(LINE, COMMODITY, None, WBS, date(2024, 5, 10))],
+    "scns": [(SCN, DELIVERY)],
+    "distances": [(DELIVERY, WAREHOUSE, 42.5)],
+}
+
+
+class ExportConnection:
+    def __init__(self, versions: list[str], today: date = TODAY) -> None:
+        self.versions = versions
+        self.today = today
+
+    @asynccontextmanager
+    async def transaction(self, **options: Any) -> AsyncIterator[None]:
+        assert options == {"isolation": "repeatable_read", "readonly": True}
+        yield
+
+    async def fetchval(self, query: str, *params: Any, timeout: float | None = None) -> Any:
+        if "FROM projects" in query:
+            return PROJECT
+        if query.startswith("SELECT md5"):
+            return self.versions.pop(0)
+        return self.today
+
+    async def copy_from_query(
+        self, query: str, *params: Any, output: Callable[[bytes], Any], format: str, timeout: float | None = None
+    ) -> None:
+        assert params == (PROJECT,) and format == "binary"
+        table = next(table for table in _TABLES if table.query == query)
+        payload = _binary_copy(table.columns, TABLE_ROWS[table.name])
+        # Deliver the stream in uneven chunks, as the server does.
+        for start in range(0, len(payload), 7):
+            await output(payload[start : start + 7])
+
+
+class ExportPool:
+    def __init__(self, connection: ExportConnection) -> None:
+        self.connection = connection
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[ExportConnection]:
+        yield self.connection
+
+
+class OfflinePool:
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        raise AssertionError("a snapshot-backed engine should not query the database")
+        yield
+
+    acquire_read = acquire
+
+
+def test_parse_binary_copy_decodes_types_and_nulls() -> None:
+    columns = (("id", "uuid"), ("name", "text"), ("qty", "int8"), ("due", "date"), ("km", "float8"), ("ok", "bool"))
+    payload = _binary_copy(
+        columns,
+        [
+            (UUID(int=1), "Main", 25_000, date(2024, 5, 1), 1.5, True),
+            (None, None, None, None, None, None),
+            (UUID(int=3), "Main", -1, date(1999, 12, 31), 0.0, False),
+        ],
+    )
+
+    decoded = _parse_binary_copy(payload, columns)
+
+    ids, id_valid, _ = decoded["id"]
+    assert [bytes(value) for value in ids] == [UUID(int=1).bytes, bytes(16), UUID(int=3).bytes]
+    assert id_valid.tolist() == [True, False, True]
+    codes, _, dictionary = decoded["name"]
+    assert codes.tolist() == [0, -1, 0] and dictionary is not None and dictionary.tolist() == ["Main"]
+    assert decoded["qty"][0].tolist() == [25_000, 0, -1]
+    assert decoded["due"][0].tolist() == [date(2024, 5, 1).toordinal(), 0, date(1999, 12, 31).toordinal()]
+    assert np.isnan(decoded["km"][0][1]) and decoded["km"][0][0] == 1.5
+    assert decoded["ok"][0].tolist() == [True, False, False]
+
+    with pytest.raises(InventorySnapshotError, match="S506"):
+        _parse_binary_copy(b"id,name\n", columns)
+    with pytest.raises(InventorySnapshotError, match="trailer"):
+        _parse_binary_copy(payload[:-2], columns)
+
+
+def test_binary_copy_reader_decodes_rows_split_across_chunks() -> None:
+    columns = (("id", "uuid"), ("name", "text"), ("qty", "int8"))
+    rows = [(UUID(int=index), f"Item {index}" if index % 3 else None, index * 1_000) for index in range(50)]
+    payload = _binary_copy(columns, rows)
+    expected = _parse_binary_copy(payload, columns)
+
+    for size in (1, 5, 64):
+        reader = _BinaryCopyReader(columns)
+        for start in range(0, len(payload), size):
+            reader.feed(payload[start : start + size])
+            # Whole rows are decoded as they arrive; at most one partial row stays buffered.
+            assert len(reader._buffer) < 2 + 3 * 4 + 16 + 8 + 8
+        decoded = reader.finish()
+        for name, _kind in columns:
+            for actual, wanted in zip(decoded[name], expected[name]):
+                assert (actual is None and wanted is None) or np.array_equal(actual, wanted)
+
+
+@pytest.mark.asyncio
+async def test_exported_snapshot_reloads_and_seeds_the_engine(tmp_path: Path) -> None:
+    pool = ExportPool(ExportConnection(["v1"]))
+
+    exported = await export_inventory_snapshot(pool, "scenario1", tmp_path)  # type: ignore[arg-type]
+    snapshot = load_inventory_snapshot(tmp_path)
+
+    assert (snapshot.project_id, snapshot.as_of_date, snapshot.data_version) == (PROJECT, TODAY, "v1")
+    assert snapshot.row_counts == exported.row_counts == {name: len(rows) for name, rows in TABLE_ROWS.items()}
+    warehouses = snapshot.columns("warehouses")
+    assert warehouses["name"].tolist() == ["Main"]
+    assert warehouses["longitude_valid"].tolist() == [False]
+    assert isinstance(snapshot.columns("inventory")["quantity_available"], np.memmap)
+
+    engine = InventoryScoringEngine.from_snapshot(snapshot)
+    item = FailedItem.from_mapping(
+        {
+            "scn_id": str(SCN),
+            "line_item_id": str(LINE),
+            "description": "HVAC compressor failure",
+            "quantity": "4",
+            "unit_of_measure": "EA",
+            "priority": "critical",
+        }
+    )
+    [rows] = await engine.search(
+        OfflinePool(),  # type: ignore[arg-type]
+        [item],
+        fetch_limit=10,
+        offset=0,
+        window=10,
+        after=None,
+        thresholds=(None, None, None),
+        search_order="urgency_first",
+    )
+
+    assert [(row["inventory_id"], row["urgency_score"]) for row in rows] == [(UUID(int=102), 90), (UUID(int=101), 80)]
+    first = rows[0]
+    assert (first["material_description"], first["distance_km"], first["estimated_recovery_days"]) == (
+        "Spare fan",
+        42.5,
+        19,
+    )
+    assert str(first["available_quantity"]) == "10.0000"
+    assert engine.stats.projects_loaded == 1 and engine.stats.inventory_rows == 2
+
+
+@pytest.mark.asyncio
+async def test_snapshot_staleness_and_format_checks(tmp_path: Path) -> None:
+    connection = ExportConnection(["v1", "v1", "v2", "v1"])
+    pool = ExportPool(connection)
+    snapshot = await export_inventory_snapshot(pool, "scenario1", tmp_path)  # type: ignore[arg-type]
+
+    assert await snapshot_is_current(pool, snapshot)  # type: ignore[arg-type]
+    assert not await snapshot_is_current(pool, snapshot)  # type: ignore[arg-type]
+    connection.today = date(2024, 5, 2)
+    assert not await snapshot_is_current(pool, snapshot)  # type: ignore[arg-type]
+
+    manifest_path = tmp_path / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest_path.write_text(json.dumps({**manifest, "format_version": 0}))
+    with pytest.raises(InventorySnapshotError, match="S504"):
+        load_inventory_snapshot(tmp_path)
+
+    manifest_path.write_text(json.dumps(manifest))
+    (tmp_path / "inventory.id.npy").unlink()
+    with pytest.raises(InventorySnapshotError, match="S505"):
+        load_inventory_snapshot(tmp_path)
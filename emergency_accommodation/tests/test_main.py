@@ -20,6 +20,30 @@ def _env_isolation(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
 
 
+class FakeDatabasePool:
+    instances: list["FakeDatabasePool"] = []
+
+    def __init__(self, dsn: str, settings=None, *, replicas=None) -> None:
+        self.dsn = dsn
+        self.settings = settings
+        self.replicas = replicas
+        self.closed = False
+        self.metrics = SimpleNamespace(to_dict=lambda: {"acquisitions": 0})
+        FakeDatabasePool.instances.append(self)
+
+    async def __aenter__(self) -> "FakeDatabasePool":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def _fake_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    FakeDatabasePool.instances = []
+    monkeypatch.setattr(cli_main, "DatabasePool", FakeDatabasePool)
+
+
 def _failed_item() -> FailedItem:
     return FailedItem.from_mapping(
         {
@@ -71,6 +95,13 @@ def _option_assessment(summary: str, score: float, impact: str = "minor_impact")
 # Test validate_environment
 
 
+def test_read_database_urls_splits_and_trims(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DATABASE_READ_URLS", " postgresql://r1, ,postgresql://r2 ")
+    assert cli_main.read_database_urls() == ["postgresql://r1", "postgresql://r2"]
+    monkeypatch.delenv("DATABASE_READ_URLS")
+    assert cli_main.read_database_urls() == []
+
+
 def test_validate_environment_openai_success(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv("DATABASE_URL", "postgresql://example")
     monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
@@ -166,8 +197,8 @@ async def test_run_accommodation_analysis_happy_path(monkeypatch: pytest.MonkeyP
         },
     )
 
-    async def fake_load_failed_items(database_url: str, scenario_name: str):
-        assert database_url == "postgresql://example"
+    async def fake_load_failed_items(pool: FakeDatabasePool, scenario_name: str):
+        assert pool.dsn == "postgresql://example"
         assert scenario_name == "scenario1"
         return [_failed_item()]
 
@@ -235,6 +266,85 @@ async def test_run_accommodation_analysis_happy_path(monkeypatch: pytest.MonkeyP
 
     assert iteration_called == [1]
     assert final_called == ["Allocate Regional Hub compressors"]
+    assert len(FakeDatabasePool.instances) == 1
+    assert FakeDatabasePool.instances[0].closed
+
+
+@pytest.mark.asyncio
+async def test_run_deadline_shrinks_and_skips_iterations(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cli_main, "load_search_parameters", lambda scenario, config_dir: {
+        "max_iterations": 3,
+        "batch_size_per_iteration": 10,
+        "ai_provider": "openai",
+        "run_deadline_seconds": 0.3,
+    })
+    monkeypatch.setattr(cli_main, "load_prompt_templates", lambda config_dir: {
+        "scenario1": PromptTemplates(base="b", scenario="s", combined="c"),
+    })
+
+    async def fake_load_failed_items(pool, scenario_name):
+        return [_failed_item()]
+
+    async def fake_load_inventory(*args, **kwargs):
+        return [_inventory_option()] * 10
+
+    monkeypatch.setattr(cli_main, "load_failed_items", fake_load_failed_items)
+    monkeypatch.setattr(cli_main, "load_inventory_by_iteration", fake_load_inventory)
+    for name in ("display_iteration_results", "display_scenario_header", "display_success", "display_error"):
+        monkeypatch.setattr(cli_main, name, lambda *args, **kwargs: None)
+
+    class FakeProgress:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, tb):
+            return False
+
+        def update(self, *args, **kwargs):
+            pass
+
+        def advance(self, *args, **kwargs):
+            pass
+
+    monkeypatch.setattr(cli_main, "display_progress_bar", lambda description, total: (FakeProgress(), 1))
+
+    batch_sizes: list[int] = []
+    finals: list[FinalRecommendation] = []
+    monkeypatch.setattr(cli_main, "display_final_recommendation", lambda final, **kwargs: finals.append(final))
+
+    class FakeAgent:
+        def __init__(self, config, templates):
+            pass
+
+        async def evaluate_iteration(self, *, inventory_batch, **kwargs) -> IterationDecision:
+            batch_sizes.append(len(inventory_batch))
+            await asyncio.sleep(0.12)
+            return IterationDecision(
+                continue_search=True,
+                reasoning="Keep looking",
+                viable_options=(_option_assessment("Allocate Regional Hub compressors", 7.5),),
+            )
+
+        async def final_recommendation(self) -> FinalRecommendation:
+            return FinalRecommendation(
+                primary_option=_option_assessment("Allocate Regional Hub compressors", 8.1),
+                executive_summary="Deploy Regional Hub stock.",
+                risk_mitigation=(),
+            )
+
+    monkeypatch.setattr(cli_main, "AccommodationAgent", FakeAgent)
+
+    await cli_main.run_accommodation_analysis(
+        scenario_name="scenario1",
+        config_dir=Path("."),
+        database_url="postgresql://example",
+    )
+
+    # The second iteration only has half an iteration to spare and the third none at all,
+    # but one iteration's worth is kept back for the final recommendation.
+    assert len(batch_sizes) == 2
+    assert batch_sizes[0] == 10 and 1 <= batch_sizes[1] < 10
+    assert len(finals) == 1
 
 
 @pytest.mark.asyncio
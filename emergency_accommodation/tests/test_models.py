@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import dataclasses
 from datetime import date
 from decimal import Decimal
 from uuid import UUID
@@ -144,3 +145,42 @@ def test_serialize_option_sequence() -> None:
     result = serialize_option_sequence([option])
     assert result == [option.to_dict()]
 
+
+
+def test_from_record_matches_validated_construction() -> None:
+    failed_item = FailedItem.from_mapping(build_failed_item_payload())
+    option = InventoryOption.from_mapping(build_inventory_option_payload())
+    candidate_row = {**dataclasses.asdict(option), "compatibility_score": 80, "sort_key_1": -90.0}
+
+    assert FailedItem.from_record(dataclasses.asdict(failed_item)) == failed_item
+    assert InventoryOption.from_record(candidate_row) == option
+
+
+def test_from_record_converts_quantities_decoded_as_text() -> None:
+    failed_item = FailedItem.from_mapping(build_failed_item_payload())
+    option = InventoryOption.from_mapping(build_inventory_option_payload())
+    text_row = {
+        **dataclasses.asdict(option),
+        "available_quantity": "10.0000",
+        "reserved_quantity": "2.0000",
+        "soft_available_quantity": "5.0000",
+        "hard_available_quantity": "3.0000",
+    }
+
+    converted = InventoryOption.from_record(text_row)
+    assert converted == option
+    assert converted.to_dict()["available_quantity"] == "10.0000"
+    assert FailedItem.from_record({**dataclasses.asdict(failed_item), "quantity": "4"}).quantity == Decimal("4")
+
+
+def test_from_record_falls_back_to_validation_for_bad_rows() -> None:
+    failed_item = FailedItem.from_mapping(build_failed_item_payload())
+    option = InventoryOption.from_mapping(build_inventory_option_payload())
+
+    with pytest.raises(ModelValidationError) as exc:
+        FailedItem.from_record({**dataclasses.asdict(failed_item), "quantity": Decimal("0")})
+    assert exc.value.details[0]["loc"][-1] == "quantity"
+
+    with pytest.raises(ModelValidationError) as exc:
+        InventoryOption.from_record({**dataclasses.asdict(option), "distance_km": -1.0})
+    assert exc.value.details[0]["loc"][-1] == "distance_km"
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+import asyncpg  # type: ignore[import-untyped]
+import pytest
+
+from config.loader import ConfigurationError
+from query_metrics import QueryMetrics, estimate_bytes
+from statement_registry import StatementRegistry
+
+
+class PlanConnection:
+    def __init__(self, rows: list[dict[str, Any]]) -> None:
+        self.rows = rows
+        self.queries: list[tuple[str, tuple[Any, ...]]] = []
+        self.savepoints = 0
+        self.fail_explain = False
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        self.savepoints += 1
+        yield
+
+    async def fetch(self, query: str, *args: Any, timeout: float | None = None) -> list[dict[str, Any]]:
+        self.queries.append((query, args))
+        return self.rows
+
+    async def fetchval(self, query: str, *args: Any, timeout: float | None = None) -> Any:
+        self.queries.append((query, args))
+        if query.startswith("EXPLAIN"):
+            if self.fail_explain:
+                raise asyncpg.PostgresError("explain failed")
+            return json.dumps([{"Plan": {"Node Type": "Function Scan"}, "Execution Time": 1.5}])
+        return UUID(int=1)
+
+
+class PlanPool:
+    def __init__(self, connection: PlanConnection) -> None:
+        self.connection = connection
+
+    @asynccontextmanager
+    async def acquire_read(self) -> AsyncIterator[PlanConnection]:
+        yield self.connection
+
+
+def test_estimate_bytes_extrapolates_from_sampled_rows() -> None:
+    rows = [{"id": UUID(int=index), "name": "Main", "qty": 4, "note": None} for index in range(20)]
+    assert estimate_bytes(rows) == 20 * (16 + 4 + 8)
+    assert estimate_bytes([]) == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_split_by_iteration_and_charge_waits_to_queries() -> None:
+    metrics = QueryMetrics()
+    pool = PlanPool(PlanConnection([{"id": UUID(int=1), "name": "Main"}] * 3))
+
+    async with metrics.checkout(pool, "failed_items") as connection:  # type: ignore[arg-type]
+        await metrics.fetch("failed_items", connection, "SELECT 1")
+        await metrics.fetchval("project_id", connection, "SELECT 2")
+    setup = metrics.end_iteration(0, wall_seconds=0.5)
+    metrics.record("inventory_stream", 0.25, rows=10, size=400)
+    first = metrics.end_iteration(1, wall_seconds=1.0)
+
+    assert set(setup["queries"]) == {"failed_items", "project_id"}
+    failed = setup["queries"]["failed_items"]
+    assert (failed["calls"], failed["rows"], failed["bytes_decoded"]) == (1, 3, 3 * (16 + 4))
+    assert failed["wait_ms"] >= 0.0 and setup["wall_ms"] == 500.0
+    assert setup["queries"]["project_id"]["rows"] == 1
+    assert first["queries"] == {
+        "inventory_stream": {
+            "calls": 1,
+            "total_ms": 250.0,
+            "mean_ms": 250.0,
+            "max_ms": 250.0,
+            "rows": 10,
+            "bytes_decoded": 400,
+            "wait_ms": 0.0,
+        }
+    }
+    assert first["sql_ms"] == 250.0
+    summary = metrics.summary()
+    assert set(summary["queries"]) == {"failed_items", "project_id", "inventory_stream"}
+    assert [entry["iteration"] for entry in summary["iterations"]] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_capture_sampled_explain_plans(tmp_path: Path) -> None:
+    metrics = QueryMetrics()
+    plans = tmp_path / "plans" / "slow.jsonl"
+    metrics.configure({"slow_query_threshold_ms": 0, "slow_query_explain_path": str(plans)})
+    connection = PlanConnection([{"id": UUID(int=1)}])
+    registry = StatementRegistry({"search": "SELECT * FROM fn_emergency_inventory_search($1)"})
+    statements = registry.bind(connection)  # type: ignore[arg-type]
+
+    await metrics.fetch_statement("inventory_search_item", statements, "search", UUID(int=9))
+    metrics.configure({"slow_query_threshold_ms": 0, "slow_query_explain_sample_rate": 0})
+    await metrics.fetch("failed_items", connection, "SELECT 1")  # type: ignore[arg-type]
+
+    [line] = plans.read_text().splitlines()
+    entry = json.loads(line)
+    assert entry["query"] == "inventory_search_item"
+    assert entry["plan"][0]["Plan"]["Node Type"] == "Function Scan"
+    assert ("EXPLAIN (FORMAT JSON) SELECT * FROM fn_emergency_inventory_search($1)", (UUID(int=9),)) in connection.queries
+    assert metrics.explains_captured == 1
+    assert connection.savepoints == 1
+
+    metrics.configure({"slow_query_threshold_ms": 0, "slow_query_explain_path": str(plans), "slow_query_explain_analyze": True})
+    await metrics.fetch("failed_items", connection, "SELECT 1")  # type: ignore[arg-type]
+    assert connection.queries[-1] == ("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT 1", ())
+    assert metrics.explains_captured == 2
+
+    with pytest.raises(ConfigurationError, match="C118"):
+        metrics.configure({"slow_query_explain_sample_rate": 2})
+
+
+@pytest.mark.asyncio
+async def test_failed_explain_is_logged_and_leaves_the_result_alone(tmp_path: Path) -> None:
+    metrics = QueryMetrics()
+    metrics.configure({"slow_query_threshold_ms": 0, "slow_query_explain_path": str(tmp_path / "slow.jsonl")})
+    connection = PlanConnection([{"id": UUID(int=1)}])
+    connection.fail_explain = True
+
+    rows = await metrics.fetch("failed_items", connection, "SELECT 1")  # type: ignore[arg-type]
+
+    assert rows == [{"id": UUID(int=1)}]
+    assert connection.savepoints == 1
+    assert metrics.explains_captured == 0
+    assert not (tmp_path / "slow.jsonl").exists()
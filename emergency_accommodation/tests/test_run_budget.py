@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+import pytest
+
+from config.loader import ConfigurationError
+from database import load_inventory_by_iteration
+from models import FailedItem
+from query_metrics import QueryMetrics
+from run_budget import RunBudget, RunDeadlineExceeded, call_timeout, current_budget, use_budget
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SlowConnection:
+    def __init__(self) -> None:
+        self.timeouts: list[float | None] = []
+
+    async def fetch(self, query: str, *args: Any, timeout: float | None = None) -> list[Any]:
+        self.timeouts.append(timeout)
+        # asyncpg cancels the statement and raises TimeoutError once ``timeout`` elapses.
+        await asyncio.sleep(timeout if timeout is not None else 0)
+        raise asyncio.TimeoutError
+
+
+class SlowPool:
+    def __init__(self) -> None:
+        self.connections: list[SlowConnection] = []
+
+    @asynccontextmanager
+    async def acquire_read(self) -> AsyncIterator[SlowConnection]:
+        connection = SlowConnection()
+        self.connections.append(connection)
+        yield connection
+
+
+def _failed_item(index: int) -> FailedItem:
+    return FailedItem.from_mapping(
+        {
+            "scn_id": "6a6c37f8-23dc-4f18-9581-1c31b3dd7b74",
+            "line_item_id": str(UUID(int=index)),
+            "description": "HVAC compressor failure",
+            "quantity": "4",
+            "unit_of_measure": "EA",
+            "priority": "critical",
+        }
+    )
+
+
+def test_budget_shrinks_then_skips_iterations_as_time_runs_out() -> None:
+    clock = FakeClock()
+    budget = RunBudget(60.0, clock=clock)
+
+    assert budget.iteration_limit(10) == 10
+    clock.now += 20.0
+    budget.record_iteration(20.0)
+    # 40s left, 20s kept for the final recommendation: the next iteration still fits.
+    assert budget.iteration_limit(10) == 10
+
+    clock.now += 10.0
+    # 30s left leaves 10s after the reserve, half of the longest iteration.
+    assert budget.iteration_limit(10) == 5
+    clock.now += 6.0
+    # 4s after the reserve is a fifth of an iteration, too little to be worth running.
+    assert budget.iteration_limit(10) == 0
+
+    clock.now += 30.0
+    assert budget.exhausted and budget.iteration_limit(10) == 0
+    assert budget.finish().to_dict()["elapsed_ms"] == 66000.0
+
+
+def test_call_timeout_is_capped_by_the_current_budget() -> None:
+    clock = FakeClock()
+    budget = RunBudget(5.0, clock=clock)
+
+    assert call_timeout() is None and call_timeout(30.0) == 30.0
+    with use_budget(budget):
+        assert current_budget() is budget
+        assert call_timeout(30.0) == 5.0
+        assert call_timeout(2.0) == 2.0
+        assert call_timeout() == 5.0
+        clock.now += 5.0
+        with pytest.raises(RunDeadlineExceeded) as exc:
+            call_timeout(30.0)
+    assert current_budget() is None
+    assert exc.value.code == "B600"
+    assert budget.stats.calls_cut_short == 1
+
+    assert RunBudget.from_config({}) is None
+    with pytest.raises(ConfigurationError) as config_exc:
+        RunBudget.from_config({"run_deadline_seconds": 0})
+    assert config_exc.value.code == "C119"
+
+
+@pytest.mark.asyncio
+async def test_queries_stopped_by_the_deadline_raise_run_deadline_exceeded() -> None:
+    metrics = QueryMetrics()
+    connection = SlowConnection()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await metrics.fetch("failed_items", connection, "SELECT 1")  # type: ignore[arg-type]
+
+    budget = RunBudget(0.2)
+    with use_budget(budget):
+        with pytest.raises(RunDeadlineExceeded, match="query inventory_search_batch"):
+            await metrics.fetch("inventory_search_batch", connection, "SELECT 2")  # type: ignore[arg-type]
+
+    assert connection.timeouts[0] is None
+    assert connection.timeouts[1] is not None and 0 < connection.timeouts[1] <= 0.2
+    assert budget.stats.calls_cut_short == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_stopped_by_the_deadline_raise_run_deadline_exceeded() -> None:
+    pool = SlowPool()
+    config = {"inventory_fetch_mode": "concurrent", "inventory_fetch_concurrency": 2}
+
+    with use_budget(RunBudget(0.2)):
+        with pytest.raises(RunDeadlineExceeded):
+            await load_inventory_by_iteration(
+                pool,  # type: ignore[arg-type]
+                [_failed_item(index) for index in range(1, 5)],
+                iteration_num=1,
+                config=config,
+            )
+
+    assert len(pool.connections) == 2
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from datetime import date
+from decimal import Decimal
+from typing import Any, AsyncIterator
+from uuid import UUID
+
+import pytest
+
+from change_listener import ChangeEvent
+from models import FailedItem
+from scoring_engine import InventoryScoringEngine
+
+PROJECT = UUID(int=1)
+COMMODITY = UUID(int=2)
+EQUIPMENT = UUID(int=3)
+WBS = UUID(int=4)
+OTHER_WBS = UUID(int=5)
+WAREHOUSE = UUID(int=6)
+DELIVERY = UUID(int=7)
+SCN = UUID(int=8)
+LINE = UUID(int=9)
+TODAY = date(2024, 5, 1)
+
+
+def _inventory(index: int, **overrides: Any) -> dict[str, Any]:
+    row = {
+        "id": UUID(int=100 + index),
+        "project_id": PROJECT,
+        "warehouse_id": WAREHOUSE,
+        "warehouse_name": "Main",
+        "material_description": "Compressor",
+        "commodity_code_id": COMMODITY,
+        "equipment_id": None,
+        "wbs_id": OTHER_WBS,
+        "quantity_available": Decimal("10.0000"),
+        "quantity_reserved": Decimal("2.0000"),
+        "quantity_hard_reserved": Decimal("1.0000"),
+        "safety_stock_level": Decimal("1.0000"),
+        "is_available": True,
+        "next_required_by": None,
+        "max_priority": None,
+        "any_reassignable": False,
+    }
+    row.update(overrides)
+    return row
+
+
+class SnapshotConnection:
+    """Answers the engine's snapshot queries from in-memory tables."""
+
+    def __init__(self, inventory: list[dict[str, Any]], distances: list[dict[str, Any]]) -> None:
+        self.inventory = inventory
+        self.distances = distances
+        self.queries: list[str] = []
+
+    async def fetchval(self, query: str, *params: Any, timeout: float | None = None) -> Any:
+        self.queries.append(query)
+        return TODAY
+
+    async def fetch(self, query: str, *params: Any, timeout: float | None = None) -> list[dict[str, Any]]:
+        self.queries.append(query)
+        if "FROM po_line_items" in query:
+            return [
+                {
+                    "line_item_id": LINE,
+                    "project_id": PROJECT,
+                    "commodity_code_id": COMMODITY,
+                    "equipment_id": EQUIPMENT,
+                    "wbs_id": WBS,
+                    "ros_date": date(2024, 5, 10),
+                }
+            ]
+        if "FROM scns" in query:
+            return [{"id": SCN, "delivery_warehouse_id": DELIVERY}]
+        if "FROM warehouse_inventory" in query:
+            return sorted(self.inventory, key=lambda row: row["id"])
+        if "FROM wbs_ros_dates" in query:
+            return [{"wbs_id": OTHER_WBS, "ros_date": date(2024, 5, 4)}]
+        if "FROM warehouse_distances" in query:
+            return self.distances
+        raise AssertionError(f"unexpected query: {query}")
+
+
+class SnapshotPool:
+    def __init__(self, connection: SnapshotConnection) -> None:
+        self.connection = connection
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[SnapshotConnection]:
+        yield self.connection
+
+    acquire_read = acquire
+
+
+def _failed_item() -> FailedItem:
+    return FailedItem.from_mapping(
+        {
+            "scn_id": str(SCN),
+            "line_item_id": str(LINE),
+            "description": "HVAC compressor failure",
+            "quantity": "4",
+            "unit_of_measure": "EA",
+            "priority": "critical",
+        }
+    )
+
+
+async def _search(engine: InventoryScoringEngine, pool: SnapshotPool, **overrides: Any) -> list[dict[str, Any]]:
+    options: dict[str, Any] = {
+        "fetch_limit": 10,
+        "offset": 0,
+        "window": 10,
+        "after": None,
+        "thresholds": (None, None, None),
+        "search_order": "urgency_first",
+    }
+    options.update(overrides)
+    [rows] = await engine.search(pool, [_failed_item()], **options)  # type: ignore[arg-type]
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_engine_scores_like_the_search_function() -> None:
+    inventory = [
+        _inventory(1, wbs_id=WBS),
+        _inventory(2, commodity_code_id=None, equipment_id=EQUIPMENT, is_available=False),
+        _inventory(
+            3,
+            quantity_hard_reserved=Decimal("9.0000"),
+            next_required_by=date(2024, 5, 20),
+            max_priority=70,
+            any_reassignable=True,
+        ),
+        _inventory(4, commodity_code_id=None, equipment_id=None),
+    ]
+    distances = [{"from_warehouse_id": DELIVERY, "to_warehouse_id": WAREHOUSE, "distance_km": 42.5}]
+    pool = SnapshotPool(SnapshotConnection(inventory, distances))
+
+    rows = await _search(InventoryScoringEngine(), pool)
+
+    by_id = {row["inventory_id"]: row for row in rows}
+    assert set(by_id) == {UUID(int=101), UUID(int=102), UUID(int=103)}
+    free, blocked, reassignable = by_id[UUID(int=101)], by_id[UUID(int=102)], by_id[UUID(int=103)]
+    assert (free["compatibility_score"], free["availability_score"], free["urgency_score"]) == (100, 100, 80)
+    assert (free["availability_status"], free["impact_level"], free["approval_requirement"]) == (
+        "free",
+        "no_impact",
+        "none",
+    )
+    assert free["hard_available_quantity"] == Decimal("8")
+    assert free["estimated_recovery_days"] == 3
+    assert free["risk_summary"] == "Next required:  | Priority: none"
+    assert free["distance_km"] == 42.5
+    assert (blocked["compatibility_score"], blocked["availability_status"], blocked["approval_requirement"]) == (
+        70,
+        "blocked",
+        "executive",
+    )
+    assert (reassignable["availability_status"], reassignable["urgency_score"]) == ("reassignable", 90)
+    assert reassignable["estimated_recovery_days"] == 19
+    assert reassignable["risk_summary"] == "Next required: 2024-05-20 | Priority: 70"
+    assert [row["inventory_id"] for row in rows] == [UUID(int=103), UUID(int=101), UUID(int=102)]
+
+
+@pytest.mark.asyncio
+async def test_engine_limits_before_quantity_filter_and_pages_after_cursor() -> None:
+    inventory = [_inventory(index) for index in range(1, 6)]
+    inventory[0].update(quantity_available=Decimal("0"), wbs_id=WBS)
+    pool = SnapshotPool(SnapshotConnection(inventory, []))
+    engine = InventoryScoringEngine()
+
+    limited = await _search(engine, pool, fetch_limit=3)
+    first = await _search(engine, pool, window=2)
+    last = first[-1]
+    resumed = await _search(
+        engine,
+        pool,
+        window=2,
+        after=[(last["sort_key_1"], last["sort_key_2"], last["sort_key_3"], last["inventory_id"])],
+    )
+
+    assert [row["inventory_id"] for row in limited] == [UUID(int=102), UUID(int=103)]
+    assert [row["inventory_id"] for row in first + resumed] == [UUID(int=100 + index) for index in range(2, 6)]
+    assert sum("FROM warehouse_inventory" in query for query in pool.connection.queries) == 1
+    assert engine.stats.searches == 3
+
+
+@pytest.mark.asyncio
+async def test_engine_applies_thresholds_and_keeps_unknown_distances() -> None:
+    inventory = [
+        _inventory(1, next_required_by=date(2024, 5, 20), max_priority=90),
+        _inventory(2, warehouse_id=UUID(int=60), max_priority=40),
+    ]
+    distances = [{"from_warehouse_id": DELIVERY, "to_warehouse_id": WAREHOUSE, "distance_km": 900.0}]
+    pool = SnapshotPool(SnapshotConnection(inventory, distances))
+    engine = InventoryScoringEngine()
+
+    near = await _search(engine, pool, thresholds=(None, None, 250.0), search_order="proximity_first")
+    urgent = await _search(engine, pool, thresholds=(7, None, None))
+    important = await _search(engine, pool, thresholds=(None, 60, None))
+
+    assert [(row["inventory_id"], row["distance_km"]) for row in near] == [(UUID(int=102), None)]
+    assert [row["inventory_id"] for row in urgent] == [UUID(int=102)]
+    assert [row["inventory_id"] for row in important] == [UUID(int=101)]
+
+
+@pytest.mark.asyncio
+async def test_engine_reloads_a_project_after_invalidation() -> None:
+    inventory = [_inventory(1)]
+    pool = SnapshotPool(SnapshotConnection(inventory, []))
+    engine = InventoryScoringEngine()
+    await _search(engine, pool)
+
+    inventory[0]["quantity_available"] = Decimal("0")
+    assert engine.invalidate(ChangeEvent("emergency_incidents", "UPDATE", UUID(int=50), PROJECT)) == 0
+    assert await _search(engine, pool)
+    assert engine.invalidate(ChangeEvent("warehouse_inventory", "UPDATE", UUID(int=101), PROJECT, UUID(int=101))) == 1
+
+    assert await _search(engine, pool) == []
+    assert sum("FROM warehouse_inventory" in query for query in pool.connection.queries) == 2
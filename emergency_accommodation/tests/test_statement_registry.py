@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Any
+
+import asyncpg
+import pytest
+
+from statement_registry import StatementRegistry
+
+
+class FakeConnection:
+    def __init__(self, failures: list[Exception] | None = None) -> None:
+        self.queries: list[tuple[str, float | None]] = []
+        self._failures = failures or []
+
+    async def fetch(self, query: str, *args: Any, timeout: float | None = None) -> list[dict[str, Any]]:
+        if self._failures:
+            raise self._failures.pop(0)
+        self.queries.append((query, timeout))
+        return [{"query": query, "args": args}]
+
+
+@pytest.mark.asyncio
+async def test_bound_statements_run_the_rendered_sql_on_the_connection() -> None:
+    registry = StatementRegistry({"a": "SELECT $1::int", "b": "SELECT $1::text"})
+    connection = FakeConnection()
+    statements = registry.bind(connection)  # type: ignore[arg-type]
+
+    assert await statements.fetch("a", 1) == [{"query": "SELECT $1::int", "args": (1,)}]
+    await statements.fetch("b", "x", timeout=2.5)
+
+    # The same text every time, so asyncpg's per-connection cache prepares it once.
+    assert connection.queries == [("SELECT $1::int", None), ("SELECT $1::text", 2.5)]
+    assert statements.connection is connection
+
+
+@pytest.mark.asyncio
+async def test_stale_plans_surface_to_the_caller() -> None:
+    registry = StatementRegistry({"a": "SELECT 1"})
+    connection = FakeConnection(failures=[asyncpg.exceptions.InvalidCachedStatementError("stale")])
+
+    with pytest.raises(asyncpg.exceptions.InvalidCachedStatementError):
+        await registry.bind(connection).fetch("a")  # type: ignore[arg-type]
+    rows = await registry.bind(connection).fetch("a")  # type: ignore[arg-type]
+
+    assert rows == [{"query": "SELECT 1", "args": ()}]
+
+
+def test_registry_rejects_unknown_keys() -> None:
+    registry = StatementRegistry({"a": "SELECT 1"})
+    with pytest.raises(KeyError, match="Unknown statement"):
+        registry.sql("missing")
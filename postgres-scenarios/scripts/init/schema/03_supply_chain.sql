@@ -40,6 +40,16 @@ CREATE TABLE IF NOT EXISTS warehouses (
     UNIQUE(project_id, warehouse_code)
 );
 
+-- Great-circle distance for every ordered pair of warehouses that both have coordinates,
+-- kept current by the triggers in 08_triggers.sql so searches look distances up by key.
+CREATE TABLE IF NOT EXISTS warehouse_distances (
+    from_warehouse_id UUID NOT NULL REFERENCES warehouses(id) ON DELETE CASCADE,
+    to_warehouse_id UUID NOT NULL REFERENCES warehouses(id) ON DELETE CASCADE,
+    distance_km DOUBLE PRECISION NOT NULL,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (from_warehouse_id, to_warehouse_id)
+);
+
 CREATE TABLE IF NOT EXISTS commodity_codes (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
@@ -297,6 +307,17 @@ CREATE TABLE IF NOT EXISTS inventory_reservations (
     created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
 );
 
+-- One row per inventory record with reservations, kept current by the triggers in
+-- 08_triggers.sql so searches read reservation aggregates without scanning reservations.
+CREATE TABLE IF NOT EXISTS inventory_reservation_summary (
+    inventory_id UUID PRIMARY KEY REFERENCES warehouse_inventory(id) ON DELETE CASCADE,
+    next_required_by DATE,
+    max_priority INTEGER,
+    any_reassignable BOOLEAN NOT NULL DEFAULT FALSE,
+    reservation_count INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
 CREATE TABLE IF NOT EXISTS materials_issued (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     fmr_id UUID NOT NULL REFERENCES fmrs(id) ON DELETE CASCADE,
@@ -11,3 +11,15 @@ CREATE TABLE IF NOT EXISTS audit_log (
     changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     project_id UUID REFERENCES projects(id)
 );
+
+-- Failed-item inputs changed since a reader's last load, written by the triggers in
+-- 08_triggers.sql. A NULL line_item_id means every line item of the project may have changed
+-- and a NULL project_id means every project. Readers keep the snapshot of their last load and
+-- pick up the rows whose xact_id that snapshot could not see.
+CREATE TABLE IF NOT EXISTS failed_item_changes (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    xact_id XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    project_id UUID,
+    line_item_id UUID,
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
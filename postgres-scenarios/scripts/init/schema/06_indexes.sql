@@ -8,6 +8,8 @@ CREATE INDEX IF NOT EXISTS idx_wbs_project_code ON wbs(project_id, code);
 CREATE INDEX IF NOT EXISTS idx_wbs_project_path ON wbs(project_id, path);
 CREATE INDEX IF NOT EXISTS idx_suppliers_project_code ON suppliers(project_id, supplier_code);
 CREATE INDEX IF NOT EXISTS idx_warehouses_project_code ON warehouses(project_id, warehouse_code);
+CREATE INDEX IF NOT EXISTS idx_warehouse_distances_to ON warehouse_distances(to_warehouse_id);
+CREATE INDEX IF NOT EXISTS idx_warehouse_distances_nearest ON warehouse_distances(from_warehouse_id, distance_km, to_warehouse_id);
 CREATE INDEX IF NOT EXISTS idx_commodity_codes_project_code ON commodity_codes(project_id, engineered_code);
 CREATE INDEX IF NOT EXISTS idx_equipment_list_project_tag ON equipment_list(project_id, engineered_tag);
 CREATE INDEX IF NOT EXISTS idx_mtos_project_number ON mtos(project_id, mto_number);
@@ -27,3 +29,4 @@ CREATE INDEX IF NOT EXISTS idx_traceability_project_certificate ON traceability_
 CREATE INDEX IF NOT EXISTS idx_emergency_incidents_project ON emergency_incidents(project_id);
 CREATE INDEX IF NOT EXISTS idx_audit_log_table_record ON audit_log(table_name, record_id);
 CREATE INDEX IF NOT EXISTS idx_audit_log_changed_at ON audit_log(changed_at);
+CREATE INDEX IF NOT EXISTS idx_failed_item_changes_xact ON failed_item_changes(xact_id);
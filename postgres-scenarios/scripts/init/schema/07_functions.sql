@@ -1,5 +1,326 @@
 SET search_path TO public;
 
+-- Great-circle distance in kilometres between two coordinates; NULL when either is missing.
+CREATE OR REPLACE FUNCTION fn_great_circle_km(
+    p_from_latitude NUMERIC,
+    p_from_longitude NUMERIC,
+    p_to_latitude NUMERIC,
+    p_to_longitude NUMERIC
+)
+RETURNS DOUBLE PRECISION
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN p_from_latitude IS NULL OR p_from_longitude IS NULL
+          OR p_to_latitude IS NULL OR p_to_longitude IS NULL THEN NULL
+        ELSE 6371.0 * ACOS(
+            GREATEST(-1.0, LEAST(
+                1.0,
+                SIN(RADIANS(p_from_latitude)) * SIN(RADIANS(p_to_latitude)) +
+                COS(RADIANS(p_from_latitude)) * COS(RADIANS(p_to_latitude)) *
+                COS(RADIANS(p_to_longitude - p_from_longitude))
+            ))
+        )
+    END::double precision;
+$$;
+
+-- Recomputes warehouse_distances for every pair that involves one of the given warehouses.
+-- Only warehouses of the same project are paired, since inventory is never searched across
+-- projects. Pairs are dropped when either side has lost its coordinates or changed project.
+CREATE OR REPLACE FUNCTION fn_refresh_warehouse_distances(p_warehouse_ids UUID[])
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM warehouse_distances d
+    WHERE d.from_warehouse_id = ANY (p_warehouse_ids)
+       OR d.to_warehouse_id = ANY (p_warehouse_ids);
+
+    INSERT INTO warehouse_distances (from_warehouse_id, to_warehouse_id, distance_km)
+    SELECT a.id, b.id, fn_great_circle_km(a.latitude, a.longitude, b.latitude, b.longitude)
+    FROM warehouses a
+    JOIN warehouses b ON b.project_id = a.project_id
+    WHERE (a.id = ANY (p_warehouse_ids) OR b.id = ANY (p_warehouse_ids))
+      AND a.latitude IS NOT NULL AND a.longitude IS NOT NULL
+      AND b.latitude IS NOT NULL AND b.longitude IS NOT NULL;
+END;
+$$;
+
+-- Rebuilds the whole distance matrix from warehouses, one block of pairs per project.
+CREATE OR REPLACE FUNCTION fn_rebuild_warehouse_distances()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    LOCK TABLE warehouse_distances IN EXCLUSIVE MODE;
+    DELETE FROM warehouse_distances;
+
+    INSERT INTO warehouse_distances (from_warehouse_id, to_warehouse_id, distance_km)
+    SELECT a.id, b.id, fn_great_circle_km(a.latitude, a.longitude, b.latitude, b.longitude)
+    FROM warehouses a
+    JOIN warehouses b ON b.project_id = a.project_id
+    WHERE a.latitude IS NOT NULL AND a.longitude IS NOT NULL
+      AND b.latitude IS NOT NULL AND b.longitude IS NOT NULL;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+-- Warehouses ordered by distance from p_warehouse_id, optionally limited to a radius and a
+-- count. Both bounds are served by idx_warehouse_distances_nearest: the radius is a range
+-- scan and the ordering is read off the index, so no distances are sorted.
+CREATE OR REPLACE FUNCTION fn_nearest_warehouses(
+    p_warehouse_id UUID,
+    p_max_distance_km DOUBLE PRECISION DEFAULT NULL,
+    p_limit INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    warehouse_id UUID,
+    distance_km DOUBLE PRECISION
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT d.to_warehouse_id, d.distance_km
+    FROM warehouse_distances d
+    WHERE d.from_warehouse_id = p_warehouse_id
+      AND (p_max_distance_km IS NULL OR d.distance_km <= p_max_distance_km)
+    ORDER BY d.distance_km, d.to_warehouse_id
+    LIMIT p_limit;
+$$;
+
+-- Recomputes inventory_reservation_summary for the given inventory rows from
+-- inventory_reservations. Summary rows are locked first, in a stable order, so concurrent
+-- writers for the same inventory serialise and the recompute sees the committed state.
+CREATE OR REPLACE FUNCTION fn_refresh_inventory_reservation_summary(p_inventory_ids UUID[])
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO inventory_reservation_summary (inventory_id)
+    SELECT DISTINCT ids.inventory_id
+    FROM unnest(p_inventory_ids) AS ids(inventory_id)
+    JOIN warehouse_inventory wi ON wi.id = ids.inventory_id
+    ON CONFLICT (inventory_id) DO NOTHING;
+
+    PERFORM 1
+    FROM inventory_reservation_summary s
+    WHERE s.inventory_id = ANY (p_inventory_ids)
+    ORDER BY s.inventory_id
+    FOR UPDATE;
+
+    UPDATE inventory_reservation_summary s
+    SET next_required_by = agg.next_required_by,
+        max_priority = agg.max_priority,
+        any_reassignable = agg.any_reassignable,
+        reservation_count = agg.reservation_count,
+        refreshed_at = NOW()
+    FROM (
+        SELECT ir.inventory_id,
+               MIN(ir.required_by_date) AS next_required_by,
+               MAX(ir.priority_level) AS max_priority,
+               BOOL_OR(ir.can_reassign) AS any_reassignable,
+               COUNT(*)::int AS reservation_count
+        FROM inventory_reservations ir
+        WHERE ir.inventory_id = ANY (p_inventory_ids)
+        GROUP BY ir.inventory_id
+    ) AS agg
+    WHERE s.inventory_id = agg.inventory_id;
+
+    DELETE FROM inventory_reservation_summary s
+    WHERE s.inventory_id = ANY (p_inventory_ids)
+      AND NOT EXISTS (SELECT 1 FROM inventory_reservations ir WHERE ir.inventory_id = s.inventory_id);
+END;
+$$;
+
+-- Rebuilds the whole summary table from inventory_reservations.
+CREATE OR REPLACE FUNCTION fn_rebuild_inventory_reservation_summary()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    LOCK TABLE inventory_reservation_summary IN EXCLUSIVE MODE;
+    DELETE FROM inventory_reservation_summary;
+
+    INSERT INTO inventory_reservation_summary (
+        inventory_id, next_required_by, max_priority, any_reassignable, reservation_count
+    )
+    SELECT ir.inventory_id,
+           MIN(ir.required_by_date),
+           MAX(ir.priority_level),
+           BOOL_OR(ir.can_reassign),
+           COUNT(*)::int
+    FROM inventory_reservations ir
+    GROUP BY ir.inventory_id;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+-- Lists inventory whose summary row disagrees with its reservations (missing, stale or orphaned).
+CREATE OR REPLACE FUNCTION fn_check_inventory_reservation_summary()
+RETURNS TABLE (
+    inventory_id UUID,
+    problem TEXT,
+    expected_next_required_by DATE,
+    actual_next_required_by DATE,
+    expected_max_priority INTEGER,
+    actual_max_priority INTEGER,
+    expected_any_reassignable BOOLEAN,
+    actual_any_reassignable BOOLEAN,
+    expected_reservation_count INTEGER,
+    actual_reservation_count INTEGER
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH expected AS (
+        SELECT ir.inventory_id,
+               MIN(ir.required_by_date) AS next_required_by,
+               MAX(ir.priority_level) AS max_priority,
+               BOOL_OR(ir.can_reassign) AS any_reassignable,
+               COUNT(*)::int AS reservation_count
+        FROM inventory_reservations ir
+        GROUP BY ir.inventory_id
+    )
+    SELECT
+        COALESCE(e.inventory_id, s.inventory_id),
+        CASE
+            WHEN s.inventory_id IS NULL THEN 'missing'
+            WHEN e.inventory_id IS NULL THEN 'orphaned'
+            ELSE 'stale'
+        END,
+        e.next_required_by,
+        s.next_required_by,
+        e.max_priority,
+        s.max_priority,
+        e.any_reassignable,
+        s.any_reassignable,
+        e.reservation_count,
+        s.reservation_count
+    FROM expected e
+    FULL JOIN inventory_reservation_summary s ON s.inventory_id = e.inventory_id
+    WHERE s.inventory_id IS NULL
+       OR e.inventory_id IS NULL
+       OR (e.next_required_by, e.max_priority, e.any_reassignable, e.reservation_count)
+          IS DISTINCT FROM (s.next_required_by, s.max_priority, s.any_reassignable, s.reservation_count);
+$$;
+
+-- Scores the warehouse inventory that can stand in for one PO line item. Reservation
+-- aggregates are read from inventory_reservation_summary, one row per candidate, and the
+-- function is a single STABLE SQL statement so the planner inlines it into callers: their
+-- LIMIT and outer joins are planned together with the search instead of behind a
+-- function-scan boundary. Unknown line items return no rows; fn_emergency_inventory_search
+-- is the raising wrapper.
+CREATE OR REPLACE FUNCTION fn_emergency_inventory_candidates(
+    p_po_line_item_id UUID,
+    p_limit INTEGER DEFAULT 10
+)
+RETURNS TABLE (
+    inventory_id UUID,
+    warehouse_id UUID,
+    quantity_available NUMERIC,
+    soft_available_qty NUMERIC,
+    hard_available_qty NUMERIC,
+    availability_status TEXT,
+    compatibility_score INTEGER,
+    urgency_score INTEGER,
+    availability_score INTEGER,
+    impact_level TEXT,
+    next_required_by DATE,
+    max_priority INTEGER
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        scored.inventory_id,
+        scored.warehouse_id,
+        scored.quantity_available,
+        scored.soft_available_qty,
+        scored.hard_available_qty,
+        scored.availability_status,
+        scored.compatibility_score,
+        scored.urgency_score,
+        scored.availability_score,
+        scored.impact_level,
+        scored.next_required_by,
+        scored.max_priority
+    FROM (
+        SELECT
+            wi.id AS inventory_id,
+            wi.warehouse_id,
+            wi.quantity_available,
+            GREATEST(wi.quantity_available - wi.quantity_reserved, 0) AS soft_available_qty,
+            GREATEST(wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level, 0) AS hard_available_qty,
+            CASE
+                WHEN wi.status <> 'available' THEN 'blocked'
+                WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'free'
+                WHEN wi.quantity_available - wi.quantity_reserved > 0 AND COALESCE(res.any_reassignable, FALSE) THEN 'reassignable'
+                WHEN wi.quantity_available > wi.safety_stock_level THEN 'emergency_only'
+                ELSE 'unavailable'
+            END AS availability_status,
+            CASE
+                WHEN wi.commodity_code_id = line.commodity_code_id AND wi.wbs_id = line.wbs_id THEN 100
+                WHEN wi.commodity_code_id = line.commodity_code_id THEN 80
+                WHEN wi.equipment_id = line.equipment_id AND wi.equipment_id IS NOT NULL THEN 70
+                ELSE 0
+            END AS compatibility_score,
+            CASE
+                WHEN line.ros_date IS NULL THEN 50
+                WHEN res.next_required_by IS NULL THEN 80
+                WHEN res.next_required_by <= line.ros_date THEN 40
+                WHEN res.next_required_by <= line.ros_date + INTERVAL '7 days' THEN 60
+                ELSE 90
+            END AS urgency_score,
+            CASE
+                WHEN wi.status <> 'available' THEN 10
+                WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 100
+                WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 60
+                WHEN wi.quantity_available > wi.safety_stock_level THEN 25
+                ELSE 5
+            END AS availability_score,
+            CASE
+                WHEN wi.status <> 'available' THEN 'blocked'
+                WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'no_impact'
+                WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 'moderate_impact'
+                ELSE 'critical_decision'
+            END AS impact_level,
+            res.next_required_by,
+            res.max_priority
+        FROM (
+            SELECT
+                po.project_id,
+                pli.commodity_code_id,
+                pli.equipment_id,
+                pli.wbs_id,
+                ros.ros_date
+            FROM po_line_items pli
+            JOIN purchase_orders po ON po.id = pli.po_id
+            LEFT JOIN LATERAL (
+                SELECT MIN(r.ros_date) AS ros_date FROM wbs_ros_dates r WHERE r.wbs_id = pli.wbs_id
+            ) AS ros ON TRUE
+            WHERE pli.id = p_po_line_item_id
+        ) AS line
+        JOIN warehouse_inventory wi
+          ON wi.project_id = line.project_id
+         AND (
+              (wi.commodity_code_id IS NOT NULL AND wi.commodity_code_id = line.commodity_code_id)
+              OR (wi.equipment_id IS NOT NULL AND wi.equipment_id = line.equipment_id)
+         )
+        LEFT JOIN inventory_reservation_summary res ON res.inventory_id = wi.id
+    ) AS scored
+    ORDER BY scored.compatibility_score DESC, scored.availability_score DESC, scored.inventory_id
+    LIMIT COALESCE(p_limit, 10);
+$$;
+
 CREATE OR REPLACE FUNCTION fn_emergency_inventory_search(
     p_po_line_item_id UUID,
     p_limit INTEGER DEFAULT 10
@@ -17,85 +338,155 @@ RETURNS TABLE (
     impact_level TEXT
 )
 LANGUAGE plpgsql
+STABLE
 AS $$
-DECLARE
-    r_po RECORD;
 BEGIN
-    SELECT pli.id,
-           po.project_id,
-           pli.commodity_code_id,
-           pli.equipment_id,
-           pli.wbs_id,
-           pli.contractual_delivery_date,
-           pli.forecast_delivery_date,
-           ros.ros_date
-    INTO r_po
-    FROM po_line_items pli
-    JOIN purchase_orders po ON po.id = pli.po_id
-    LEFT JOIN wbs_ros_dates ros ON ros.wbs_id = pli.wbs_id
-    WHERE pli.id = p_po_line_item_id;
-
+    PERFORM 1 FROM po_line_items pli WHERE pli.id = p_po_line_item_id;
     IF NOT FOUND THEN
         RAISE EXCEPTION 'PO line item % not found', p_po_line_item_id;
     END IF;
 
     RETURN QUERY
-    WITH reservations AS (
-      SELECT ir.inventory_id,
-             MIN(ir.required_by_date) AS next_required_by,
-             MAX(ir.priority_level) FILTER (WHERE ir.reserved_quantity > 0) AS max_priority,
-             BOOL_OR(ir.can_reassign) AS any_reassignable
-      FROM inventory_reservations ir
-      GROUP BY ir.inventory_id
-    )
     SELECT
-        wi.id AS inventory_id,
-        wi.warehouse_id,
-        wi.quantity_available,
-        GREATEST(wi.quantity_available - wi.quantity_reserved, 0) AS soft_available_qty,
-        GREATEST(wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level, 0) AS hard_available_qty,
-        CASE
-            WHEN wi.status <> 'available' THEN 'blocked'
-            WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'free'
-            WHEN wi.quantity_available - wi.quantity_reserved > 0 AND COALESCE(res.any_reassignable, FALSE) THEN 'reassignable'
-            WHEN wi.quantity_available > wi.safety_stock_level THEN 'emergency_only'
-            ELSE 'unavailable'
-        END AS availability_status,
-        CASE
-            WHEN wi.commodity_code_id = r_po.commodity_code_id AND wi.wbs_id = r_po.wbs_id THEN 100
-            WHEN wi.commodity_code_id = r_po.commodity_code_id THEN 80
-            WHEN wi.equipment_id = r_po.equipment_id AND wi.equipment_id IS NOT NULL THEN 70
-            ELSE 0
-        END AS compatibility_score,
-        CASE
-            WHEN r_po.ros_date IS NULL THEN 50
-            WHEN res.next_required_by IS NULL THEN 80
-            WHEN res.next_required_by <= r_po.ros_date THEN 40
-            WHEN res.next_required_by <= r_po.ros_date + INTERVAL '7 days' THEN 60
-            ELSE 90
-        END AS urgency_score,
-        CASE
-            WHEN wi.status <> 'available' THEN 10
-            WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 100
-            WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 60
-            WHEN wi.quantity_available > wi.safety_stock_level THEN 25
-            ELSE 5
-        END AS availability_score,
-        CASE
-            WHEN wi.status <> 'available' THEN 'blocked'
-            WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'no_impact'
-            WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 'moderate_impact'
-            ELSE 'critical_decision'
-        END AS impact_level
-    FROM warehouse_inventory wi
-    LEFT JOIN reservations res ON res.inventory_id = wi.id
-    WHERE wi.project_id = r_po.project_id
-      AND (
-          (wi.commodity_code_id IS NOT NULL AND wi.commodity_code_id = r_po.commodity_code_id)
-          OR (wi.equipment_id IS NOT NULL AND wi.equipment_id = r_po.equipment_id)
-      )
-    ORDER BY compatibility_score DESC, availability_score DESC
-    LIMIT COALESCE(p_limit, 10);
-
+        c.inventory_id,
+        c.warehouse_id,
+        c.quantity_available,
+        c.soft_available_qty,
+        c.hard_available_qty,
+        c.availability_status,
+        c.compatibility_score,
+        c.urgency_score,
+        c.availability_score,
+        c.impact_level
+    FROM fn_emergency_inventory_candidates(p_po_line_item_id, p_limit) AS c;
 END;
 $$;
+
+-- Array-input companion to fn_emergency_inventory_candidates. Scores the candidates of many
+-- PO line items in a single statement so the project filter and the reservation summary
+-- lookup are planned once for the whole request. Each matching inventory row is read once and
+-- scored in place. Each line item keeps its own limit (default 10) and unknown line items are
+-- skipped instead of raising.
+DROP FUNCTION IF EXISTS fn_emergency_inventory_search_batch(UUID[], INTEGER[]);
+
+CREATE OR REPLACE FUNCTION fn_emergency_inventory_search_batch(
+    p_po_line_item_ids UUID[],
+    p_limits INTEGER[] DEFAULT NULL
+)
+RETURNS TABLE (
+    source_line_item_id UUID,
+    inventory_id UUID,
+    warehouse_id UUID,
+    quantity_available NUMERIC,
+    soft_available_qty NUMERIC,
+    hard_available_qty NUMERIC,
+    availability_status TEXT,
+    compatibility_score INTEGER,
+    urgency_score INTEGER,
+    availability_score INTEGER,
+    impact_level TEXT,
+    next_required_by DATE,
+    max_priority INTEGER
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH requested AS (
+        SELECT req.line_item_id, MAX(COALESCE(req.item_limit, 10)) AS item_limit
+        FROM unnest(p_po_line_item_ids, p_limits) AS req(line_item_id, item_limit)
+        WHERE req.line_item_id IS NOT NULL
+        GROUP BY req.line_item_id
+    ),
+    lines AS (
+        SELECT
+            r.line_item_id,
+            r.item_limit,
+            po.project_id,
+            pli.commodity_code_id,
+            pli.equipment_id,
+            pli.wbs_id,
+            (SELECT MIN(ros.ros_date) FROM wbs_ros_dates ros WHERE ros.wbs_id = pli.wbs_id) AS ros_date
+        FROM requested r
+        JOIN po_line_items pli ON pli.id = r.line_item_id
+        JOIN purchase_orders po ON po.id = pli.po_id
+    ),
+    scored AS (
+        SELECT
+            line.line_item_id AS source_line_item_id,
+            line.item_limit,
+            wi.id AS inventory_id,
+            wi.warehouse_id,
+            wi.quantity_available,
+            GREATEST(wi.quantity_available - wi.quantity_reserved, 0) AS soft_available_qty,
+            GREATEST(wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level, 0) AS hard_available_qty,
+            CASE
+                WHEN wi.status <> 'available' THEN 'blocked'
+                WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'free'
+                WHEN wi.quantity_available - wi.quantity_reserved > 0 AND COALESCE(res.any_reassignable, FALSE) THEN 'reassignable'
+                WHEN wi.quantity_available > wi.safety_stock_level THEN 'emergency_only'
+                ELSE 'unavailable'
+            END AS availability_status,
+            CASE
+                WHEN wi.commodity_code_id = line.commodity_code_id AND wi.wbs_id = line.wbs_id THEN 100
+                WHEN wi.commodity_code_id = line.commodity_code_id THEN 80
+                WHEN wi.equipment_id = line.equipment_id AND wi.equipment_id IS NOT NULL THEN 70
+                ELSE 0
+            END AS compatibility_score,
+            CASE
+                WHEN line.ros_date IS NULL THEN 50
+                WHEN res.next_required_by IS NULL THEN 80
+                WHEN res.next_required_by <= line.ros_date THEN 40
+                WHEN res.next_required_by <= line.ros_date + INTERVAL '7 days' THEN 60
+                ELSE 90
+            END AS urgency_score,
+            CASE
+                WHEN wi.status <> 'available' THEN 10
+                WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 100
+                WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 60
+                WHEN wi.quantity_available > wi.safety_stock_level THEN 25
+                ELSE 5
+            END AS availability_score,
+            CASE
+                WHEN wi.status <> 'available' THEN 'blocked'
+                WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'no_impact'
+                WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 'moderate_impact'
+                ELSE 'critical_decision'
+            END AS impact_level,
+            res.next_required_by,
+            res.max_priority
+        FROM lines line
+        JOIN warehouse_inventory wi
+          ON wi.project_id = line.project_id
+         AND (
+              (wi.commodity_code_id IS NOT NULL AND wi.commodity_code_id = line.commodity_code_id)
+              OR (wi.equipment_id IS NOT NULL AND wi.equipment_id = line.equipment_id)
+         )
+        LEFT JOIN inventory_reservation_summary res ON res.inventory_id = wi.id
+    ),
+    ranked AS (
+        SELECT
+            scored.*,
+            row_number() OVER (
+                PARTITION BY scored.source_line_item_id
+                ORDER BY scored.compatibility_score DESC, scored.availability_score DESC, scored.inventory_id
+            ) AS item_rank
+        FROM scored
+    )
+    SELECT
+        ranked.source_line_item_id,
+        ranked.inventory_id,
+        ranked.warehouse_id,
+        ranked.quantity_available,
+        ranked.soft_available_qty,
+        ranked.hard_available_qty,
+        ranked.availability_status,
+        ranked.compatibility_score,
+        ranked.urgency_score,
+        ranked.availability_score,
+        ranked.impact_level,
+        ranked.next_required_by,
+        ranked.max_priority
+    FROM ranked
+    WHERE ranked.item_rank <= ranked.item_limit
+    ORDER BY ranked.source_line_item_id, ranked.item_rank;
+$$;
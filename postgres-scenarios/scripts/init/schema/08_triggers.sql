@@ -57,3 +57,312 @@ FROM (
         ('emergency_incidents'),
         ('emergency_accommodations')
 ) AS t(table_name);
+
+CREATE OR REPLACE FUNCTION trg_refresh_reservation_summary()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_inventory_ids UUID[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM inventory_reservation_summary;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT n.inventory_id) INTO v_inventory_ids FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT o.inventory_id) INTO v_inventory_ids FROM old_rows o;
+    ELSE
+        SELECT array_agg(DISTINCT changed.inventory_id) INTO v_inventory_ids
+        FROM (
+            SELECT n.inventory_id FROM new_rows n
+            UNION
+            SELECT o.inventory_id FROM old_rows o
+        ) AS changed;
+    END IF;
+
+    IF v_inventory_ids IS NOT NULL THEN
+        PERFORM fn_refresh_inventory_reservation_summary(v_inventory_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Statement-level triggers refresh each touched inventory row once per statement, so bulk
+-- scenario loads do not recompute the same summary row for every inserted reservation.
+DROP TRIGGER IF EXISTS inventory_reservations_summary_insert ON inventory_reservations;
+CREATE TRIGGER inventory_reservations_summary_insert
+    AFTER INSERT ON inventory_reservations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_reservation_summary();
+
+DROP TRIGGER IF EXISTS inventory_reservations_summary_update ON inventory_reservations;
+CREATE TRIGGER inventory_reservations_summary_update
+    AFTER UPDATE ON inventory_reservations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_reservation_summary();
+
+DROP TRIGGER IF EXISTS inventory_reservations_summary_delete ON inventory_reservations;
+CREATE TRIGGER inventory_reservations_summary_delete
+    AFTER DELETE ON inventory_reservations
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_reservation_summary();
+
+DROP TRIGGER IF EXISTS inventory_reservations_summary_truncate ON inventory_reservations;
+CREATE TRIGGER inventory_reservations_summary_truncate
+    AFTER TRUNCATE ON inventory_reservations
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_reservation_summary();
+
+CREATE OR REPLACE FUNCTION trg_refresh_warehouse_distances()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_warehouse_ids UUID[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(n.id) INTO v_warehouse_ids FROM new_rows n;
+    ELSE
+        SELECT array_agg(n.id) INTO v_warehouse_ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE (n.project_id, n.latitude, n.longitude) IS DISTINCT FROM (o.project_id, o.latitude, o.longitude);
+    END IF;
+
+    IF v_warehouse_ids IS NOT NULL THEN
+        PERFORM fn_refresh_warehouse_distances(v_warehouse_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Deleted warehouses drop out of warehouse_distances through its foreign keys, so only
+-- inserts and coordinate or project changes need a refresh.
+DROP TRIGGER IF EXISTS warehouses_distances_insert ON warehouses;
+CREATE TRIGGER warehouses_distances_insert
+    AFTER INSERT ON warehouses
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_warehouse_distances();
+
+DROP TRIGGER IF EXISTS warehouses_distances_update ON warehouses;
+CREATE TRIGGER warehouses_distances_update
+    AFTER UPDATE ON warehouses
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_refresh_warehouse_distances();
+
+-- Cached inventory candidates and failed items go stale when these tables change, so every
+-- changed row is announced on the inventory_changes channel as a compact JSON event:
+-- {"table", "op", "id", "project_id", "inventory_id"}. Notifications are delivered on commit
+-- and identical payloads within one transaction are sent once. TRUNCATE sends a single event
+-- without an id, meaning "everything from this table".
+CREATE OR REPLACE FUNCTION trg_notify_inventory_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows JSONB;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('inventory_changes', json_build_object('table', TG_TABLE_NAME, 'op', TG_OP)::text);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(to_jsonb(n)) INTO v_rows FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(to_jsonb(o)) INTO v_rows FROM old_rows o;
+    ELSE
+        -- Old and new images both count, so rows moved between projects or inventory
+        -- records invalidate both sides.
+        SELECT jsonb_agg(changed.row_image) INTO v_rows
+        FROM (
+            SELECT to_jsonb(n) AS row_image FROM new_rows n
+            UNION ALL
+            SELECT to_jsonb(o) FROM old_rows o
+        ) AS changed;
+    END IF;
+
+    PERFORM pg_notify(
+        'inventory_changes',
+        json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'id', events.record_id,
+            'project_id', COALESCE(events.project_id, wi.project_id::text),
+            'inventory_id', events.inventory_id
+        )::text
+    )
+    FROM (
+        SELECT DISTINCT
+            r->>'id' AS record_id,
+            r->>'project_id' AS project_id,
+            CASE
+                WHEN TG_TABLE_NAME = 'warehouse_inventory' THEN r->>'id'
+                ELSE r->>'inventory_id'
+            END AS inventory_id
+        FROM jsonb_array_elements(COALESCE(v_rows, '[]'::jsonb)) AS r
+    ) AS events
+    LEFT JOIN warehouse_inventory wi
+        ON events.project_id IS NULL AND wi.id = events.inventory_id::uuid;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION attach_change_notify_triggers(p_table TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_notify_insert ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_notify_insert
+        AFTER INSERT ON %s REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_notify_inventory_change()', p_table, p_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_notify_update ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_notify_update
+        AFTER UPDATE ON %s REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_notify_inventory_change()', p_table, p_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_notify_delete ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_notify_delete
+        AFTER DELETE ON %s REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_notify_inventory_change()', p_table, p_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_notify_truncate ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_notify_truncate
+        AFTER TRUNCATE ON %s
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_notify_inventory_change()', p_table, p_table);
+END;
+$$;
+
+SELECT attach_change_notify_triggers(t.table_name)
+FROM (
+    VALUES
+        ('warehouse_inventory'),
+        ('inventory_reservations'),
+        ('emergency_incidents')
+) AS t(table_name);
+
+-- Records the failed line items each change can affect, so cached failed items are refreshed
+-- line by line instead of reloaded. Rows whose project can no longer be resolved (for example
+-- line items deleted together with their purchase order) are recorded for every project.
+-- Every table the failed-item query reads is covered except projects: readers resolve the
+-- project name on every load, and no cached column comes from it.
+CREATE OR REPLACE FUNCTION trg_record_failed_item_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows JSONB;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        INSERT INTO failed_item_changes (project_id, line_item_id) VALUES (NULL, NULL);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(to_jsonb(n)) INTO v_rows FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(to_jsonb(o)) INTO v_rows FROM old_rows o;
+    ELSE
+        SELECT jsonb_agg(changed.row_image) INTO v_rows
+        FROM (
+            SELECT to_jsonb(n) AS row_image FROM new_rows n
+            UNION ALL
+            SELECT to_jsonb(o) FROM old_rows o
+        ) AS changed;
+    END IF;
+
+    IF TG_TABLE_NAME = 'po_line_items' THEN
+        INSERT INTO failed_item_changes (project_id, line_item_id)
+        SELECT DISTINCT po.project_id, (r->>'id')::uuid
+        FROM jsonb_array_elements(COALESCE(v_rows, '[]'::jsonb)) AS r
+        LEFT JOIN purchase_orders po ON po.id = (r->>'po_id')::uuid;
+    ELSIF TG_TABLE_NAME = 'scn_line_items' THEN
+        INSERT INTO failed_item_changes (project_id, line_item_id)
+        SELECT DISTINCT po.project_id, (r->>'po_line_item_id')::uuid
+        FROM jsonb_array_elements(COALESCE(v_rows, '[]'::jsonb)) AS r
+        LEFT JOIN po_line_items pli ON pli.id = (r->>'po_line_item_id')::uuid
+        LEFT JOIN purchase_orders po ON po.id = pli.po_id
+        WHERE r->>'po_line_item_id' IS NOT NULL;
+    ELSIF TG_TABLE_NAME = 'emergency_incidents' THEN
+        -- An incident without an SCN marks the whole project; otherwise only the SCN's lines.
+        INSERT INTO failed_item_changes (project_id, line_item_id)
+        SELECT DISTINCT (r->>'project_id')::uuid, sli.po_line_item_id
+        FROM jsonb_array_elements(COALESCE(v_rows, '[]'::jsonb)) AS r
+        LEFT JOIN scn_line_items sli ON sli.scn_id = (r->>'scn_id')::uuid
+        WHERE r->>'scn_id' IS NULL OR sli.po_line_item_id IS NOT NULL;
+    ELSIF TG_TABLE_NAME = 'wbs_ros_dates' THEN
+        INSERT INTO failed_item_changes (project_id, line_item_id)
+        SELECT DISTINCT po.project_id, pli.id
+        FROM jsonb_array_elements(COALESCE(v_rows, '[]'::jsonb)) AS r
+        JOIN po_line_items pli ON pli.wbs_id = (r->>'wbs_id')::uuid
+        JOIN purchase_orders po ON po.id = pli.po_id;
+    ELSIF TG_TABLE_NAME = 'purchase_orders' THEN
+        -- Old and new images both count, so a PO moved between projects marks both.
+        INSERT INTO failed_item_changes (project_id, line_item_id)
+        SELECT DISTINCT (r->>'project_id')::uuid, pli.id
+        FROM jsonb_array_elements(COALESCE(v_rows, '[]'::jsonb)) AS r
+        JOIN po_line_items pli ON pli.po_id = (r->>'id')::uuid;
+    ELSIF TG_TABLE_NAME IN ('commodity_codes', 'equipment_list', 'units_of_measure') THEN
+        -- Reference rows are project-scoped and rarely edited, so an edit marks the whole
+        -- project instead of scanning po_line_items for the lines that use it.
+        INSERT INTO failed_item_changes (project_id, line_item_id)
+        SELECT DISTINCT (r->>'project_id')::uuid, NULL::uuid
+        FROM jsonb_array_elements(COALESCE(v_rows, '[]'::jsonb)) AS r;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION attach_failed_item_change_triggers(p_table TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_failed_items_insert ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_failed_items_insert
+        AFTER INSERT ON %s REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_record_failed_item_change()', p_table, p_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_failed_items_update ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_failed_items_update
+        AFTER UPDATE ON %s REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_record_failed_item_change()', p_table, p_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_failed_items_delete ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_failed_items_delete
+        AFTER DELETE ON %s REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_record_failed_item_change()', p_table, p_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS %I_failed_items_truncate ON %s', p_table, p_table);
+    EXECUTE format('CREATE TRIGGER %I_failed_items_truncate
+        AFTER TRUNCATE ON %s
+        FOR EACH STATEMENT EXECUTE FUNCTION trg_record_failed_item_change()', p_table, p_table);
+END;
+$$;
+
+SELECT attach_failed_item_change_triggers(t.table_name)
+FROM (
+    VALUES
+        ('po_line_items'),
+        ('scn_line_items'),
+        ('emergency_incidents'),
+        ('wbs_ros_dates'),
+        ('purchase_orders'),
+        ('commodity_codes'),
+        ('equipment_list'),
+        ('units_of_measure')
+) AS t(table_name);
+
+-- Cached failed items are reloaded in full when the date changes, so change records older
+-- than a day are never read again. scripts/utils/prune-failed-item-changes.sh runs this.
+CREATE OR REPLACE FUNCTION fn_prune_failed_item_changes(p_older_than INTERVAL DEFAULT INTERVAL '1 day')
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH pruned AS (
+        DELETE FROM failed_item_changes WHERE changed_at < NOW() - p_older_than RETURNING 1
+    )
+    SELECT count(*)::int FROM pruned;
+$$;
+
+-- Databases created before the derived tables existed start from a full rebuild.
+SELECT fn_rebuild_inventory_reservation_summary();
+SELECT fn_rebuild_warehouse_distances();
@@ -0,0 +1,151 @@
+\set ON_ERROR_STOP on
+
+-- Compares the original fn_emergency_inventory_search, which aggregated every reservation in
+-- the table on each call (plus the second per-row aggregation the accommodation CLI used to
+-- run on top of it), with fn_emergency_inventory_candidates, which reads one
+-- inventory_reservation_summary row per candidate. The original function is recreated
+-- verbatim as pg_temp.legacy_inventory_search. Load the enhanced scenarios first.
+
+CREATE TEMP TABLE comparison_lines AS
+SELECT pli.id AS line_item_id
+FROM po_line_items pli
+JOIN purchase_orders po ON po.id = pli.po_id
+JOIN projects p ON p.id = po.project_id
+WHERE p.name LIKE 'Enhanced Scenario%';
+
+CREATE FUNCTION pg_temp.legacy_inventory_search(
+    p_po_line_item_id UUID,
+    p_limit INTEGER DEFAULT 10
+)
+RETURNS TABLE (
+    inventory_id UUID,
+    warehouse_id UUID,
+    quantity_available NUMERIC,
+    soft_available_qty NUMERIC,
+    hard_available_qty NUMERIC,
+    availability_status TEXT,
+    compatibility_score INTEGER,
+    urgency_score INTEGER,
+    availability_score INTEGER,
+    impact_level TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    r_po RECORD;
+BEGIN
+    SELECT pli.id,
+           po.project_id,
+           pli.commodity_code_id,
+           pli.equipment_id,
+           pli.wbs_id,
+           pli.contractual_delivery_date,
+           pli.forecast_delivery_date,
+           ros.ros_date
+    INTO r_po
+    FROM po_line_items pli
+    JOIN purchase_orders po ON po.id = pli.po_id
+    LEFT JOIN wbs_ros_dates ros ON ros.wbs_id = pli.wbs_id
+    WHERE pli.id = p_po_line_item_id;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'PO line item % not found', p_po_line_item_id;
+    END IF;
+
+    RETURN QUERY
+    WITH reservations AS (
+      SELECT ir.inventory_id,
+             MIN(ir.required_by_date) AS next_required_by,
+             MAX(ir.priority_level) FILTER (WHERE ir.reserved_quantity > 0) AS max_priority,
+             BOOL_OR(ir.can_reassign) AS any_reassignable
+      FROM inventory_reservations ir
+      GROUP BY ir.inventory_id
+    )
+    SELECT
+        wi.id AS inventory_id,
+        wi.warehouse_id,
+        wi.quantity_available,
+        GREATEST(wi.quantity_available - wi.quantity_reserved, 0) AS soft_available_qty,
+        GREATEST(wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level, 0) AS hard_available_qty,
+        CASE
+            WHEN wi.status <> 'available' THEN 'blocked'
+            WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'free'
+            WHEN wi.quantity_available - wi.quantity_reserved > 0 AND COALESCE(res.any_reassignable, FALSE) THEN 'reassignable'
+            WHEN wi.quantity_available > wi.safety_stock_level THEN 'emergency_only'
+            ELSE 'unavailable'
+        END AS availability_status,
+        CASE
+            WHEN wi.commodity_code_id = r_po.commodity_code_id AND wi.wbs_id = r_po.wbs_id THEN 100
+            WHEN wi.commodity_code_id = r_po.commodity_code_id THEN 80
+            WHEN wi.equipment_id = r_po.equipment_id AND wi.equipment_id IS NOT NULL THEN 70
+            ELSE 0
+        END AS compatibility_score,
+        CASE
+            WHEN r_po.ros_date IS NULL THEN 50
+            WHEN res.next_required_by IS NULL THEN 80
+            WHEN res.next_required_by <= r_po.ros_date THEN 40
+            WHEN res.next_required_by <= r_po.ros_date + INTERVAL '7 days' THEN 60
+            ELSE 90
+        END AS urgency_score,
+        CASE
+            WHEN wi.status <> 'available' THEN 10
+            WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 100
+            WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 60
+            WHEN wi.quantity_available > wi.safety_stock_level THEN 25
+            ELSE 5
+        END AS availability_score,
+        CASE
+            WHEN wi.status <> 'available' THEN 'blocked'
+            WHEN wi.quantity_available - wi.quantity_hard_reserved - wi.safety_stock_level > 0 THEN 'no_impact'
+            WHEN wi.quantity_available - wi.quantity_reserved > 0 THEN 'moderate_impact'
+            ELSE 'critical_decision'
+        END AS impact_level
+    FROM warehouse_inventory wi
+    LEFT JOIN reservations res ON res.inventory_id = wi.id
+    WHERE wi.project_id = r_po.project_id
+      AND (
+          (wi.commodity_code_id IS NOT NULL AND wi.commodity_code_id = r_po.commodity_code_id)
+          OR (wi.equipment_id IS NOT NULL AND wi.equipment_id = r_po.equipment_id)
+      )
+    ORDER BY compatibility_score DESC, availability_score DESC
+    LIMIT COALESCE(p_limit, 10);
+
+END;
+$$;
+
+-- The original ORDER BY has no tie-breaker, so rows tied at the LIMIT can differ between
+-- runs. Scores are compared over every candidate, with no LIMIT in effect.
+\echo 'Score mismatches between the original search and fn_emergency_inventory_candidates (expect 0 and 0)'
+WITH legacy_search AS (
+    SELECT l.line_item_id, legacy.*
+    FROM comparison_lines l
+    CROSS JOIN LATERAL pg_temp.legacy_inventory_search(l.line_item_id, 2147483647) AS legacy
+),
+scoped AS (
+    SELECT
+        l.line_item_id, c.inventory_id, c.warehouse_id, c.quantity_available, c.soft_available_qty,
+        c.hard_available_qty, c.availability_status, c.compatibility_score, c.urgency_score,
+        c.availability_score, c.impact_level
+    FROM comparison_lines l
+    CROSS JOIN LATERAL fn_emergency_inventory_candidates(l.line_item_id, 2147483647) AS c
+)
+SELECT
+    (SELECT COUNT(*) FROM (SELECT * FROM legacy_search EXCEPT ALL SELECT * FROM scoped) AS missing) AS only_in_legacy,
+    (SELECT COUNT(*) FROM (SELECT * FROM scoped EXCEPT ALL SELECT * FROM legacy_search) AS extra) AS only_in_scoped;
+
+\echo 'Original: table-wide aggregation in the search plus a second per-row aggregation'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT l.line_item_id, s.*, res.next_required_by, res.max_priority
+FROM comparison_lines l
+CROSS JOIN LATERAL pg_temp.legacy_inventory_search(l.line_item_id, 10) AS s
+LEFT JOIN LATERAL (
+    SELECT MIN(ir.required_by_date) AS next_required_by, MAX(ir.priority_level) AS max_priority
+    FROM inventory_reservations ir
+    WHERE ir.inventory_id = s.inventory_id
+) AS res ON TRUE;
+
+\echo 'Candidate-scoped: one summary lookup per matching inventory row, inlined into the caller'
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT l.line_item_id, c.*
+FROM comparison_lines l
+CROSS JOIN LATERAL fn_emergency_inventory_candidates(l.line_item_id, 10) AS c;
@@ -0,0 +1,57 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+PROJECT_ROOT=$(cd "${SCRIPT_DIR}/../.." && pwd)
+
+usage() {
+  cat <<USAGE
+Usage: $(basename "$0") [older-than]
+
+Deletes failed_item_changes records older than the given PostgreSQL interval
+(default: 1 day). Cached failed items reload in full when the date changes, so
+older records are never read again. Run it daily, for example from cron.
+
+Environment:
+  Reads connection details from .env (POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_PORT).
+  Override PGPASSWORD/POSTGRES_HOST if required before running.
+USAGE
+}
+
+case "${1:-}" in
+  -h|--help|help)
+    usage
+    exit 0
+    ;;
+esac
+
+if [[ $# -gt 1 ]]; then
+  usage
+  exit 1
+fi
+OLDER_THAN=${1:-1 day}
+
+ENV_FILE="${PROJECT_ROOT}/.env"
+if [[ -f "${ENV_FILE}" ]]; then
+  # shellcheck disable=SC2046
+  set -a
+  source "${ENV_FILE}"
+  set +a
+else
+  echo "Warning: .env not found – relying on ambient environment variables." >&2
+fi
+
+POSTGRES_HOST=${POSTGRES_HOST:-127.0.0.1}
+POSTGRES_PORT=${POSTGRES_PORT:-5432}
+: "${POSTGRES_DB:?POSTGRES_DB must be set}"
+: "${POSTGRES_USER:?POSTGRES_USER must be set}"
+: "${POSTGRES_PASSWORD:?POSTGRES_PASSWORD must be set}"
+
+export PGPASSWORD=${PGPASSWORD:-$POSTGRES_PASSWORD}
+CONNECTION="sslmode=require host=${POSTGRES_HOST} port=${POSTGRES_PORT} dbname=${POSTGRES_DB} user=${POSTGRES_USER}"
+
+echo "Pruning failed_item_changes older than ${OLDER_THAN} in ${POSTGRES_DB} on ${POSTGRES_HOST}:${POSTGRES_PORT}" >&2
+# Read from stdin so psql quotes the interval as a literal (-c skips variable interpolation).
+psql "${CONNECTION}" -v ON_ERROR_STOP=1 -v older_than="${OLDER_THAN}" -At <<'SQL'
+SELECT fn_prune_failed_item_changes(:'older_than'::interval) || ' change records deleted';
+SQL
@@ -0,0 +1,76 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+SCRIPT_DIR=$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)
+PROJECT_ROOT=$(cd "${SCRIPT_DIR}/../.." && pwd)
+
+usage() {
+  cat <<USAGE
+Usage: $(basename "$0") <command>
+
+Commands:
+  check      List inventory whose reservation summary disagrees with inventory_reservations
+             (exits 1 when any row is missing, stale or orphaned)
+  rebuild    Recompute inventory_reservation_summary from inventory_reservations
+
+Environment:
+  Reads connection details from .env (POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_PORT).
+  Override PGPASSWORD/POSTGRES_HOST if required before running.
+USAGE
+}
+
+if [[ $# -lt 1 ]]; then
+  usage
+  exit 1
+fi
+
+COMMAND=$1
+case "$COMMAND" in
+  check|rebuild)
+    ;;
+  -h|--help|help)
+    usage
+    exit 0
+    ;;
+  *)
+    echo "Unknown command '${COMMAND}'." >&2
+    usage
+    exit 1
+    ;;
+esac
+
+ENV_FILE="${PROJECT_ROOT}/.env"
+if [[ -f "${ENV_FILE}" ]]; then
+  # shellcheck disable=SC2046
+  set -a
+  source "${ENV_FILE}"
+  set +a
+else
+  echo "Warning: .env not found – relying on ambient environment variables." >&2
+fi
+
+POSTGRES_HOST=${POSTGRES_HOST:-127.0.0.1}
+POSTGRES_PORT=${POSTGRES_PORT:-5432}
+: "${POSTGRES_DB:?POSTGRES_DB must be set}"
+: "${POSTGRES_USER:?POSTGRES_USER must be set}"
+: "${POSTGRES_PASSWORD:?POSTGRES_PASSWORD must be set}"
+
+export PGPASSWORD=${PGPASSWORD:-$POSTGRES_PASSWORD}
+CONNECTION="sslmode=require host=${POSTGRES_HOST} port=${POSTGRES_PORT} dbname=${POSTGRES_DB} user=${POSTGRES_USER}"
+
+if [[ "${COMMAND}" == "rebuild" ]]; then
+  echo "Rebuilding inventory_reservation_summary in ${POSTGRES_DB} on ${POSTGRES_HOST}:${POSTGRES_PORT}" >&2
+  psql "${CONNECTION}" -v ON_ERROR_STOP=1 -At \
+    -c "SELECT fn_rebuild_inventory_reservation_summary() || ' summary rows written';"
+  exit 0
+fi
+
+PROBLEMS=$(psql "${CONNECTION}" -v ON_ERROR_STOP=1 -At -c "SELECT COUNT(*) FROM fn_check_inventory_reservation_summary();")
+if [[ "${PROBLEMS}" == "0" ]]; then
+  echo "inventory_reservation_summary is consistent with inventory_reservations" >&2
+  exit 0
+fi
+
+echo "inventory_reservation_summary has ${PROBLEMS} inconsistent row(s); run '$(basename "$0") rebuild' to repair:" >&2
+psql "${CONNECTION}" -v ON_ERROR_STOP=1 -c "SELECT * FROM fn_check_inventory_reservation_summary() ORDER BY inventory_id;"
+exit 1